@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from scipy import sparse
+
+AMENITIES_VERSION = 1
+
+
+# Índice de amenities: vocabulario + matriz dispersa anuncio x amenity (1 si el
+# anuncio la tiene). Se guarda en formato CSC porque todas las consultas van por columnas.
+class AmenitiesIndex:
+
+    def __init__(self, vocabulary, matrix):
+        self.vocabulary = list(vocabulary)
+        self.matrix = sparse.csc_matrix(matrix)
+        self._codes = {name: i for i, name in enumerate(self.vocabulary)}
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def codes(self, names):
+        return [self._codes[name] for name in names]
+
+    # Número de anuncios que tiene cada amenity, de más a menos frecuente
+    # (opcionalmente solo entre los anuncios de la máscara: recuento de facetas)
+    def frequency(self, mask=None):
+        if mask is None:
+            counts = np.asarray(self.matrix.sum(axis=0)).ravel()
+        else:
+            counts = (self.matrix.T @ np.asarray(mask, dtype=np.int64)).astype(np.int64)
+        return pd.Series(counts, index=self.vocabulary).sort_values(ascending=False)
+
+    # Máscara de los anuncios que tienen todas las amenities pedidas
+    def having_all(self, names):
+        if not names:
+            return np.ones(len(self), dtype=bool)
+        matches = np.asarray(self.matrix[:, self.codes(names)].sum(axis=1)).ravel()
+        return matches == len(names)
+
+    # Proporción de anuncios de cada grupo (p. ej. municipio) que tiene cada amenity
+    def share_by(self, groups, names=None, mask=None):
+        group_codes, group_names = pd.factorize(pd.Series(groups), use_na_sentinel=True)
+        keep = group_codes >= 0
+        if mask is not None:
+            keep &= mask
+        rows = np.flatnonzero(keep)
+        indicator = sparse.csc_matrix((np.ones(len(rows)), (rows, group_codes[rows])),
+                                      shape=(len(self), len(group_names)))
+        matrix = self.matrix if names is None else self.matrix[:, self.codes(names)]
+        # matrix.T es CSR sin copiar, así el producto no necesita convertir formatos
+        counts = (matrix.T @ indicator).toarray().T
+        sizes = np.asarray(indicator.sum(axis=0)).T
+        share = np.divide(counts, sizes, out=np.zeros_like(counts), where=sizes > 0)
+        return pd.DataFrame(share, index=group_names, columns=self.vocabulary if names is None else names)
+
+    # Precio medio con y sin cada amenity y su cociente (lift)
+    def price_lift(self, price, min_listings=20):
+        price = np.asarray(price, dtype=float)
+        valid = ~np.isnan(price)
+        matrix = self.matrix
+        if not valid.all():
+            matrix = matrix[valid]
+            price = price[valid]
+        count_with = np.asarray(matrix.sum(axis=0)).ravel()
+        sum_with = matrix.T @ price
+        count_without = len(price) - count_with
+        lift = pd.DataFrame({
+            'listings': count_with,
+            'price_with': sum_with / np.maximum(count_with, 1),
+            'price_without': (price.sum() - sum_with) / np.maximum(count_without, 1),
+        }, index=self.vocabulary)
+        lift['lift'] = lift['price_with'] / lift['price_without']
+        lift = lift[(lift['listings'] >= min_listings) & (count_without >= min_listings)]
+        return lift.sort_values('lift', ascending=False)
+
+
+# Construir el índice a partir de la columna amenities (una lista por anuncio). Se
+# trabaja sobre el array de listas de Arrow: sus offsets son directamente el indptr
+# de la matriz CSR y dictionary_encode da los códigos sin recorrer filas en Python
+def build_amenities_index(amenities):
+    if not isinstance(amenities, (pa.Array, pa.ChunkedArray)):
+        amenities = pa.array([list(value) for value in amenities], type=pa.list_(pa.string()))
+    if isinstance(amenities, pa.ChunkedArray):
+        amenities = amenities.combine_chunks()
+    amenities = amenities.fill_null([])
+
+    offsets = amenities.offsets.to_numpy()
+    encoded = pc.list_flatten(amenities).dictionary_encode()
+    dictionary = np.array(encoded.dictionary.to_pylist(), dtype=object)
+    order = np.argsort(dictionary)
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    codes = ranks[encoded.indices.to_numpy()]
+
+    matrix = sparse.csr_matrix((np.ones(len(codes), dtype=np.uint8), codes, offsets - offsets[0]),
+                               shape=(len(amenities), len(dictionary)))
+    # Un anuncio podría repetir una amenity: sum_duplicates + data=1 la cuenta una vez
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return AmenitiesIndex(dictionary[order], matrix)
+
+
+# Construir el índice una vez por instantánea limpia y guardarlo a su lado
+def build_amenities_snapshot(clean_path):
+    index_path = clean_path.replace('.parquet', f'.amenities-v{AMENITIES_VERSION}.npz')
+    if not os.path.exists(index_path):
+        amenities = pq.read_table(clean_path, columns=['amenities']).column('amenities')
+        index = build_amenities_index(amenities)
+        matrix = index.matrix.tocsr()
+        tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                 shape=matrix.shape, vocabulary=np.array(index.vocabulary, dtype=str))
+        os.replace(tmp_path, index_path)
+    return index_path
+
+
+def load_amenities_index(index_path):
+    with np.load(index_path) as stored:
+        matrix = sparse.csr_matrix((stored['data'], stored['indices'], stored['indptr']),
+                                   shape=tuple(stored['shape']))
+        return AmenitiesIndex(stored['vocabulary'].tolist(), matrix)
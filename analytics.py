@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+
+from contingency import contingency
+from cube import price_quantile, rollup
+from tracing import traced
+
+# Cálculos de las páginas de la aplicación, sin Streamlit: reciben el cubo de agregados
+# (ver cube.py) o las columnas necesarias de los anuncios y devuelven tablas listas para
+# pintar. Los usan tanto menorca.py como el generador de informes (report.py). Cada
+# función es un span de la traza activa (ver tracing.py).
+
+RESPONSE_TIME_ORDER = ['within an hour', 'within a few hours', 'within a day', 'a few days or more']
+
+
+# Número de anuncios por municipio
+@traced()
+def neighbourhood_counts(cube):
+    return rollup(cube, 'neighbourhood')['count'].sort_values(ascending=True)
+
+
+# Precio medio por municipio para alojamientos de un número de huéspedes
+@traced()
+def price_by_neighbourhood(cube, accommodates=2):
+    prices = rollup(cube, 'neighbourhood', where=lambda cube: cube['accommodates'] == accommodates)
+    return prices['price_mean'].rename('price').sort_values(ascending=True)
+
+
+# Número de anuncios por tipo de habitación
+@traced()
+def room_type_counts(cube):
+    return rollup(cube, 'room_type')['count'].sort_values(ascending=True)
+
+
+# Anuncios por tipo de propiedad y de habitación (solo tipos con al menos min_total anuncios)
+@traced()
+def property_room_counts(cube, min_total=200):
+    prop = rollup(cube, ['property_type', 'room_type'])['count']
+    prop = prop.unstack()
+    prop['total'] = prop.sum(axis=1)
+    prop = prop.sort_values(by='total')
+    prop = prop[prop['total'] >= min_total]
+    prop = prop.drop(columns=['total'])
+    prop.columns = prop.columns.astype(str)
+
+    prop = prop.reset_index()
+    return prop.melt(id_vars=['property_type'], var_name='room_type', value_name='count')
+
+
+# Número de anuncios por número de huéspedes
+@traced()
+def accommodates_counts(cube):
+    return rollup(cube, 'accommodates')['count'].sort_index()
+
+
+# Precio medio y mediano por número de huéspedes
+@traced()
+def price_by_accommodates(cube):
+    mean_price = rollup(cube, 'accommodates')
+    mean_price['median_price'] = price_quantile(mean_price, 0.5)
+    return mean_price[['price_mean', 'median_price']].rename(columns={'price_mean': 'price'}).reset_index()
+
+
+# Dimensiones de la tabla de cumplimiento: tipo de host, licencia, municipio y tipo de habitación
+HOST_LICENSE_COLUMNS = ['host_is_superhost', 'license', 'neighbourhood', 'room_type']
+
+
+# Tabla de contingencia superhost x licencia x municipio x tipo de habitación, calculada
+# en una sola pasada (ver contingency.py). listings puede ser un DataFrame o un diccionario
+# columna -> Series con las columnas de HOST_LICENSE_COLUMNS
+@traced()
+def host_license_table(listings):
+    return contingency({
+        'superhost': listings['host_is_superhost'],
+        'license': listings['license'].notna(),
+        'neighbourhood': listings['neighbourhood'],
+        'room_type': listings['room_type'],
+    })
+
+
+# Anuncios de superhosts frente al resto (los hosts sin dato cuentan como no superhosts)
+@traced()
+def superhost_counts(table):
+    superhost_count = int(table.margin('superhost').select(superhost=[True]).counts.sum())
+    return pd.DataFrame({'Estado': ['Superanfitrión', 'No Superanfitrión'],
+                         'Conteo': [superhost_count, table.total - superhost_count]})
+
+
+# Anuncios con y sin número de licencia
+@traced()
+def license_counts(table):
+    licensed = table.margin('license').select(license=[True, False]).counts
+    return pd.DataFrame({'Estado': ['Datos', 'NaN'], 'Conteo': licensed.tolist()})
+
+
+# Anuncios por tipo de host y licencia
+@traced()
+def superhost_license_counts(table):
+    # host_is_superhost es booleano nulable: los hosts sin dato no cuentan en ningún grupo
+    counts = table.margin(['superhost', 'license']).select(superhost=[True, False], license=[True, False]).counts
+    return pd.DataFrame({
+        'Estado': ['Superhost con Licencia', 'Superhost sin Licencia', 'Regular Host con Licencia', 'Regular Host sin Licencia'],
+        'Conteo': counts.ravel().tolist(),
+    })
+
+
+# Proporción de anuncios con licencia por tipo de host y otra dimensión (municipio o tipo de habitación)
+@traced()
+def license_share(table, by='neighbourhood'):
+    table = table.margin(['superhost', by, 'license']).select(superhost=[True, False])
+    share = table.proportions(given=['superhost', by]).xs(True, level='license')
+    counts = table.margin(['superhost', by]).to_series()
+    share = pd.DataFrame({'share': share, 'listings': counts}).reset_index()
+    share['superhost'] = share['superhost'].map({True: 'Superhost', False: 'Regular Host'})
+    return share[share['listings'] > 0]
+
+
+# Test chi-cuadrado de independencia entre la licencia y otra dimensión
+@traced()
+def license_independence(table, by='superhost'):
+    if by == 'superhost':
+        table = table.select(superhost=[True, False])
+    return table.chi_square(['license', by])
+
+
+# Recortar las barras vacías de los extremos de un histograma de bordes fijos
+def nonzero_range(histogram):
+    used = histogram.index[histogram['count'] > 0]
+    if not len(used):
+        return histogram.iloc[:0]
+    return histogram.loc[used.min():used.max()].reset_index(drop=True)
+
+
+# Histograma de puntuaciones a partir de los sketches de la instantánea (ver sketches.py),
+# agrupando las barras de 0.05 puntos de factor en factor
+@traced()
+def review_scores_distribution(sketches, factor=5):
+    return nonzero_range(sketches['review_scores_rating:histogram'].rebin(factor).to_frame())
+
+
+# Número de anuncios por estancia mínima, hasta max_nights noches, a partir de los sketches
+@traced()
+def min_nights_distribution(sketches, max_nights=50):
+    nights = sketches['minimum_nights:histogram'].to_frame()
+    nights = nights[(nights['start'] <= max_nights) & (nights['count'] > 0)]
+    return pd.DataFrame({'minimum_nights': nights['start'].astype(int), 'count': nights['count']}).reset_index(drop=True)
+
+
+# Número de anuncios por mes de la primera reseña, a partir de los sketches
+@traced()
+def first_review_distribution(sketches):
+    months = nonzero_range(sketches['first_review:histogram'].to_frame())
+    month = pd.to_datetime({'year': 1970 + months['start'].astype(int) // 12, 'month': months['start'].astype(int) % 12 + 1, 'day': 1})
+    return pd.DataFrame({'month': month, 'count': months['count']}).reset_index(drop=True)
+
+
+# Número de anuncios por tiempo de respuesta del host, en orden de rapidez
+@traced()
+def response_time_distribution(listings):
+    counts = listings['host_response_time'].value_counts().reindex(RESPONSE_TIME_ORDER, fill_value=0)
+    return counts.rename_axis('host_response_time').rename('count').reset_index()
+
+
+# Precio medio y ocupación por mes y municipio (calendario reducido + columnas id y neighbourhood)
+@traced()
+def seasonal_prices(calendar, listings):
+    calendar = calendar.merge(listings[['id', 'neighbourhood']], left_on='listing_id', right_on='id')
+    seasonal = calendar.groupby(['month', 'neighbourhood'], observed=True)[['price_sum', 'price_count', 'booked_nights', 'nights']].sum()
+    seasonal['mean_price'] = seasonal['price_sum'] / seasonal['price_count']
+    seasonal['occupancy'] = seasonal['booked_nights'] / seasonal['nights']
+    return seasonal.reset_index()
+
+
+# Reseñas totales por mes
+@traced()
+def monthly_reviews(reviews):
+    return reviews.groupby('month')['reviews'].sum().reset_index()
+
+
+# Histograma del precio de cada anuncio entre el precio mediano de sus comparables (ver
+# comparables.py), en bins intervalos hasta max_ratio (los de más quedan en la última barra)
+@traced()
+def comparable_ratio_distribution(estimates, max_ratio=3, bins=30):
+    ratio = estimates['ratio'].dropna().clip(upper=max_ratio)
+    count, edges = np.histogram(ratio, bins=bins, range=(0, max_ratio))
+    return pd.DataFrame({'start': edges[:-1], 'end': edges[1:], 'count': count})
@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+from amenities import build_amenities_index
+from comparables import ComparablesIndex
+from cube import build_cube
+from dataset import SnapshotDataset
+from geo import build_cluster_pyramid, clusters_in_view, map_bounds
+from hosts import HostIndex, host_sums
+from ingest import clean_listings, merge_csvs, write_parquet
+from report import REPORT_ZOOM, report_figures, report_map
+from sketches import build_sketches
+from spatial import hex_geojson, hex_layer
+from synthetic import write_listings
+
+# Banco de pruebas con datos sintéticos (ver synthetic.py): cronometra cada paso del
+# análisis, mide su pico de memoria y el tamaño de cada gráfica serializada, guarda los
+# resultados por commit y los compara con los de otro commit para detectar regresiones.
+#   python benchmark.py --size 10k --size 100k
+#   python benchmark.py --size 1M --baseline 55d9dab
+
+# Tamaños de los mercados sintéticos
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+
+# Carpeta con los CSV generados, las instantáneas y los resultados
+BENCH_DIR = 'bench'
+
+# Una regresión es un paso al menos un 25% más lento (o una gráfica un 25% más pesada)...
+REGRESSION_RATIO = 1.25
+# ... y que además tarde al menos 50 ms más (por debajo es ruido)
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# Pasos medidos, en el orden de la aplicación. Cada paso recibe el estado con los
+# resultados de los anteriores y devuelve los suyos
+def step_merge(state):
+    return {'merged': merge_csvs(state['listings_path'], state['listings_data_path'])}
+
+
+def step_write_snapshot(state):
+    write_parquet(state['merged'], state['snapshot_path'])
+    return {}
+
+
+def step_clean(state):
+    return {'clean': clean_listings(state['merged'])}
+
+
+def step_write_clean(state):
+    write_parquet(state['clean'], state['clean_path'])
+    return {}
+
+
+def step_open_dataset(state):
+    dataset = SnapshotDataset(state['clean_path'], exclude=['host_about'])
+    return {'dataset': dataset, 'nuevo_listings': dataset.frame()}
+
+
+def step_cube(state):
+    cube = build_cube(state['nuevo_listings'])
+    analytics.price_by_neighbourhood(cube)
+    analytics.property_room_counts(cube)
+    analytics.price_by_accommodates(cube)
+    return {'cube': cube}
+
+
+def step_host_license(state):
+    table = analytics.host_license_table(state['nuevo_listings'][analytics.HOST_LICENSE_COLUMNS])
+    analytics.superhost_license_counts(table)
+    analytics.license_share(table, 'neighbourhood')
+    analytics.license_independence(table)
+    return {}
+
+
+def step_hosts(state):
+    hosts = HostIndex(host_sums(state['nuevo_listings']))
+    hosts.page(0)
+    hosts.page(0, by='average_rating', query='host 1')
+    return {}
+
+
+def step_amenities(state):
+    nuevo_listings = state['nuevo_listings']
+    amenities = build_amenities_index(state['dataset'].table.column('amenities'))
+    frequency = amenities.frequency()
+    mask = amenities.having_all(frequency.index[:2].tolist())
+    amenities.frequency(mask)
+    amenities.share_by(nuevo_listings['neighbourhood'], frequency.index[:15].tolist(), mask)
+    amenities.price_lift(nuevo_listings['price'])
+    return {'amenities': amenities}
+
+
+def step_map(state):
+    nuevo_listings = state['nuevo_listings']
+    pyramid = build_cluster_pyramid(nuevo_listings['latitude'], nuevo_listings['longitude'])
+    bounds = map_bounds(nuevo_listings['latitude'], nuevo_listings['longitude'])
+    clusters_in_view(pyramid, REPORT_ZOOM, bounds)
+    return {}
+
+
+def step_hexes(state):
+    hex_geojson(hex_layer(state['nuevo_listings']))
+    return {}
+
+
+# Construir el KD-tree y comparar el precio de todos los anuncios con sus 20 comparables
+def step_comparables(state):
+    ComparablesIndex.from_listings(state['nuevo_listings']).price_estimates(k=20)
+    return {}
+
+
+def step_sketches(state):
+    sketches = build_sketches(state['nuevo_listings'])
+    analytics.review_scores_distribution(sketches)
+    analytics.min_nights_distribution(sketches)
+    analytics.first_review_distribution(sketches)
+    return {'sketches': sketches}
+
+
+# Construir y serializar todas las gráficas, como hace Streamlit al enviarlas al navegador
+def step_charts(state):
+    charts = report_figures(state['dataset'], state['cube'], state['sketches'], 'Sintética', amenities=state['amenities'])
+    payloads = {name: len(fig.to_json()) for name, fig in charts.items()}
+    payloads['mapa'] = len(report_map(state['dataset']).get_root().render())
+    return {'payloads': payloads}
+
+
+STEPS = {
+    'merge_csvs': step_merge,
+    'write_snapshot': step_write_snapshot,
+    'clean_listings': step_clean,
+    'write_clean': step_write_clean,
+    'open_dataset': step_open_dataset,
+    'cube': step_cube,
+    'host_license': step_host_license,
+    'hosts': step_hosts,
+    'amenities': step_amenities,
+    'map': step_map,
+    'hexes': step_hexes,
+    'comparables': step_comparables,
+    'sketches': step_sketches,
+    'charts': step_charts,
+}
+
+
+# Pico de memoria de un paso: tracemalloc ve lo que reservan Python, NumPy y pandas;
+# lo que reserva Arrow se mide aparte con su pool de memoria
+def measure_memory(step, state):
+    pool = pa.default_memory_pool()
+    arrow_before = pool.bytes_allocated()
+    tracemalloc.start()
+    try:
+        result = step(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, pool.bytes_allocated() - arrow_before
+
+
+# Limitar la memoria del proceso (en GB): al pasarse, el paso falla con MemoryError
+# en lugar de que el sistema mate el proceso
+def limit_memory(memory_limit):
+    if memory_limit:
+        limit = int(memory_limit * 2 ** 30)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# Medir un tamaño: repeat pasadas cronometradas (se queda la mejor, que es la menos
+# afectada por el resto de la máquina) y una más con tracemalloc para la memoria.
+# Si un paso se queda sin memoria se devuelven los pasos medidos hasta entonces
+def run_size(name, rows, listings_path, listings_data_path, repeat=3):
+    data_dir = os.path.dirname(listings_path)
+    state = {
+        'listings_path': listings_path,
+        'listings_data_path': listings_data_path,
+        'snapshot_path': os.path.join(data_dir, 'snapshot.parquet'),
+        'clean_path': os.path.join(data_dir, 'clean.parquet'),
+    }
+    measured = {
+        'rows': rows,
+        'csv_mb': sum(os.path.getsize(path) for path in (listings_path, listings_data_path)) / 2 ** 20,
+        'steps': {},
+        'payloads': {},
+    }
+    for step_name, step in STEPS.items():
+        try:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                step(state)
+                timings.append(time.perf_counter() - start)
+            # Después de cronometrar, para que las importaciones diferidas no cuenten como pico
+            result, peak, arrow = measure_memory(step, state)
+        except MemoryError:
+            measured['error'] = f'{step_name}: sin memoria'
+            break
+        state.update(result)
+        measured['steps'][step_name] = {'seconds': min(timings), 'peak_mb': peak / 2 ** 20, 'arrow_mb': arrow / 2 ** 20}
+        print(f'  {name:>5} {step_name:<16} {min(timings):9.3f} s {peak / 2 ** 20:9.1f} MB', flush=True)
+    measured['payloads'] = state.get('payloads', {})
+    # Máximo de memoria residente del proceso (incluye lo que reserva Arrow)
+    measured['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+    return measured
+
+
+# Generar los datos y medir cada tamaño en un proceso nuevo: así la memoria de un tamaño
+# (o de la generación) no se suma a la del siguiente, y si el sistema mata el proceso
+# por falta de memoria se anota como error y se sigue con el resto
+def run_isolated(name, rows, bench_dir, repeat=3, seed=0, memory_limit=None):
+    data_dir = os.path.join(bench_dir, 'data', f'{name}-seed{seed}')
+    try:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            start = time.perf_counter()
+            paths = pool.submit(write_listings, rows, data_dir, seed).result()
+            generate_seconds = time.perf_counter() - start
+        with ProcessPoolExecutor(max_workers=1, initializer=limit_memory, initargs=(memory_limit,)) as pool:
+            measured = pool.submit(run_size, name, rows, *paths, repeat).result()
+    except BrokenProcessPool:
+        return {'rows': rows, 'steps': {}, 'payloads': {}, 'error': 'el proceso terminó (¿sin memoria?)'}
+    measured['generate_seconds'] = generate_seconds
+    return measured
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sin-git'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def results_path(bench_dir, commit):
+    return os.path.join(bench_dir, 'results', f'{commit}.json')
+
+
+# Resultados guardados de un commit (o un fichero de resultados)
+def load_results(bench_dir, baseline):
+    path = baseline if os.path.isfile(baseline) else results_path(bench_dir, baseline)
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(bench_dir, results):
+    path = results_path(bench_dir, results['commit'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Conservar los tamaños medidos antes en el mismo commit
+        with open(path) as f:
+            results['sizes'] = {**json.load(f)['sizes'], **results['sizes']}
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Comparar con los resultados de otro commit: tabla de cocientes y lista de regresiones
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    rows, regressions = [], []
+    for size, measured in results['sizes'].items():
+        before = baseline['sizes'].get(size)
+        if before is None:
+            continue
+        if 'error' in measured and 'error' not in before:
+            regressions.append(f"{size}: {measured['error']}")
+        for step, values in measured['steps'].items():
+            if step not in before['steps']:
+                continue
+            old, new = before['steps'][step]['seconds'], values['seconds']
+            rows.append({'size': size, 'metric': step, 'before': old, 'after': new, 'ratio': new / old if old else float('nan')})
+            if new > old * ratio and new - old >= MIN_REGRESSION_SECONDS:
+                regressions.append(f'{size} {step}: {old:.3f} s -> {new:.3f} s')
+        for chart, size_bytes in measured['payloads'].items():
+            old = before['payloads'].get(chart)
+            if not old:
+                continue
+            rows.append({'size': size, 'metric': f'payload:{chart}', 'before': old, 'after': size_bytes, 'ratio': size_bytes / old})
+            if size_bytes > old * ratio:
+                regressions.append(f'{size} payload {chart}: {old} B -> {size_bytes} B')
+    return pd.DataFrame(rows, columns=['size', 'metric', 'before', 'after', 'ratio']), regressions
+
+
+def print_summary(results):
+    for size, measured in results['sizes'].items():
+        if 'max_rss_mb' not in measured:
+            print(f"\n{size} ({measured['rows']} anuncios): {measured['error']}")
+            continue
+        print(f"\n{size} ({measured['rows']} anuncios, {measured['csv_mb']:.0f} MB de CSV, "
+              f"{measured['max_rss_mb']:.0f} MB de memoria residente máxima)")
+        if 'error' in measured:
+            print(f"Error en {measured['error']}")
+        if not measured['steps']:
+            continue
+        steps = pd.DataFrame(measured['steps']).T
+        steps.loc['total'] = [steps['seconds'].sum(), steps['peak_mb'].max(), steps['arrow_mb'].max()]
+        print(steps.round(3).to_string())
+        payloads = pd.Series(measured['payloads'], name='bytes', dtype='int64').sort_values(ascending=False)
+        if payloads.empty:
+            continue
+        print(f'Gráficas serializadas: {payloads.sum() / 2 ** 20:.1f} MB en total')
+        print(payloads.head(5).to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Medir los pasos del análisis con datos sintéticos')
+    parser.add_argument('--size', action='append', choices=list(SIZES), help='tamaño (se puede repetir; por defecto 10k y 100k)')
+    parser.add_argument('--repeat', type=int, default=3, help='pasadas cronometradas por paso (se queda la mejor)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bench-dir', default=BENCH_DIR, help='carpeta de datos y resultados')
+    parser.add_argument('--baseline', help='commit (o fichero de resultados) con el que comparar')
+    parser.add_argument('--ratio', type=float, default=REGRESSION_RATIO, help='cociente a partir del cual se avisa de una regresión')
+    parser.add_argument('--memory-limit', type=float, help='memoria máxima (en GB) del proceso que mide cada tamaño')
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_commit(),
+        'date': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'versions': {'pandas': pd.__version__, 'pyarrow': pa.__version__},
+        'sizes': {},
+    }
+    for size in args.size or ['10k', '100k']:
+        results['sizes'][size] = run_isolated(size, SIZES[size], args.bench_dir, args.repeat, args.seed, args.memory_limit)
+    print_summary(results)
+    print(f'\nResultados en {save_results(args.bench_dir, results)}')
+
+    if args.baseline:
+        table, regressions = compare(results, load_results(args.bench_dir, args.baseline), args.ratio)
+        print(f'\nComparación con {args.baseline}:')
+        print(table.round(3).to_string(index=False))
+        if regressions:
+            print('\nRegresiones:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
@@ -0,0 +1,161 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from tracing import traced
+
+COMPARABLES_VERSION = 1
+
+# Anuncios comparables: los k vecinos más cercanos de cada anuncio en un KD-tree sobre la
+# ubicación, el tipo de habitación, el número de huéspedes y las puntuaciones. El árbol se
+# construye una vez por instantánea y cada consulta por lotes es O(n log n), en lugar de
+# comparar todos los anuncios con todos.
+
+REVIEW_COLUMNS = ['review_scores_rating', 'review_scores_accuracy', 'review_scores_cleanliness',
+                  'review_scores_checkin', 'review_scores_communication', 'review_scores_location',
+                  'review_scores_value']
+
+# Columnas de los anuncios que necesita el índice
+COMPARABLE_COLUMNS = ['id', 'latitude', 'longitude', 'room_type', 'accommodates', 'price', *REVIEW_COLUMNS]
+
+# Escala de cada dimensión: estas diferencias cuentan como distancia 1
+LOCATION_KM = 2.0        # kilómetros
+ACCOMMODATES = 2.0       # huéspedes
+REVIEW_POINTS = 0.5      # puntos de diferencia en todas las puntuaciones a la vez
+
+# Distancia entre anuncios de distinto tipo de habitación: solo se mezclan si no hay
+# suficientes del mismo tipo
+ROOM_TYPE_DISTANCE = 10.0
+
+EARTH_RADIUS_KM = 6371.0
+
+
+# Matriz de características de los anuncios. reference guarda lo que depende de la
+# instantánea (latitud de referencia, tipos de habitación y medianas de las puntuaciones)
+# para calcular con la misma escala las de anuncios nuevos
+def comparable_features(nuevo_listings, reference=None):
+    lat = nuevo_listings['latitude'].to_numpy(dtype=float, na_value=np.nan)
+    lon = nuevo_listings['longitude'].to_numpy(dtype=float, na_value=np.nan)
+    scores = nuevo_listings[REVIEW_COLUMNS].astype(float).to_numpy(na_value=np.nan)
+    if reference is None:
+        reference = {
+            'latitude': float(np.nanmedian(lat)),
+            'room_types': sorted(nuevo_listings['room_type'].dropna().unique().tolist()),
+            # Los anuncios sin puntuaciones (sin reseñas) cuentan con la mediana
+            'review_medians': np.nan_to_num(np.nanmedian(scores, axis=0), nan=0.0).tolist(),
+        }
+
+    # Coordenadas en km (proyección equirectangular alrededor de la latitud de referencia)
+    km = np.radians(1) * EARTH_RADIUS_KM
+    location = np.stack([lon * km * np.cos(np.radians(reference['latitude'])), lat * km], axis=1) / LOCATION_KM
+
+    # Tipo de habitación en one-hot: dos tipos distintos quedan a ROOM_TYPE_DISTANCE
+    codes = pd.Categorical(nuevo_listings['room_type'], categories=reference['room_types']).codes
+    room_type = np.zeros((len(codes), len(reference['room_types'])))
+    room_type[np.flatnonzero(codes >= 0), codes[codes >= 0]] = ROOM_TYPE_DISTANCE / np.sqrt(2)
+
+    accommodates = nuevo_listings['accommodates'].to_numpy(dtype=float, na_value=np.nan)[:, None] / ACCOMMODATES
+    scores = np.where(np.isnan(scores), np.asarray(reference['review_medians']), scores)
+    scores /= REVIEW_POINTS * np.sqrt(len(REVIEW_COLUMNS))
+    return np.hstack([location, room_type, accommodates, scores]), reference
+
+
+class ComparablesIndex:
+
+    def __init__(self, ids, features, prices, reference):
+        self.ids = np.asarray(ids)
+        self.features = np.asarray(features, dtype=float)
+        self.prices = np.asarray(prices, dtype=float)
+        self.reference = reference
+        # Los anuncios sin ubicación o sin huéspedes no entran en el árbol
+        self._rows = np.flatnonzero(~np.isnan(self.features).any(axis=1))
+        self._tree = cKDTree(self.features[self._rows])
+
+    @classmethod
+    def from_listings(cls, nuevo_listings):
+        features, reference = comparable_features(nuevo_listings)
+        return cls(nuevo_listings['id'].to_numpy(), features,
+                   pd.to_numeric(nuevo_listings['price']).to_numpy(dtype=float, na_value=np.nan), reference)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Posición de un anuncio por su id (None si no está)
+    def row(self, listing_id):
+        rows = np.flatnonzero(self.ids == listing_id)
+        return int(rows[0]) if len(rows) else None
+
+    # Los k anuncios más cercanos a cada fila de características, en una sola consulta por
+    # lotes: posiciones (-1 si faltan) y distancias (inf si faltan), de más a menos parecido
+    @traced()
+    def nearest(self, features, k=20, workers=-1):
+        features = np.atleast_2d(np.asarray(features, dtype=float))
+        positions = np.full((len(features), k), -1, dtype=np.int64)
+        distances = np.full((len(features), k), np.inf)
+        valid = ~np.isnan(features).any(axis=1)
+        if valid.any() and len(self._rows):
+            found_distances, found = self._tree.query(features[valid], k=k, workers=workers)
+            found_distances, found = found_distances.reshape(-1, k), found.reshape(-1, k)
+            # cKDTree devuelve el índice len(árbol) cuando no hay k puntos
+            missing = found >= len(self._rows)
+            positions[valid] = np.where(missing, -1, self._rows[np.minimum(found, len(self._rows) - 1)])
+            distances[valid] = found_distances
+        return positions, distances
+
+    # Comparables de anuncios de la propia instantánea: los k más cercanos sin contarse a
+    # sí mismos (se piden k + 1 y se quita el propio anuncio o, si no sale, el último)
+    def query(self, rows, k=20, workers=-1):
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        positions, distances = self.nearest(self.features[rows], k + 1, workers=workers)
+        keep = positions != rows[:, None]
+        keep[keep.all(axis=1), -1] = False
+        return positions[keep].reshape(len(rows), k), distances[keep].reshape(len(rows), k)
+
+    # Comparables de anuncios que no están en la instantánea (p. ej. uno que se va a
+    # publicar), con las mismas columnas que COMPARABLE_COLUMNS
+    def query_listings(self, nuevo_listings, k=20, workers=-1):
+        return self.nearest(comparable_features(nuevo_listings, self.reference)[0], k, workers=workers)
+
+    # Precio de cada anuncio frente al precio mediano de sus k comparables, para todos los
+    # anuncios (o las filas pedidas) de una vez
+    @traced()
+    def price_estimates(self, rows=None, k=20, workers=-1):
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        positions, _ = self.query(rows, k, workers=workers)
+        prices = np.where(positions >= 0, self.prices[np.maximum(positions, 0)], np.nan)
+        estimates = pd.DataFrame({
+            'id': self.ids[rows],
+            'price': self.prices[rows],
+            'comparable_price': pd.DataFrame(prices).median(axis=1).to_numpy(),
+        })
+        estimates['ratio'] = estimates['price'] / estimates['comparable_price']
+        return estimates
+
+
+# Distancia en km entre un punto y varios (para mostrar lo cerca que están los comparables)
+def distance_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+# Calcular las características una vez por instantánea limpia y guardarlas a su lado
+# (el árbol se reconstruye al cargarlas, en O(n log n))
+def build_comparables_snapshot(clean_path):
+    index_path = clean_path.replace('.parquet', f'.comparables-v{COMPARABLES_VERSION}.npz')
+    if not os.path.exists(index_path):
+        index = ComparablesIndex.from_listings(pd.read_parquet(clean_path, columns=COMPARABLE_COLUMNS))
+        tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, ids=index.ids, features=index.features, prices=index.prices,
+                 reference=np.array(json.dumps(index.reference)))
+        os.replace(tmp_path, index_path)
+    return index_path
+
+
+def load_comparables_index(index_path):
+    with np.load(index_path) as stored:
+        return ComparablesIndex(stored['ids'], stored['features'], stored['prices'],
+                                json.loads(str(stored['reference'])))
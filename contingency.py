@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+# Códigos enteros y etiquetas de una columna, sin copiar los datos cuando ya vienen
+# codificados (categóricas y booleanas). Los nulos reciben su propia categoría al final
+def factor_codes(values):
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, labels = values.cat.codes.to_numpy(), list(values.cat.categories)
+    elif pd.api.types.is_bool_dtype(values.dtype):
+        codes, labels = values.to_numpy(dtype=np.int8, na_value=-1), [False, True]
+    else:
+        codes, labels = pd.factorize(values, sort=True)
+        labels = list(labels)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = labels + [None]
+    return codes, labels
+
+
+# Tabla de contingencia de N dimensiones: un array con un eje por dimensión y el
+# número de anuncios de cada combinación de categorías
+class ContingencyTable:
+
+    def __init__(self, counts, dims, labels):
+        self.counts = np.asarray(counts)
+        self.dims = list(dims)
+        self.labels = [pd.Index(label, dtype=object) for label in labels]
+
+    def _axes(self, dims):
+        return [self.dims.index(dim) for dim in dims]
+
+    # Tabla marginal: suma sobre las dimensiones que no se piden
+    def margin(self, dims):
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        dropped = tuple(axis for axis, dim in enumerate(self.dims) if dim not in dims)
+        counts = self.counts.sum(axis=dropped)
+        kept = [dim for dim in self.dims if dim in dims]
+        counts = np.moveaxis(counts, [kept.index(dim) for dim in dims], range(len(dims)))
+        return ContingencyTable(counts, dims, [self.labels[axis] for axis in self._axes(dims)])
+
+    # Quedarse solo con algunas categorías de una o varias dimensiones
+    # (p. ej. select(superhost=[True, False]) descarta los hosts sin dato)
+    def select(self, **categories):
+        counts, labels = self.counts, list(self.labels)
+        for dim, values in categories.items():
+            axis = self.dims.index(dim)
+            positions = labels[axis].get_indexer(pd.Index(values, dtype=object))
+            if (positions < 0).any():
+                raise KeyError(f'{dim} no tiene las categorías {list(np.asarray(values, dtype=object)[positions < 0])}')
+            counts = np.take(counts, positions, axis=axis)
+            labels[axis] = labels[axis][positions]
+        return ContingencyTable(counts, self.dims, labels)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def _index(self):
+        return pd.MultiIndex.from_product(self.labels, names=self.dims)
+
+    def to_series(self):
+        return pd.Series(self.counts.ravel(), index=self._index(), name='count')
+
+    # Proporción de cada celda dentro de las combinaciones de las dimensiones de given
+    # (sin given, sobre el total). P. ej. proportions(given=['superhost', 'neighbourhood'])
+    # da en la dimensión license la proporción de anuncios con licencia de cada grupo
+    def proportions(self, given=None):
+        given = [] if given is None else ([given] if isinstance(given, str) else list(given))
+        summed = tuple(axis for axis, dim in enumerate(self.dims) if dim not in given)
+        totals = self.counts.sum(axis=summed, keepdims=True)
+        share = np.divide(self.counts, totals, out=np.zeros(self.counts.shape), where=totals > 0)
+        return pd.Series(share.ravel(), index=self._index(), name='proportion')
+
+    # Test chi-cuadrado de independencia entre las dimensiones pedidas (todas por defecto).
+    # Las categorías sin anuncios no cuentan para los grados de libertad
+    def chi_square(self, dims=None):
+        observed = (self if dims is None else self.margin(dims)).counts.astype(float)
+        n = observed.sum()
+        if n == 0:
+            return np.nan, 0, np.nan
+        expected = np.full(observed.shape, n)
+        categories = []
+        for axis in range(observed.ndim):
+            marginal = observed.sum(axis=tuple(a for a in range(observed.ndim) if a != axis))
+            shape = [1] * observed.ndim
+            shape[axis] = -1
+            expected = expected * (marginal / n).reshape(shape)
+            categories.append(int((marginal > 0).sum()))
+        dof = int(np.prod(categories)) - sum(k - 1 for k in categories) - 1
+        if dof <= 0:
+            return 0.0, 0, np.nan
+        # scipy.stats tarda en importarse y solo hace falta para el p-valor
+        from scipy import stats
+
+        used = expected > 0
+        statistic = float((((observed - expected) ** 2)[used] / expected[used]).sum())
+        return statistic, dof, float(stats.chi2.sf(statistic, dof))
+
+
+# Construir la tabla en una sola pasada: cada fila se convierte en el índice plano de
+# su celda y np.bincount cuenta todas las celdas a la vez, sin filtrar ni copiar el frame.
+# columns es un diccionario dimensión -> columna (Series o array)
+def contingency(columns):
+    dims = list(columns)
+    codes, labels = zip(*(factor_codes(columns[dim]) for dim in dims))
+    shape = tuple(len(label) for label in labels)
+    flat = np.ravel_multi_index([code.astype(np.intp, copy=False) for code in codes], shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+    return ContingencyTable(counts, dims, labels)
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingest import concat_rows, write_parquet
+
+# Dimensiones por las que se agregan los gráficos de propiedades
+DIMENSIONS = ['neighbourhood', 'room_type', 'property_type', 'accommodates']
+
+# Bordes fijos (logarítmicos) del histograma de precios: al ser siempre los mismos,
+# los histogramas de distintas celdas, instantáneas o ciudades se pueden sumar
+PRICE_EDGES = np.concatenate([[0.0], np.geomspace(1, 100_000, 128)])
+PRICE_BINS = [f'price_bin_{i}' for i in range(len(PRICE_EDGES))]
+
+CUBE_VERSION = 1
+
+
+# Construir el cubo: una fila por combinación de dimensiones con count, sum, min, max
+# y el histograma de precios de esa celda
+def build_cube(nuevo_listings):
+    groups = nuevo_listings.groupby(DIMENSIONS, dropna=False, observed=True)
+    cube = groups['price'].agg(price_count='count', price_sum='sum', price_min='min', price_max='max')
+    cube.insert(0, 'count', groups.size())
+
+    # Histograma por celda en una sola pasada: código de grupo x código de bin
+    price = nuevo_listings['price'].to_numpy(dtype=float)
+    valid = ~np.isnan(price)
+    group_codes = groups.ngroup().to_numpy()[valid]
+    bin_codes = np.searchsorted(PRICE_EDGES, price[valid], side='right') - 1
+    bin_codes = bin_codes.clip(0, len(PRICE_EDGES) - 1)
+    hist = np.bincount(group_codes * len(PRICE_EDGES) + bin_codes,
+                       minlength=len(cube) * len(PRICE_EDGES))
+    hist = hist.reshape(len(cube), len(PRICE_EDGES))
+
+    cube = pd.concat([cube, pd.DataFrame(hist, index=cube.index, columns=PRICE_BINS)], axis=1)
+    return cube.reset_index()
+
+
+# Agregar el cubo a menos dimensiones, opcionalmente filtrando antes las celdas
+def rollup(cube, dims, where=None):
+    if where is not None:
+        cube = cube[where(cube)]
+    sums = ['count', 'price_count', 'price_sum'] + PRICE_BINS
+    groups = cube.groupby(dims, observed=True)
+    rolled = groups[sums].sum()
+    rolled['price_min'] = groups['price_min'].min()
+    rolled['price_max'] = groups['price_max'].max()
+    rolled['price_mean'] = rolled['price_sum'] / rolled['price_count']
+    return rolled
+
+
+# Cuantil aproximado del precio a partir del histograma de cada fila
+def price_quantile(rolled, q):
+    hist = rolled[PRICE_BINS].to_numpy(dtype=float)
+    cum = hist.cumsum(axis=1)
+    target = q * cum[:, -1]
+    idx = (cum < target[:, None]).sum(axis=1).clip(0, len(PRICE_EDGES) - 1)
+    rows = np.arange(len(hist))
+
+    # Interpolar dentro del bin y limitar por el mínimo y máximo reales
+    before = np.where(idx > 0, cum[rows, idx - 1], 0.0)
+    in_bin = hist[rows, idx]
+    frac = np.divide(target - before, in_bin, out=np.zeros_like(target), where=in_bin > 0)
+    upper_edges = np.append(PRICE_EDGES[1:], PRICE_EDGES[-1])
+    value = PRICE_EDGES[idx] + frac * (upper_edges[idx] - PRICE_EDGES[idx])
+    value = np.clip(value, rolled['price_min'].to_numpy(), rolled['price_max'].to_numpy())
+    return pd.Series(value, index=rolled.index)
+
+
+# Construir el cubo una vez por instantánea limpia y guardarlo a su lado
+def build_cube_snapshot(clean_path):
+    cube_path = clean_path.replace('.parquet', f'.cube-v{CUBE_VERSION}.parquet')
+    if not os.path.exists(cube_path):
+        nuevo_listings = pd.read_parquet(clean_path, columns=DIMENSIONS + ['price'])
+        write_parquet(build_cube(nuevo_listings), cube_path)
+    return cube_path
+
+
+# Actualizar el cubo sin reconstruirlo: restar las celdas de las filas que salen,
+# sumar las de las que entran y recalcular min/max solo en las celdas tocadas
+def update_cube(cube, removed, added, nuevo_listings):
+    sums = ['count', 'price_count', 'price_sum'] + PRICE_BINS
+    updated = cube.set_index(DIMENSIONS)[sums]
+    for delta, sign in ((removed, -1), (added, 1)):
+        if len(delta):
+            updated = updated.add(sign * build_cube(delta).set_index(DIMENSIONS)[sums], fill_value=0)
+    updated = updated[updated['count'] > 0]
+
+    # min y max no se pueden restar: se recalculan con las filas actuales de cada celda tocada
+    touched = concat_rows([removed[DIMENSIONS], added[DIMENSIONS]], removed[DIMENSIONS]).drop_duplicates()
+    rows = nuevo_listings.merge(touched, on=DIMENSIONS)
+    limits = rows.groupby(DIMENSIONS, dropna=False, observed=True)['price'].agg(price_min='min', price_max='max')
+    current = cube.set_index(DIMENSIONS)[['price_min', 'price_max']]
+    current = current[~current.index.isin(limits.index)]
+    updated = updated.join(concat_rows([current, limits], current))
+
+    updated = updated[cube.columns.drop(DIMENSIONS)].astype(cube.dtypes.drop(DIMENSIONS))
+    # copy() consolida los bloques de columnas antes de insertar las dimensiones
+    return updated.copy().reset_index()
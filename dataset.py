@@ -0,0 +1,43 @@
+import threading
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from tracing import span
+
+
+# Instantánea de solo lectura compartida por todas las sesiones de un proceso.
+# La tabla Arrow está mapeada en memoria desde el Parquet, así que los datos los
+# comparte además el sistema operativo entre procesos. Cada columna se convierte a
+# pandas una única vez, al pedirla por primera vez, y los DataFrame que devuelve
+# frame() son vistas sobre esas columnas: con Copy-on-Write, cualquier modificación
+# en una página crea una copia local y nunca altera los datos compartidos.
+class SnapshotDataset:
+
+    def __init__(self, path, exclude=()):
+        self.path = path
+        columns = [c for c in pq.read_schema(path).names if c not in exclude]
+        self.table = pq.read_table(path, columns=columns, memory_map=True)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def column(self, name):
+        with self._lock:
+            if name not in self._series:
+                # split_blocks evita consolidar columnas, así las numéricas sin nulos no se copian
+                with span('dataset.to_pandas', column=name):
+                    frame = self.table.select([name]).to_pandas(split_blocks=True)
+                self._series[name] = frame[name]
+            return self._series[name]
+
+    # DataFrame con solo las columnas pedidas (todas si no se indica ninguna)
+    def frame(self, columns=None):
+        columns = self.columns if columns is None else list(columns)
+        return pd.concat([self.column(name) for name in columns], axis=1)
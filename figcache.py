@@ -0,0 +1,134 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Caché de gráficas ya renderizadas: el JSON de cada figura de Plotly o el HTML de cada
+# mapa de Folium, por instantánea, página, subpágina, filtros y estado de los controles.
+# Con datos estáticos la salida es siempre la misma, así que al volver a una página no
+# se reconstruyen ni se vuelven a serializar las figuras. Dos niveles:
+#   - memoria: LRU limitada en bytes, compartida por todas las sesiones del proceso
+#   - disco (opcional): un fichero por gráfica, que se precalienta al desplegar con
+#     python report.py <salida> --store data/store --figure-cache data/cache/figures
+
+# Tamaño máximo por defecto del nivel en memoria
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+# Los módulos que construyen las gráficas forman parte de la clave: al cambiar su código
+# las gráficas guardadas (también las del disco) dejan de valer
+RENDER_MODULES = ['analytics.py', 'comparables.py', 'figures.py', 'spatial.py']
+
+# Página y subpágina de la aplicación (ver menorca.py) de cada gráfica del informe
+# (ver report.report_figures), para precalentar la caché con las claves de la aplicación
+FIGURE_PAGES = {
+    'vecindario': ('Análisis de las Propiedades', 'Vecindario'),
+    'precio_vecindario': ('Análisis de las Propiedades', 'Precios'),
+    'precio_mes': ('Análisis de las Propiedades', 'Precios'),
+    'ocupacion_mes': ('Análisis de las Propiedades', 'Precios'),
+    'tipo_habitacion': ('Análisis de las Propiedades', 'Propiedades'),
+    'tipo_propiedad': ('Análisis de las Propiedades', 'Propiedades'),
+    'huespedes': ('Análisis de las Propiedades', 'Huéspedes'),
+    'huespedes_precio': ('Análisis de las Propiedades', 'Huéspedes'),
+    'precio_huespedes': ('Análisis de las Propiedades', 'Huéspedes'),
+    'amenities': ('Análisis de las Propiedades', 'Amenities'),
+    'amenities_municipio': ('Análisis de las Propiedades', 'Amenities'),
+    'amenities_precio': ('Análisis de las Propiedades', 'Amenities'),
+    'puntuaciones': ('Análisis de las Propiedades', 'Puntuaciones'),
+    'estancia_minima': ('Análisis de las Propiedades', 'Estancia mínima'),
+    'primera_review': ('Análisis de los Hosts', 'Primera review'),
+    'reviews_mes': ('Análisis de los Hosts', 'Primera review'),
+    'tiempo_respuesta': ('Análisis de los Hosts', 'Tiempo de respuesta'),
+    'superhosts': ('Análisis de los Hosts', 'Superhosts'),
+    'licencias': ('Análisis de los Hosts', 'Superhosts'),
+    'superhosts_licencias': ('Análisis de los Hosts', 'Superhosts'),
+    'licencias_municipio': ('Análisis de los Hosts', 'Superhosts'),
+    'licencias_habitacion': ('Análisis de los Hosts', 'Superhosts'),
+    'mapa': ('Análisis de las Propiedades', 'Mapa'),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def render_version():
+    import plotly
+
+    digest = hashlib.sha256(plotly.__version__.encode())
+    for name in RENDER_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# Clave de una gráfica: instantánea (hash del fichero limpio y ciudad, que sale en algunos
+# títulos), página, subpágina, filtros activos, nombre de la gráfica y el estado de los
+# controles de la página que la cambian (p. ej. las amenities elegidas). También la
+# plantilla de Plotly activa, que cambia los colores (Streamlit pone la suya)
+def figure_key(dataset_hash, city, section, page, filters, name, state=()):
+    import plotly.io as pio
+
+    parts = [render_version(), pio.templates.default, dataset_hash, city, section, page, filters, name, state]
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32]
+
+
+class FigureCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.txt')
+
+    # Guardar en memoria y expulsar las menos usadas hasta volver a caber (una gráfica que
+    # por sí sola supera el límite no se guarda)
+    def _remember(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = payload
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    # Gráfica guardada y el nivel del que sale ('memory' o 'disk'); (None, None) si no está
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                return payload, 'memory'
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), encoding='utf-8') as f:
+                payload = f.read()
+            self._remember(key, payload)
+            return payload, 'disk'
+        return None, None
+
+    # La aplicación solo guarda en memoria; persist=True la escribe también en el disco
+    # (lo usa el precalentado, así el disco no crece con cada combinación de filtros)
+    def put(self, key, payload, persist=False):
+        self._remember(key, payload)
+        if persist and self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp_path = f'{self._disk_path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._disk_path(key))
+
+    # Gráfica de la caché o, si no está, la que devuelve render() (ya serializada)
+    def render(self, key, render):
+        payload, level = self.get(key)
+        if payload is None:
+            payload, level = render(), 'miss'
+            self.put(key, payload)
+        return payload, level
@@ -0,0 +1,294 @@
+import pandas as pd
+import plotly.express as px
+
+from analytics import RESPONSE_TIME_ORDER
+from tracing import traced
+
+# Gráficas de Plotly de cada página a partir de las tablas de analytics.py. Las usan
+# tanto la aplicación como el generador de informes, así ambos muestran lo mismo.
+
+
+@traced()
+def neighbourhood_pie(neighbourhood):
+    fig = px.pie(neighbourhood,
+                 values=neighbourhood.values,
+                 names=neighbourhood.index,
+                 title='Número de AirBnbs por zona',
+                 width=800, height=600,
+                 color_discrete_sequence=px.colors.qualitative.Set3)
+    fig.update_layout(title_font_size=20)
+    return fig
+
+
+@traced()
+def neighbourhood_price_bar(precio_vecindario):
+    fig = px.bar(precio_vecindario,
+                 orientation='h',
+                 title='Precio medio de alojamientio para dos huéspedes',
+                 labels={'valor': 'Precio medio por día (Euro)', 'índice': ''},
+                 width=800, height=600)
+    fig.update_layout(
+        xaxis_title='Precio medio por día(Euro)',
+        yaxis_title='',
+        title_font_size=20,
+        xaxis_title_font_size=12,
+        yaxis_title_font_size=12
+    )
+    return fig
+
+
+@traced()
+def seasonal_price_line(seasonal):
+    fig = px.line(seasonal, x='month', y='mean_price', color='neighbourhood',
+                  title='Precio medio por mes según el calendario',
+                  labels={'month': 'Mes', 'mean_price': 'Precio medio por día (Euro)', 'neighbourhood': 'Municipio'},
+                  width=800, height=500)
+    fig.update_layout(title_font_size=20, xaxis_title_font_size=12, yaxis_title_font_size=12)
+    return fig
+
+
+@traced()
+def seasonal_occupancy_line(seasonal):
+    fig = px.line(seasonal, x='month', y='occupancy', color='neighbourhood',
+                  title='Ocupación por mes según el calendario',
+                  labels={'month': 'Mes', 'occupancy': 'Ocupación', 'neighbourhood': 'Municipio'},
+                  width=800, height=500)
+    fig.update_layout(title_font_size=20, xaxis_title_font_size=12, yaxis_title_font_size=12, yaxis_tickformat='.0%')
+    return fig
+
+
+@traced()
+def room_type_pie(freq):
+    fig = px.pie(freq,
+                 values=freq.values,
+                 names=freq.index,
+                 title='Frecuencia de tipos de habitación',
+                 width=800, height=400,
+                 color_discrete_sequence=px.colors.qualitative.Set3)
+    fig.update_layout(title_font_size=20)
+    return fig
+
+
+@traced()
+def property_type_bar(prop, city):
+    fig = px.bar(prop,
+                 x='count',
+                 y='property_type',
+                 color='room_type',
+                 title=f'Tipos de propiedades en {city}',
+                 labels={'count': 'Number of listings', 'property_type': '', 'room_type': 'Room Type'},
+                 orientation='h',
+                 width=900, height=600)
+    fig.update_layout(
+        xaxis_title='Número de propiedades listadas',
+        yaxis_title='',
+        title_font_size=18,
+        xaxis_title_font_size=14,
+        yaxis_title_font_size=14,
+        legend=dict(title='Room Type', font=dict(size=13)),
+        yaxis=dict(tickfont=dict(size=13))
+    )
+    return fig
+
+
+@traced()
+def accommodates_bar(feq):
+    # Con columnas con nombre, también si los filtros no dejan ningún anuncio
+    feq = feq.rename_axis('accommodates').reset_index(name='count')
+    fig = px.bar(feq,
+                 x='accommodates',
+                 y='count',
+                 labels={'accommodates': 'Accommodates', 'count': 'Number of listings'},
+                 title='Accommodates (number of people)',
+                 width=800, height=600)
+    fig.update_layout(
+        xaxis_title='Accommodates',
+        yaxis_title='Number of listings',
+        title_font_size=20,
+        xaxis_title_font_size=12,
+        yaxis_title_font_size=12
+    )
+    return fig
+
+
+# Nube de puntos con un punto por anuncio (columnas accommodates y price)
+@traced()
+def accommodates_price_scatter(nuevo_listings):
+    fig = px.scatter(nuevo_listings,
+                     x='accommodates',
+                     y='price',
+                     color='accommodates',
+                     title='Relación entre Número de Huéspedes y Precio',
+                     labels={'accommodates': 'Número de Huéspedes', 'price': 'Precio (USD)'},
+                     opacity=0.6,
+                     color_continuous_scale='viridis',
+                     width=800, height=600)
+    fig.update_layout(
+        xaxis_title='Número de Huéspedes',
+        yaxis_title='Precio (USD)',
+        title_font_size=16,
+        xaxis_title_font_size=14,
+        yaxis_title_font_size=14
+    )
+    return fig
+
+
+@traced()
+def accommodates_price_bar(mean_price):
+    fig = px.bar(mean_price,
+                 x='accommodates',
+                 y='price',
+                 title='Precio Medio por Número de Huéspedes',
+                 labels={'accommodates': 'Número de Huéspedes', 'price': 'Precio Medio (USD)', 'median_price': 'Precio Mediano (USD)'},
+                 hover_data=['median_price'],
+                 color='price',
+                 color_continuous_scale='viridis',
+                 width=800, height=600)
+    fig.update_layout(
+        xaxis_title='Número de Huéspedes',
+        yaxis_title='Precio Medio (USD)',
+        title_font_size=16,
+        xaxis_title_font_size=14,
+        yaxis_title_font_size=14
+    )
+    return fig
+
+
+@traced()
+def amenities_frequency_bar(frequency):
+    fig = px.bar(frequency, orientation='h',
+                 title='Amenities más frecuentes entre los alojamientos seleccionados',
+                 width=800, height=600)
+    fig.update_layout(xaxis_title='Número de alojamientos', yaxis_title='', showlegend=False,
+                      title_font_size=20, xaxis_title_font_size=12, yaxis_title_font_size=12)
+    return fig
+
+
+@traced()
+def amenities_share_heatmap(share):
+    fig = px.imshow(share, text_auto='.0%', aspect='auto', color_continuous_scale='viridis',
+                    title='Proporción de alojamientos con cada amenity por municipio',
+                    labels={'x': '', 'y': '', 'color': 'Proporción'},
+                    width=900, height=500)
+    fig.update_layout(title_font_size=20, xaxis_tickangle=-45)
+    return fig
+
+
+# Las 10 amenities que más suben el precio y las 10 que más lo bajan
+@traced()
+def amenities_lift_bar(lift):
+    lift = pd.concat([lift.head(10), lift.tail(10)]).drop_duplicates().sort_values('lift')
+    fig = px.bar(lift, x='lift', orientation='h',
+                 title='Precio medio con la amenity frente a sin ella',
+                 labels={'lift': 'Precio con / precio sin', 'index': ''},
+                 hover_data=['listings', 'price_with', 'price_without'],
+                 width=800, height=600)
+    fig.update_layout(yaxis_title='', title_font_size=20, xaxis_title_font_size=12)
+    fig.add_vline(x=1, line_dash='dash')
+    return fig
+
+
+# Histograma ya agrupado de analytics.review_scores_distribution: una barra por intervalo
+@traced()
+def review_scores_histogram(scores):
+    fig = px.bar(scores, x=(scores['start'] + scores['end']) / 2, y='count',
+                 title='Distribución de los Puntajes de Reseñas',
+                 labels={'x': 'Puntaje de Reseñas', 'count': 'Frecuencia'},
+                 hover_data=['start', 'end'])
+    fig.update_traces(width=(scores['end'] - scores['start']).to_numpy())
+    fig.update_layout(showlegend=False, bargap=0, xaxis_title='Puntaje de Reseñas', xaxis_title_font_size=14, yaxis_title_font_size=14)
+    return fig
+
+
+# Histograma a partir de los recuentos de analytics.min_nights_distribution
+@traced()
+def min_nights_histogram(min_nights):
+    fig = px.histogram(min_nights, x='minimum_nights', y='count', nbins=50,
+                       title='Distribución del Número Mínimo de Días para Alquilar un Airbnb (Máximo 50 Días)',
+                       labels={'minimum_nights': 'Número Mínimo de Días', 'count': 'Frecuencia'})
+    fig.update_layout(yaxis_title='Frecuencia', xaxis_title_font_size=14, yaxis_title_font_size=14)
+    return fig
+
+
+# Barras mensuales de analytics.first_review_distribution
+@traced()
+def first_review_histogram(months):
+    fig = px.bar(months, x='month', y='count',
+                 title='Distribución de la Fecha de la Primera Review',
+                 labels={'month': 'Fecha de la primera review', 'count': 'Frecuencia'})
+    fig.update_layout(bargap=0, xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
+    return fig
+
+
+@traced()
+def monthly_reviews_bar(monthly_reviews):
+    fig = px.bar(monthly_reviews, x='month', y='reviews',
+                 title='Número de reseñas por mes',
+                 labels={'month': 'Mes', 'reviews': 'Número de reseñas'})
+    fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
+    return fig
+
+
+# Histograma a partir de los recuentos de analytics.response_time_distribution
+@traced()
+def response_time_histogram(response_time):
+    fig = px.histogram(response_time, x='host_response_time', y='count',
+                       category_orders={'host_response_time': RESPONSE_TIME_ORDER},
+                       title='Distribución del Tiempo de Respuesta del Anfitrión',
+                       labels={'host_response_time': 'Tiempo de Respuesta del Anfitrión', 'count': 'Número de Propiedades'})
+    fig.update_layout(yaxis_title='Número de Propiedades', xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
+    return fig
+
+
+@traced()
+def superhost_bar(count_df):
+    fig = px.bar(count_df, x='Estado', y='Conteo', title='Número de Propiedades por Estado de Superanfitrión',
+                 labels={'Estado': 'Estado de Superanfitrión', 'Conteo': 'Número de Propiedades'},
+                 color_discrete_sequence=['#636EFA'])
+    fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14)
+    return fig
+
+
+@traced()
+def license_bar(count_df):
+    fig = px.bar(count_df, x='Estado', y='Conteo', title='Conteo de Valores para la Licencia',
+                 labels={'Estado': 'Estado', 'Conteo': 'Cantidad'},
+                 color_discrete_sequence=['#636EFA', '#EF553B'])
+    fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14)
+    return fig
+
+
+@traced()
+def superhost_license_bar(count_df):
+    fig = px.bar(count_df, x='Estado', y='Conteo', title='Distribución de Propiedades por Estado del Host y Licencia',
+                 labels={'Estado': 'Estado del Host y Licencia', 'Conteo': 'Número de Propiedades'},
+                 color_discrete_sequence=['#636EFA', '#EF553B', '#00CC96', '#AB63FA'])
+    fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
+    return fig
+
+
+# Barras agrupadas con la proporción de anuncios con licencia de analytics.license_share
+@traced()
+def license_share_bar(share, by):
+    fig = px.bar(share, x=by, y='share', color='superhost', barmode='group',
+                 title='Proporción de Propiedades con Licencia por Estado del Host',
+                 labels={by: '', 'share': 'Propiedades con licencia', 'superhost': 'Estado del Host', 'listings': 'Número de Propiedades'},
+                 hover_data=['listings'],
+                 color_discrete_sequence=['#636EFA', '#00CC96'])
+    fig.update_layout(yaxis_tickformat='.0%', xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
+    return fig
+
+
+# Histograma ya agrupado de analytics.comparable_ratio_distribution, con una línea en 1
+# (mismo precio que los comparables)
+@traced()
+def comparable_ratio_histogram(ratios, k):
+    fig = px.bar(ratios, x=(ratios['start'] + ratios['end']) / 2, y='count',
+                 title=f'Precio frente al precio mediano de los {k} anuncios más parecidos',
+                 labels={'x': 'Precio / precio de los comparables', 'count': 'Número de Propiedades'},
+                 hover_data=['start', 'end'])
+    fig.update_traces(width=(ratios['end'] - ratios['start']).to_numpy())
+    fig.add_vline(x=1, line_dash='dash', line_color='grey')
+    fig.update_layout(showlegend=False, bargap=0, xaxis_title='Precio / precio de los comparables',
+                      xaxis_title_font_size=14, yaxis_title_font_size=14)
+    return fig
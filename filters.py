@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# Índice de mapas de bits para los filtros globales: un bitset por cada valor de los
+# atributos categóricos y, en los numéricos, uno por borde (valor >= borde y valor <= borde).
+# Una combinación de filtros se resuelve con OR dentro de cada atributo y AND entre
+# atributos sobre palabras de 64 bits (n / 64 operaciones), sin volver a recorrer la tabla.
+
+# Atributos categóricos: se filtran por un conjunto de valores
+CATEGORIES = ['neighbourhood', 'room_type', 'host_is_superhost', 'licensed']
+
+# Atributos numéricos: se filtran por un rango [mínimo, máximo] entre estos bordes
+# (accommodates usa sus propios valores como bordes)
+RANGES = {
+    'price': [0, 25, 50, 75, 100, 125, 150, 200, 250, 300, 400, 500, 750, 1000, np.inf],
+    'minimum_nights': [1, 2, 3, 4, 5, 6, 7, 10, 14, 21, 30, 60, 90, 180, 365, np.inf],
+    'accommodates': None,
+}
+
+# Columnas de los anuncios que necesita el índice
+FILTER_COLUMNS = ['neighbourhood', 'room_type', 'host_is_superhost', 'license', 'price', 'minimum_nights', 'accommodates']
+
+# Número de bits a 1 de cada byte (np.bitwise_count solo existe desde NumPy 2)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+# Conjunto de filas como bitset: el bit i de la palabra j es la fila 64 * j + i
+class Bitmap:
+
+    def __init__(self, words, size):
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        padded = np.zeros(-(-len(mask) // 64) * 64, dtype=bool)
+        padded[:len(mask)] = mask
+        return cls(np.packbits(padded, bitorder='little').view('<u8'), len(mask))
+
+    @classmethod
+    def full(cls, size):
+        return cls.from_mask(np.ones(size, dtype=bool))
+
+    def __and__(self, other):
+        return Bitmap(self.words & other.words, self.size)
+
+    def __or__(self, other):
+        return Bitmap(self.words | other.words, self.size)
+
+    def count(self):
+        return int(_POPCOUNT[self.words.view(np.uint8)].sum(dtype=np.int64))
+
+    def to_mask(self):
+        return np.unpackbits(self.words.view(np.uint8), count=self.size, bitorder='little').astype(bool)
+
+    # Posiciones de las filas seleccionadas (para iloc)
+    def rows(self):
+        return np.flatnonzero(self.to_mask())
+
+
+class FilterIndex:
+
+    def __init__(self, size, values, edges, bitmaps):
+        self.size = size
+        self.values = values
+        self.edges = edges
+        self._bitmaps = bitmaps
+
+    @classmethod
+    def from_listings(cls, nuevo_listings):
+        columns = {name: nuevo_listings[name] for name in CATEGORIES if name in nuevo_listings}
+        columns['licensed'] = nuevo_listings['license'].notna()
+        values, edges, bitmaps = {}, {}, {}
+        for name in CATEGORIES:
+            # Los nulos no forman parte de ningún valor: un filtro activo los descarta
+            codes, uniques = pd.factorize(columns[name], sort=True)
+            values[name] = list(uniques)
+            for code, value in enumerate(uniques):
+                bitmaps[(name, value)] = Bitmap.from_mask(codes == code)
+        for name, name_edges in RANGES.items():
+            column = pd.to_numeric(nuevo_listings[name]).to_numpy(dtype=float, na_value=np.nan)
+            if name_edges is None:
+                name_edges = np.unique(column[~np.isnan(column)]).tolist() + [np.inf]
+            edges[name] = list(name_edges)
+            for edge in name_edges:
+                bitmaps[(name, '>=', edge)] = Bitmap.from_mask(column >= edge)
+                bitmaps[(name, '<=', edge)] = Bitmap.from_mask(column <= edge)
+        return cls(len(nuevo_listings), values, edges, bitmaps)
+
+    def __len__(self):
+        return self.size
+
+    # Filas que cumplen todos los filtros. filters es un diccionario (o pares) atributo -> valores:
+    # una lista de valores en los categóricos y (mínimo, máximo) entre los bordes en los numéricos
+    def select(self, filters):
+        selected = Bitmap.full(self.size)
+        for name, choice in dict(filters).items():
+            if name in self.edges:
+                low, high = choice
+                selected = selected & self._bitmaps[(name, '>=', low)] & self._bitmaps[(name, '<=', high)]
+            else:
+                # Un valor sin anuncios en la instantánea (p. ej. "Sin licencia" si todos
+                # la tienen) no tiene bitset: no selecciona ninguna fila
+                empty = Bitmap(np.zeros_like(selected.words), self.size)
+                matches = empty
+                for value in choice:
+                    matches = matches | self._bitmaps.get((name, value), empty)
+                selected = selected & matches
+        return selected
+
+
+# Quitar los filtros que no descartan nada (sin valores elegidos o con el rango completo)
+# y dejarlos como tuplas ordenadas, que sirven de clave de caché
+def active_filters(index, filters):
+    active = []
+    for name, choice in sorted(filters.items()):
+        if name in index.edges:
+            if tuple(choice) != (index.edges[name][0], index.edges[name][-1]):
+                active.append((name, tuple(choice)))
+        elif choice and set(choice) != set(index.values[name]):
+            active.append((name, tuple(choice)))
+    return tuple(active)
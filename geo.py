@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Niveles de zoom para los que se precalculan los clusters
+MIN_ZOOM = 6
+MAX_ZOOM = 17
+
+# Tamaño (en píxeles de pantalla) de la celda que agrupa los puntos
+CELL_PIXELS = 80
+
+
+# Coordenadas en píxeles de Web Mercator (las mismas que usa Leaflet)
+def mercator_pixels(lat, lon, zoom):
+    world = 256 * 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.05, 85.05))
+    x = (lon + 180) / 360 * world
+    y = (1 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2 * world
+    return x, y
+
+
+# Inversa de mercator_pixels: latitud y longitud de unas coordenadas en píxeles
+def mercator_latlon(x, y, zoom):
+    world = 256 * 2 ** zoom
+    lon = np.asarray(x) / world * 360 - 180
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y) / world))))
+    return lat, lon
+
+
+# Agrupar los puntos en celdas de CELL_PIXELS para un nivel de zoom:
+# cada cluster es el centroide de sus puntos y cuántos puntos contiene
+def cluster_points(lat, lon, zoom):
+    x, y = mercator_pixels(lat, lon, zoom)
+    cells = np.stack([(x // CELL_PIXELS).astype(np.int64), (y // CELL_PIXELS).astype(np.int64)], axis=1)
+    _, codes = np.unique(cells, axis=0, return_inverse=True)
+    codes = codes.ravel()
+    count = np.bincount(codes)
+    return pd.DataFrame({
+        'latitude': np.bincount(codes, weights=lat) / count,
+        'longitude': np.bincount(codes, weights=lon) / count,
+        'count': count,
+    })
+
+
+# Pirámide de clusters: un DataFrame por nivel de zoom, calculada una vez por instantánea
+def build_cluster_pyramid(lat, lon):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    lat, lon = lat[valid], lon[valid]
+    return {zoom: cluster_points(lat, lon, zoom) for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)}
+
+
+# Clusters del nivel de zoom pedido que caen dentro de la vista (con un margen
+# para que pequeños desplazamientos no dejen huecos en el borde)
+def clusters_in_view(pyramid, zoom, bounds=None, margin=0.25):
+    zoom = int(np.clip(round(zoom), MIN_ZOOM, MAX_ZOOM))
+    clusters = pyramid[zoom]
+    if bounds is None:
+        return clusters
+    (south, west), (north, east) = bounds
+    lat_pad = (north - south) * margin
+    lon_pad = (east - west) * margin
+    in_view = (clusters['latitude'].between(south - lat_pad, north + lat_pad)
+               & clusters['longitude'].between(west - lon_pad, east + lon_pad))
+    return clusters[in_view]
+
+
+# Límites del mapa a partir de los datos (percentiles para ignorar coordenadas erróneas)
+def map_bounds(lat, lon, quantile=0.005):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    south, north = np.nanquantile(lat, [quantile, 1 - quantile])
+    west, east = np.nanquantile(lon, [quantile, 1 - quantile])
+    return (float(south), float(west)), (float(north), float(east))
@@ -0,0 +1,152 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from cube import build_cube, update_cube
+from hosts import host_sums, update_host_sums
+from ingest import clean_listings, concat_rows, load_snapshot, merge_csvs, price_bounds, write_parquet
+
+# Estructura del almacén histórico:
+#   current.parquet          -> última instantánea limpia (una fila por anuncio)
+#   cube.parquet             -> cubo de agregados de current.parquet
+#   hosts.parquet            -> sumas por host de current.parquet (ver hosts.py)
+#   history/<fecha>.parquet  -> solo las filas añadidas, cambiadas o eliminadas en esa fecha
+#   meta.json                -> fechas ingeridas y límites de precio del almacén
+
+
+# Hash de cada fila; las columnas con listas (amenities) se hashean como texto
+def row_hash(df):
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].map(lambda value: '\x1f'.join(value) if isinstance(value, (list, np.ndarray)) else value)
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+# Tipo común de las columnas que difieren entre dos instantáneas, solo para el hash: las
+# categóricas pasan a la unión de las categorías de ambas (así no se pierden las que
+# desaparecen) y una categórica vacía, que vuelve de Parquet como float, a la categórica
+# de la otra instantánea
+def hash_dtypes(previous, current):
+    dtypes = {}
+    for column in current.columns[previous.dtypes != current.dtypes]:
+        before, after = previous[column].dtype, current[column].dtype
+        if isinstance(before, pd.CategoricalDtype) and isinstance(after, pd.CategoricalDtype):
+            categories = union_categoricals([previous[column], current[column]], ignore_order=True).categories
+            dtypes[column] = pd.CategoricalDtype(categories)
+        else:
+            dtypes[column] = before if isinstance(before, pd.CategoricalDtype) else after
+    return dtypes
+
+
+# Comparar dos instantáneas por id: qué anuncios se añaden, cuáles desaparecen y
+# cuáles cambian (se compara un hash de cada fila en vez de columna a columna)
+def diff_snapshots(previous, current):
+    columns = [c for c in current.columns if c in previous.columns]
+    previous = previous.set_index('id')
+    current = current.set_index('id')
+    columns.remove('id')
+
+    added_ids = current.index.difference(previous.index)
+    removed_ids = previous.index.difference(current.index)
+    common_ids = current.index.intersection(previous.index)
+
+    # previous se devuelve tal cual: los anuncios eliminados o cambiados conservan sus valores
+    dtypes = hash_dtypes(previous[columns], current[columns])
+    previous_hash = row_hash(previous.loc[common_ids, columns].astype(dtypes))
+    current_hash = row_hash(current.loc[common_ids, columns].astype(dtypes))
+    changed_ids = common_ids[previous_hash != current_hash]
+
+    return {
+        'added': current.loc[added_ids].reset_index(),
+        'removed': previous.loc[removed_ids].reset_index(),
+        'changed': current.loc[changed_ids].reset_index(),
+        'changed_before': previous.loc[changed_ids].reset_index(),
+    }
+
+
+def load_meta(store_dir):
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return {'snapshots': []}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def save_meta(store_dir, meta):
+    tmp_path = os.path.join(store_dir, f'meta.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(store_dir, 'meta.json'))
+
+
+# Ingerir una nueva instantánea en el almacén escribiendo solo lo que ha cambiado
+def ingest_snapshot(listings_path, listings_data_path, store_dir, snapshot_date):
+    meta = load_meta(store_dir)
+    if snapshot_date in meta['snapshots']:
+        raise ValueError(f'La instantánea {snapshot_date} ya está en {store_dir}')
+    if meta['snapshots'] and snapshot_date < meta['snapshots'][-1]:
+        raise ValueError(f'La instantánea {snapshot_date} es anterior a {meta["snapshots"][-1]}')
+
+    os.makedirs(os.path.join(store_dir, 'history'), exist_ok=True)
+    raw = merge_csvs(listings_path, listings_data_path)
+    current_path = os.path.join(store_dir, 'current.parquet')
+    cube_path = os.path.join(store_dir, 'cube.parquet')
+    hosts_path = os.path.join(store_dir, 'hosts.parquet')
+
+    # Los límites del recorte de precios se fijan con la primera instantánea para que
+    # las filas limpiadas en distintas ingestas sigan siendo comparables y sumables
+    if 'price_bounds' not in meta:
+        lower_bound, upper_bound = price_bounds(raw['price'])
+        meta['price_bounds'] = [float(lower_bound), float(upper_bound)]
+        meta['price_fill'] = float(raw['price'].clip(lower_bound, upper_bound).mean())
+    nuevo_listings = clean_listings(raw, bounds=meta['price_bounds'], fill_value=meta['price_fill'])
+
+    if os.path.exists(current_path):
+        previous = load_snapshot(current_path)
+        diff = diff_snapshots(previous, nuevo_listings)
+        removed = concat_rows([diff['removed'], diff['changed_before']], diff['removed'])
+        added = concat_rows([diff['added'], diff['changed']], diff['added'])
+        cube = update_cube(load_snapshot(cube_path), removed, added, nuevo_listings)
+        hosts = update_host_sums(load_snapshot(hosts_path), removed, added)
+    else:
+        diff = {'added': nuevo_listings, 'removed': nuevo_listings.iloc[:0],
+                'changed': nuevo_listings.iloc[:0]}
+        cube = build_cube(nuevo_listings)
+        hosts = host_sums(nuevo_listings).reset_index()
+
+    # Historial de solo escritura: una parte por fecha con el tipo de cambio de cada fila
+    changes = concat_rows([diff[kind].assign(change_type=kind) for kind in ('added', 'changed', 'removed')],
+                          diff['added'].assign(change_type='added'), ignore_index=True)
+    changes['snapshot_date'] = snapshot_date
+    write_parquet(changes, os.path.join(store_dir, 'history', f'{snapshot_date}.parquet'))
+
+    write_parquet(nuevo_listings, current_path)
+    write_parquet(cube, cube_path)
+    write_parquet(hosts, hosts_path)
+    meta['snapshots'].append(snapshot_date)
+    save_meta(store_dir, meta)
+    return {kind: len(diff[kind]) for kind in ('added', 'changed', 'removed')}
+
+
+# Reconstruir el estado de los anuncios en una fecha a partir del historial
+def listings_as_of(store_dir, snapshot_date):
+    meta = load_meta(store_dir)
+    dates = [d for d in meta['snapshots'] if d <= snapshot_date]
+    parts = [load_snapshot(os.path.join(store_dir, 'history', f'{d}.parquet')) for d in dates]
+    if not parts:
+        raise ValueError(f'No hay instantáneas anteriores a {snapshot_date} en {store_dir}')
+    changes = concat_rows(parts, parts[0], ignore_index=True)
+    latest = changes.drop_duplicates('id', keep='last')
+    latest = latest[latest['change_type'] != 'removed']
+    return latest.drop(columns=['change_type', 'snapshot_date']).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    # python history.py listings.csv listings_data.csv carpeta_almacen 2024-06-30
+    if len(sys.argv) != 5:
+        sys.exit('Uso: python history.py <listings.csv> <listings_data.csv> <carpeta_almacen> <fecha>')
+    print(ingest_snapshot(*sys.argv[1:]))
@@ -0,0 +1,109 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from ingest import write_parquet
+
+HOSTS_VERSION = 1
+
+# Columnas de los anuncios que necesita el índice
+HOST_COLUMNS = ['host_id', 'host_name', 'review_scores_rating', 'host_is_superhost', 'license']
+
+# Sumas por host: al ser sumas, se pueden restar y sumar al llegar una instantánea nueva
+SUMS = ['listings', 'rating_sum', 'rating_count', 'superhost_listings', 'licensed']
+
+# Criterios de orden del ranking (siempre de mayor a menor)
+SORT_KEYS = ['listings', 'average_rating', 'license_share']
+
+
+# Aportación de cada host en un conjunto de anuncios, en una sola pasada con np.bincount
+def host_sums(nuevo_listings):
+    codes, host_ids = pd.factorize(nuevo_listings['host_id'])
+    valid = codes >= 0
+    codes = codes[valid]
+    size = len(host_ids)
+
+    def total(values):
+        return np.bincount(codes, weights=np.asarray(values, dtype=float)[valid], minlength=size)
+
+    rating = nuevo_listings['review_scores_rating'].to_numpy(dtype=float, na_value=np.nan)
+    rated = ~np.isnan(rating)
+    _, first = np.unique(codes, return_index=True)
+    sums = pd.DataFrame({
+        'host_name': nuevo_listings['host_name'].to_numpy(dtype=object)[valid][first],
+        'listings': np.bincount(codes, minlength=size),
+        'rating_sum': total(np.where(rated, rating, 0)),
+        'rating_count': total(rated).astype(np.int64),
+        'superhost_listings': total(nuevo_listings['host_is_superhost'].fillna(False)).astype(np.int64),
+        'licensed': total(nuevo_listings['license'].notna()).astype(np.int64),
+    }, index=pd.Index(host_ids, name='host_id'))
+    return sums
+
+
+# Actualizar las sumas sin recalcularlas: restar las filas que salen y sumar las que
+# entran (mismo esquema que update_cube en cube.py)
+def update_host_sums(sums, removed, added):
+    sums = sums.set_index('host_id') if 'host_id' in sums.columns else sums
+    removed, added = host_sums(removed), host_sums(added)
+    updated = sums[SUMS].sub(removed[SUMS], fill_value=0).add(added[SUMS], fill_value=0)
+    updated = updated[updated['listings'] > 0].astype({column: sums[column].dtype for column in SUMS})
+    # El nombre más reciente de cada host
+    updated.insert(0, 'host_name', added['host_name'].combine_first(sums['host_name']).reindex(updated.index))
+    return updated.reset_index()
+
+
+# Ranking de hosts: número de anuncios, nota media, superhost y proporción de anuncios con
+# licencia. Los órdenes se calculan una vez al crear el índice, así que el top-K, la
+# paginación y la búsqueda por nombre solo tocan las filas que se devuelven
+class HostIndex:
+
+    def __init__(self, sums):
+        sums = sums.set_index('host_id') if 'host_id' in sums.columns else sums
+        self.table = pd.DataFrame({
+            'host_name': sums['host_name'],
+            'listings': sums['listings'],
+            'average_rating': sums['rating_sum'] / sums['rating_count'].where(sums['rating_count'] > 0),
+            'superhost': sums['superhost_listings'] > 0,
+            'license_share': sums['licensed'] / sums['listings'],
+        })
+        self._names = self.table['host_name'].fillna('').astype(str).str.lower()
+        self._orders = {}
+        for key in SORT_KEYS:
+            # Sin nota al final; a igualdad, más anuncios primero
+            values = self.table[key].fillna(-np.inf).to_numpy()
+            self._orders[key] = np.lexsort((-self.table['listings'].to_numpy(), -values))
+
+    def __len__(self):
+        return len(self.table)
+
+    # Máscara de los hosts cuyo nombre contiene el texto buscado (sin distinguir mayúsculas)
+    def search(self, query):
+        return self._names.str.contains(query.lower(), regex=False).to_numpy()
+
+    def _positions(self, by, query=None):
+        order = self._orders[by]
+        if query:
+            order = order[self.search(query)[order]]
+        return order
+
+    # Número de hosts que coinciden con la búsqueda
+    def count(self, query=None):
+        return int(self.search(query).sum()) if query else len(self)
+
+    def top(self, k=10, by='listings'):
+        return self.table.iloc[self._orders[by][:k]]
+
+    # Una página del ranking (empezando en 0) y el número total de hosts que coinciden
+    def page(self, number, page_size=50, by='listings', query=None):
+        positions = self._positions(by, query)
+        return self.table.iloc[positions[number * page_size:(number + 1) * page_size]], len(positions)
+
+
+# Calcular las sumas por host una vez por instantánea limpia y guardarlas a su lado
+def build_host_snapshot(clean_path):
+    hosts_path = clean_path.replace('.parquet', f'.hosts-v{HOSTS_VERSION}.parquet')
+    if not os.path.exists(hosts_path):
+        nuevo_listings = pd.read_parquet(clean_path, columns=HOST_COLUMNS)
+        write_parquet(host_sums(nuevo_listings).reset_index(), hosts_path)
+    return hosts_path
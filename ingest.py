@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schema import SCHEMA_VERSION, apply_schema
+from sketches import TDigest, build_sketch_snapshot
+from tracing import traced
+
+# Columnas del fichero detallado (listings_data.csv) que usamos en el análisis
+TARGET_COLUMNS = ["id", "property_type", "accommodates", "first_review", "review_scores_value", "review_scores_cleanliness", "review_scores_location", "review_scores_accuracy", "review_scores_communication", "review_scores_checkin", "review_scores_rating", "maximum_nights", "host_is_superhost", "host_about", "host_response_time", "host_response_rate", "amenities"]
+
+
+# Hash del contenido de los CSV de origen: identifica la instantánea
+def snapshot_hash(*paths, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+# Escribir en un fichero temporal para que otro proceso nunca lea uno a medias
+def write_parquet(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# Concatenar filas dejando fuera los frames vacíos, que pandas ya no tendrá en cuenta
+# para el tipo de cada columna (y avisa con un FutureWarning); empty se devuelve si no
+# queda ninguno
+def concat_rows(frames, empty, **kwargs):
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, **kwargs) if frames else empty
+
+
+# Leer los dos CSV, unirlos por id y aplicar el esquema (ver schema.py)
+@traced()
+def merge_csvs(listings_path, listings_data_path):
+    listings = pd.read_csv(listings_path)
+    # Solo se parsean las columnas que necesitamos del fichero ancho
+    listings_data = pd.read_csv(listings_data_path, usecols=TARGET_COLUMNS)
+    return apply_schema(pd.merge(listings, listings_data, on='id', how='left'))
+
+
+# Unir los dos CSV una sola vez y guardar el resultado en Parquet
+@traced()
+def build_snapshot(listings_path, listings_data_path, cache_dir):
+    key = snapshot_hash(listings_path, listings_data_path)
+    snapshot_path = os.path.join(cache_dir, f'{key}.schema-v{SCHEMA_VERSION}.parquet')
+    if os.path.exists(snapshot_path):
+        return snapshot_path
+
+    nuevo_listings = merge_csvs(listings_path, listings_data_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    write_parquet(nuevo_listings, snapshot_path)
+    return snapshot_path
+
+
+# Versión de la limpieza: cambiarla invalida las instantáneas limpias ya guardadas
+CLEAN_VERSION = 2
+
+
+# Límites del recorte de precios por el rango intercuartílico. Los cuartiles salen de un
+# t-digest (ver sketches.py), así que también se pueden calcular a partir del sketch ya
+# combinado de varias instantáneas o ciudades sin leer sus precios
+def price_bounds(price):
+    digest = price if isinstance(price, TDigest) else TDigest.from_values(price)
+    Q1, Q3 = digest.quantile([0.25, 0.75])
+
+    IQR = Q3 - Q1
+
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    return lower_bound, upper_bound
+
+
+# Eliminar columnas sin uso y recortar los outliers de precio. Los límites y el valor
+# de relleno se pueden fijar desde fuera (p. ej. para limpiar solo las filas nuevas)
+@traced()
+def clean_listings(nuevo_listings, bounds=None, fill_value=None):
+    nuevo_listings = nuevo_listings.drop(columns=['last_review', 'reviews_per_month'])
+
+    lower_bound, upper_bound = bounds if bounds is not None else price_bounds(nuevo_listings['price'])
+    price = nuevo_listings['price'].clip(lower_bound, upper_bound)
+    nuevo_listings['price'] = price.fillna(price.mean() if fill_value is None else fill_value)
+    return nuevo_listings
+
+
+# Limpiar la instantánea una sola vez y guardarla junto a la original
+@traced()
+def build_clean_snapshot(snapshot_path):
+    clean_path = snapshot_path.replace('.parquet', f'.clean-v{CLEAN_VERSION}.parquet')
+    if os.path.exists(clean_path):
+        return clean_path
+
+    nuevo_listings = clean_listings(load_snapshot(snapshot_path))
+    write_parquet(nuevo_listings, clean_path)
+    return clean_path
+
+
+# Leer la instantánea (opcionalmente solo algunas columnas) con memory-map
+@traced()
+def load_snapshot(snapshot_path, columns=None, exclude=()):
+    if exclude:
+        columns = [c for c in columns or pq.read_schema(snapshot_path).names if c not in exclude]
+    table = pq.read_table(snapshot_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+if __name__ == '__main__':
+    # python ingest.py listings.csv listings_data.csv carpeta_cache
+    if len(sys.argv) != 4:
+        sys.exit('Uso: python ingest.py <listings.csv> <listings_data.csv> <carpeta_cache>')
+    clean_path = build_clean_snapshot(build_snapshot(*sys.argv[1:]))
+    build_sketch_snapshot(clean_path)
+    print(clean_path)
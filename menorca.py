@@ -1,85 +1,369 @@
-import matplotlib.pyplot as plt
-import numpy as np
+import os
+
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import seaborn as sns
 import streamlit as st
-import folium
-from folium.plugins import FastMarkerCluster
-from streamlit_folium import st_folium
+
+# Solo los módulos que necesitan todas las páginas; el resto (plotly, folium, scipy...)
+# se importa dentro de la página o del cargador que lo usa
+import analytics
+import tracing
+from cube import DIMENSIONS, build_cube, build_cube_snapshot
+from dataset import SnapshotDataset
+from figcache import DEFAULT_MAX_BYTES, FigureCache, figure_key
+from filters import FILTER_COLUMNS, FilterIndex, active_filters
+from ingest import build_clean_snapshot, build_snapshot, load_snapshot, snapshot_hash
+from sketches import DIGEST_COLUMNS, HISTOGRAM_EDGES, build_sketch_snapshot, build_sketches, load_sketches
+from store import find_partition, list_partitions, load_published_series
+
+# Copy-on-Write: las páginas nunca modifican los datos compartidos (por defecto en pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 # --------------------CONFIGURACIÓN DE LA PÁGINA----------------------------#
 # layout="centered" or "wide".
 st.set_page_config(page_title='Análisis: AirBnbs de Menorca', layout='wide', page_icon='👋')
+
+# Perfil de cada ejecución (ver tracing.py): se activa desde el menú lateral o exportando
+# las trazas a un fichero JSON lines con MENORCA_TRACE_FILE
+TRACE_FILE = os.environ.get('MENORCA_TRACE_FILE')
+# Descartar la traza de una ejecución interrumpida (p. ej. por st.rerun) en este mismo hilo
+tracing.stop_trace()
+if TRACE_FILE or st.session_state.get('profile'):
+    tracing.start_trace('menorca')
+
 image_path = r'C:\Users\maarp\OneDrive\Escritorio\bootcamp_data\14_Data_Storytelling\MENORCA HEAD.png'
 
 # Mostrar la imagen de cabecera
 st.image(image_path, use_column_width=True)
 
-# Cargar los datos
-@st.cache_data
-def load_data():
-    listings = pd.read_csv(r'C:\Users\maarp\OneDrive\Escritorio\bootcamp_data\14_Data_Storytelling\data\listings.csv')
-    listings_data = pd.read_csv(r'C:\Users\maarp\OneDrive\Escritorio\bootcamp_data\14_Data_Storytelling\data\listings_data.csv')
-    target_columns = ["id", "property_type", "accommodates", "first_review", "review_scores_value", "review_scores_cleanliness", "review_scores_location", "review_scores_accuracy", "review_scores_communication", "review_scores_checkin", "review_scores_rating", "maximum_nights", "host_is_superhost", "host_about", "host_response_time", "host_response_rate", "amenities"]
-    nuevo_listings = pd.merge(listings, listings_data[target_columns], on='id', how='left')
-    return nuevo_listings
-
-# Cargar los datos
-nuevo_listings = load_data()
-
-# Crear un menú lateral
-st.sidebar.title("Menú")
-option = st.sidebar.selectbox(
-    "¿Qué quieres ver?",
-    ["Inicio", "Análisis de las Propiedades", "Análisis de los Hosts", "Conclusión"]
-)
+# Carpeta con los CSV de Inside Airbnb y la caché de instantáneas en Parquet
+DATA_DIR = os.environ.get('MENORCA_DATA_DIR', r'C:\Users\maarp\OneDrive\Escritorio\bootcamp_data\14_Data_Storytelling\data')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 
-# Importar datos y eliminar outliers
-nuevo_listings.dropna(axis=1, how='all')
+# Almacén particionado por ciudad e instantánea (ver store.py). Si está vacío se usan
+# directamente los CSV de DATA_DIR como hasta ahora
+STORE_DIR = os.environ.get('AIRBNB_STORE_DIR', os.path.join(DATA_DIR, 'store'))
+DEFAULT_CITY = 'Menorca'
 
-nuevo_listings.drop('last_review', axis=1, inplace=True)
-nuevo_listings.drop('reviews_per_month', axis=1, inplace=True)
+# Span de cada cargador con cache='hit', salvo que la función cacheada se llegue a ejecutar
+# (la primera línea de cada cargador la marca como cache='miss')
+def loader(cached):
+    return tracing.traced(cached.__name__, cache='hit')(cached)
 
-nuevo_listings.drop(columns=["neighbourhood"])
-
-
-Q1 = nuevo_listings['price'].quantile(0.25)
-Q3 = nuevo_listings['price'].quantile(0.75)
-
-IQR = Q3 - Q1
-
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
-
-nuevo_listings['price'] = nuevo_listings['price'].apply(lambda x: lower_bound if x < lower_bound else upper_bound if x > upper_bound else x)
+# La unión y la limpieza se hacen una vez por instantánea (ver ingest.py)
+@loader
+@st.cache_data
+def load_clean_path():
+    tracing.annotate(cache='miss')
+    snapshot_path = build_snapshot(os.path.join(DATA_DIR, 'listings.csv'),
+                                   os.path.join(DATA_DIR, 'listings_data.csv'),
+                                   CACHE_DIR)
+    return build_clean_snapshot(snapshot_path)
+
+# Ciudades e instantáneas publicadas; se refresca cada pocos minutos para ver las nuevas
+@loader
+@st.cache_data(ttl=300)
+def load_partitions():
+    tracing.annotate(cache='miss')
+    return list_partitions(STORE_DIR)
+
+@loader
+@st.cache_data(ttl=300)
+def load_partition_path(city, snapshot):
+    tracing.annotate(cache='miss')
+    return find_partition(STORE_DIR, city, snapshot)
+
+# Cargar los datos: una sola instancia por proceso y partición, compartida por todas las
+# sesiones (st.cache_resource no copia el objeto en cada rerun como st.cache_data; ver dataset.py)
+@loader
+@st.cache_resource
+def load_dataset(clean_path):
+    tracing.annotate(cache='miss')
+    # amenities y host_about no se usan en las páginas y son las columnas más pesadas
+    return SnapshotDataset(clean_path, exclude=['amenities', 'host_about'])
+
+# Índice de bitsets de los filtros globales del menú lateral (ver filters.py)
+@loader
+@st.cache_resource
+def load_filter_index(clean_path):
+    tracing.annotate(cache='miss')
+    return FilterIndex.from_listings(load_dataset(clean_path).frame(FILTER_COLUMNS))
+
+# Columnas de los anuncios que cumplen los filtros (todos si no hay filtros activos)
+def filtered_listings(clean_path, filters, columns):
+    nuevo_listings = load_dataset(clean_path).frame(columns)
+    if not filters:
+        return nuevo_listings
+    return nuevo_listings.iloc[load_filter_index(clean_path).select(filters).rows()]
+
+# Los cargadores que dependen de los filtros guardan como mucho este número de combinaciones
+FILTER_CACHE_ENTRIES = 32
+
+# Hash del fichero limpio: identifica la instantánea en las claves de la caché de gráficas
+@loader
+@st.cache_data
+def load_dataset_hash(clean_path):
+    tracing.annotate(cache='miss')
+    return snapshot_hash(clean_path)
+
+# Caché de gráficas ya renderizadas, compartida por todas las sesiones (ver figcache.py):
+# en memoria hasta MENORCA_FIGURE_CACHE_MB y, si existe la carpeta (se precalienta con
+# report.py --figure-cache), también en disco
+FIGURE_CACHE_DIR = os.environ.get('MENORCA_FIGURE_CACHE_DIR', os.path.join(CACHE_DIR, 'figures'))
+FIGURE_CACHE_BYTES = int(os.environ.get('MENORCA_FIGURE_CACHE_MB', DEFAULT_MAX_BYTES // 1024 ** 2)) * 1024 ** 2
+
+@loader
+@st.cache_resource
+def load_figure_cache():
+    tracing.annotate(cache='miss')
+    return FigureCache(FIGURE_CACHE_BYTES, FIGURE_CACHE_DIR if os.path.isdir(FIGURE_CACHE_DIR) else None)
+
+# Cargar el cubo de agregados (ver cube.py). Sin filtros se usa el precalculado de la
+# instantánea; con filtros se construye a partir de las filas seleccionadas
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_cube(clean_path, filters=()):
+    tracing.annotate(cache='miss')
+    if not filters:
+        return load_snapshot(build_cube_snapshot(clean_path))
+    return build_cube(filtered_listings(clean_path, filters, DIMENSIONS + ['price']))
+
+# Series mensuales por anuncio a partir de los ficheros detallados (ver timeseries.py):
+# las publicadas con la partición o, sin almacén, las de los CSV de DATA_DIR.
+# Devuelven None si no hay datos de calendario o reseñas
+@loader
+@st.cache_resource
+def load_calendar(clean_path, published):
+    from timeseries import load_series, reduce_calendar
+    tracing.annotate(cache='miss')
+    if published:
+        return load_published_series(clean_path, 'calendar')
+    return load_series(os.path.join(DATA_DIR, 'calendar.csv.gz'), reduce_calendar, CACHE_DIR)
+
+@loader
+@st.cache_resource
+def load_reviews(clean_path, published):
+    from timeseries import load_series, reduce_reviews
+    tracing.annotate(cache='miss')
+    if published:
+        return load_published_series(clean_path, 'reviews')
+    return load_series(os.path.join(DATA_DIR, 'reviews.csv.gz'), reduce_reviews, CACHE_DIR)
+
+# Histogramas y cuantiles precalculados de la instantánea (ver sketches.py): las páginas
+# de distribuciones envían a Plotly recuentos por barra en lugar de una fila por anuncio
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_snapshot_sketches(clean_path, filters=()):
+    tracing.annotate(cache='miss')
+    if not filters:
+        return load_sketches(build_sketch_snapshot(clean_path))
+    columns = list(dict.fromkeys(list(HISTOGRAM_EDGES) + DIGEST_COLUMNS))
+    return build_sketches(filtered_listings(clean_path, filters, columns))
+
+# Índice disperso de amenities (ver amenities.py)
+@loader
+@st.cache_resource
+def load_amenities(clean_path):
+    from amenities import build_amenities_snapshot, load_amenities_index
+    tracing.annotate(cache='miss')
+    return load_amenities_index(build_amenities_snapshot(clean_path))
+
+# Ranking de hosts (ver hosts.py)
+HOSTS_PAGE_SIZE = 50
+
+@loader
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def load_hosts(clean_path, filters=()):
+    from hosts import HOST_COLUMNS, HostIndex, build_host_snapshot, host_sums
+    tracing.annotate(cache='miss')
+    if not filters:
+        return HostIndex(load_snapshot(build_host_snapshot(clean_path)))
+    return HostIndex(host_sums(filtered_listings(clean_path, filters, HOST_COLUMNS)))
+
+# Tabla de contingencia superhost x licencia x municipio x tipo de habitación (ver contingency.py)
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_host_license_table(clean_path, filters=()):
+    tracing.annotate(cache='miss')
+    return analytics.host_license_table(filtered_listings(clean_path, filters, analytics.HOST_LICENSE_COLUMNS))
+
+# Clusters del mapa por nivel de zoom y límites del mapa (ver geo.py)
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_map_pyramid(clean_path, filters=()):
+    from geo import build_cluster_pyramid
+    tracing.annotate(cache='miss')
+    nuevo_listings = filtered_listings(clean_path, filters, ['latitude', 'longitude'])
+    return build_cluster_pyramid(nuevo_listings['latitude'], nuevo_listings['longitude'])
+
+@loader
+@st.cache_data
+def load_map_bounds(clean_path):
+    from geo import map_bounds
+    tracing.annotate(cache='miss')
+    nuevo_listings = load_dataset(clean_path).frame(['latitude', 'longitude'])
+    return map_bounds(nuevo_listings['latitude'], nuevo_listings['longitude'])
+
+# Capas de coropletas del mapa (ver spatial.py), ya como GeoJSON con las métricas de cada
+# hexágono o barrio. Sin filtros salen de los agregados precalculados de la instantánea
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_hex_layer(clean_path, filters=()):
+    from spatial import SPATIAL_COLUMNS, build_hex_snapshot, hex_geojson, hex_layer
+    tracing.annotate(cache='miss')
+    if not filters:
+        return hex_geojson(load_snapshot(build_hex_snapshot(clean_path)))
+    return hex_geojson(hex_layer(filtered_listings(clean_path, filters, SPATIAL_COLUMNS)))
+
+# Barrios del GeoJSON: la unión punto en polígono se hace una vez por instantánea y con
+# filtros solo se vuelven a agregar las filas seleccionadas
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_area_layer(clean_path, geojson_path, filters=()):
+    from spatial import SPATIAL_COLUMNS, area_geojson, area_layer, build_area_snapshot, read_neighbourhoods
+    tracing.annotate(cache='miss')
+    codes = load_snapshot(build_area_snapshot(clean_path, geojson_path))['area'].to_numpy()
+    if filters:
+        codes = codes[load_filter_index(clean_path).select(filters).rows()]
+    neighbourhoods = read_neighbourhoods(geojson_path)
+    return area_geojson(area_layer(codes, filtered_listings(clean_path, filters, SPATIAL_COLUMNS), neighbourhoods),
+                        neighbourhoods)
+
+# KD-tree de anuncios comparables (ver comparables.py), compartido por todas las sesiones
+@loader
+@st.cache_resource
+def load_comparables(clean_path):
+    from comparables import build_comparables_snapshot, load_comparables_index
+    tracing.annotate(cache='miss')
+    return load_comparables_index(build_comparables_snapshot(clean_path))
+
+# Precio de todos los anuncios frente a sus k comparables, en una sola consulta por lotes
+@loader
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def load_price_estimates(clean_path, k):
+    tracing.annotate(cache='miss')
+    return load_comparables(clean_path).price_estimates(k=k)
 
-nuevo_listings['price'].fillna(nuevo_listings['price'].mean(), inplace=True)
+# Crear un menú lateral
+st.sidebar.title("Menú")
 
+# Elegir ciudad e instantánea: solo se carga la partición seleccionada
+partitions = load_partitions()
+published = len(partitions) > 0
+if published:
+    cities = sorted(partitions['city'].unique())
+    city = st.sidebar.selectbox("Ciudad", cities, index=cities.index(DEFAULT_CITY) if DEFAULT_CITY in cities else 0)
+    snapshots = sorted(partitions.loc[partitions['city'] == city, 'snapshot'], reverse=True)
+    snapshot = st.sidebar.selectbox("Instantánea", snapshots)
+    clean_path = load_partition_path(city, snapshot)
+else:
+    city = DEFAULT_CITY
+    clean_path = load_clean_path()
+
+# Cargar los datos; cada página pide solo las columnas que usa
+dataset = load_dataset(clean_path)
+
+# Barrios de la ciudad en GeoJSON: los publicados con la partición o el de DATA_DIR (opcional)
+geojson_path = os.path.join(os.path.dirname(clean_path) if published else DATA_DIR, 'neighbourhoods.geojson')
+if not os.path.exists(geojson_path):
+    geojson_path = None
+
+# Filtros globales: todas las gráficas muestran solo los anuncios que los cumplen. Cada
+# combinación se resuelve con el índice de bitsets, sin recorrer la tabla
+filter_index = load_filter_index(clean_path)
+HOST_CHOICES = {'Todos': [], 'Solo superhosts': [True], 'Sin superhost': [False]}
+LICENSE_CHOICES = {'Todos': [], 'Con licencia': [True], 'Sin licencia': [False]}
+
+def edge_label(edge):
+    return 'sin límite' if edge == float('inf') else f'{edge:g}'
+
+def range_slider(label, name):
+    edges = filter_index.edges[name]
+    return st.select_slider(label, options=edges, value=(edges[0], edges[-1]), format_func=edge_label,
+                            key=f'filtro:{name}:{clean_path}')
+
+with st.sidebar.expander("Filtros"):
+    filters = active_filters(filter_index, {
+        'neighbourhood': st.multiselect("Municipio", filter_index.values['neighbourhood'], key=f'filtro:neighbourhood:{clean_path}'),
+        'room_type': st.multiselect("Tipo de habitación", filter_index.values['room_type'], key=f'filtro:room_type:{clean_path}'),
+        'price': range_slider("Precio por noche", 'price'),
+        'accommodates': range_slider("Huéspedes", 'accommodates'),
+        'minimum_nights': range_slider("Estancia mínima (noches)", 'minimum_nights'),
+        'host_is_superhost': HOST_CHOICES[st.radio("Superhost", list(HOST_CHOICES), horizontal=True)],
+        'licensed': LICENSE_CHOICES[st.radio("Licencia", list(LICENSE_CHOICES), horizontal=True)],
+    })
+selection = filter_index.select(filters) if filters else None
+if selection is not None:
+    st.sidebar.caption(f"{selection.count()} de {len(filter_index)} anuncios cumplen los filtros")
+
+# Los comentarios de las gráficas describen los datos de Menorca sin filtrar: solo se
+# muestran para esa isla y sin filtros
+def menorca_markdown(text):
+    if city == DEFAULT_CITY and not filters:
+        st.markdown(text)
+
+
+# Registro de páginas: cada sección del menú lateral y cada subpágina es una función.
+# Las librerías pesadas (plotly, folium, scipy...) se importan dentro de la página que
+# las usa, así cada ejecución solo paga las importaciones de la página que se está viendo
+SECTIONS = {}
+PAGES = {}
+
+def section(name):
+    def register(render):
+        SECTIONS[name] = tracing.traced(f'sección {name}')(render)
+        PAGES.setdefault(name, {})
+        return render
+    return register
+
+def page(section_name, name):
+    def register(render):
+        PAGES.setdefault(section_name, {})[name] = tracing.traced(f'página {name}')(render)
+        return render
+    return register
+
+# Gráfica o mapa ya serializado de la caché de gráficas (ver figcache.py); render() solo
+# se llama si no está guardado. La clave es la instantánea, la página que se está viendo
+# (option y sub_choice), los filtros activos, el nombre de la gráfica y state
+def cached_render(name, render, state=()):
+    key = figure_key(load_dataset_hash(clean_path), city, option, sub_choice, filters, name, state)
+    return load_figure_cache().render(key, render)
+
+# Mostrar una gráfica de Plotly en su propio span: build() construye la figura solo si no
+# está en la caché de gráficas. La figura se recupera del JSON guardado (Streamlit aún la
+# vuelve a serializar, pero sin Plotly Express ni los cálculos de la página)
+def plotly_chart(name, build, state=()):
+    import plotly.io as pio
+
+    with tracing.span('st.plotly_chart', chart=name) as current:
+        spec, level = cached_render(name, lambda: build().to_json(), state)
+        st.plotly_chart(pio.from_json(spec))
+    if current is not None:
+        current.attributes.update(cache=level, payload_bytes=len(spec))
 
 # Mostrar Inicio
-if option == "Inicio":
-    st.title('Análisis exploratorio: AirBnbs de Menorca')
+@section("Inicio")
+def home_page():
+    st.title(f'Análisis exploratorio: AirBnbs de {city}')
     st.subheader('Indagando en datos sobre distribución geográfica, los huéspedes y los hosts')
 
     st.header('Introducción')
-    st.markdown("""
-        Vamos a realizar la visualización y análisis de los datos de Menorca extraídos de 
+    st.markdown(f"""
+        Vamos a realizar la visualización y análisis de los datos de {city} extraídos de 
         Insideairbnb.com, un sitio web en el que se publican conjuntos de datos extraídos de la 
         web de "instantáneas" de diferentes ciudades
         """)
-    st.markdown("""
-        Este análisis tiene como objetivo comprender la oferta de Airbnb en Menorca, identificar 
+    st.markdown(f"""
+        Este análisis tiene como objetivo comprender la oferta de Airbnb en {city}, identificar 
         patrones de precios y disponibilidad, y evaluar el impacto del turismo en la isla.
         """)
     st.markdown('---')
     
-    st.markdown("""
-        En esta aplicación podrás explorar diversos aspectos relacionados con las propiedades y los hosts en Menorca.
+    st.markdown(f"""
+        En esta aplicación podrás explorar diversos aspectos relacionados con las propiedades y los hosts en {city}.
         Utiliza el menú lateral y superior para navegar entre las diferentes secciones del análisis. Los archivos con los que vamos a trabajar son los siguientes:
         """)
-    st.markdown("""
+    st.markdown(f"""
                 
                 `listings.csv.gz`: Detailed Listings data
                 
@@ -87,7 +371,7 @@ if option == "Inicio":
                 
                 `reviews.csv.gz`: Detailed Review Data
                 
-                `listings.csv`: Summary information and metrics for listings in Menorca (good for visualisations)
+                `listings.csv`: Summary information and metrics for listings in {city} (good for visualisations)
                 
                 `reviews.csv`: Summary Review data and Listing ID (to facilitate time based analytics and visualisations linked to a listing)
                 
@@ -97,430 +381,495 @@ if option == "Inicio":
                 """)
 
 # Mostrar Propiedades
-elif option == "Análisis de las Propiedades":
-    st.title("Análisis Exploratorio de los AirBnb de Menorca")
+@section("Análisis de las Propiedades")
+def properties_section():
+    st.title(f"Análisis Exploratorio de los AirBnb de {city}")
+
+@page("Análisis de las Propiedades", "Mapa")
+def map_page():
+    import folium
+    import numpy as np
+    import streamlit.components.v1 as components
+    from streamlit_folium import st_folium
+
+    from geo import clusters_in_view
+    from spatial import METRICS, choropleth_map
+
+    st.title(f"Mapa de los AirBnb de {city}")
+
+    # Capa del mapa: clusters de anuncios o coropletas por hexágono o por barrio (si hay GeoJSON)
+    layers = ['Anuncios', 'Hexágonos'] + (['Barrios'] if geojson_path else [])
+    layer_choice = st.radio("Capa", layers, horizontal=True)
+
+    # Las coropletas no dependen de la vista: el HTML del mapa entero sale de la caché de
+    # gráficas y se muestra tal cual, sin volver a generarlo con Folium
+    if layer_choice != 'Anuncios':
+        metric = st.selectbox("Métrica", list(METRICS), format_func=METRICS.get)
+
+        def render():
+            if layer_choice == 'Hexágonos':
+                geojson = load_hex_layer(clean_path, filters)
+            else:
+                geojson = load_area_layer(clean_path, geojson_path, filters)
+            with tracing.span('folium.render', features=len(geojson['features'])):
+                return choropleth_map(geojson, metric, load_map_bounds(clean_path), layer_choice).get_root().render()
+
+        with tracing.span('components.html', layer=layer_choice) as current:
+            html, level = cached_render('mapa', render, (layer_choice, metric))
+            components.html(html, width=1000, height=500)
+        if current is not None:
+            current.attributes.update(cache=level, payload_bytes=len(html))
+        return
     
-    sub_menu = ["Mapa", "Vecindario", "Precios", "Propiedades", "Huéspedes", "Puntuaciones", "Estancia mínima"]
-    sub_choice = st.selectbox("Sé más concreto", sub_menu)
+    # Vista actual del mapa (zoom y límites) que devolvió st_folium en la última interacción;
+    # se guarda por instantánea para que al cambiar de ciudad no se herede la vista anterior
+    view_key = f'map_view:{clean_path}'
+    view = st.session_state.get(view_key, {'zoom': 10, 'bounds': None})
+    clusters = clusters_in_view(load_map_pyramid(clean_path, filters), view['zoom'], view['bounds'])
+
+    # Solo se envían al navegador los clusters de la vista actual
+    with tracing.span('folium.markers', markers=len(clusters)):
+        layer = folium.FeatureGroup(name='AirBnbs')
+        for lat, lon, count in clusters.itertuples(index=False):
+            folium.CircleMarker(location=[lat, lon], radius=4 + 3 * np.log2(count),
+                                tooltip=f'{count} AirBnbs', color='#3186cc',
+                                fill=True, fill_opacity=0.6).add_to(layer)
+
+    # Crear el mapa de Folium centrado en los datos
+    (south, west), (north, east) = load_map_bounds(clean_path)
+    map1 = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=9.5)
+    map1.fit_bounds([[south, west], [north, east]])
+
+    # Mostrar el mapa en Streamlit (st_folium genera el HTML del mapa y el de la capa)
+    with tracing.span('st_folium', markers=len(clusters)) as current:
+        state = st_folium(map1, width=1000, height=500, key=f'mapa:{clean_path}',
+                          feature_group_to_add=layer, returned_objects=['zoom', 'bounds']) or {}
+    if current is not None:
+        with tracing.span('tracing.payload_size'):
+            current.attributes['payload_bytes'] = tracing.payload_size(map1)
+
+    # Si el usuario ha movido el mapa, recalcular los clusters para la nueva vista
+    bounds = state.get('bounds') or {}
+    corners = [bounds.get('_southWest') or {}, bounds.get('_northEast') or {}]
+    if state.get('zoom') and all(c.get('lat') is not None and c.get('lng') is not None for c in corners):
+        new_view = {'zoom': state['zoom'],
+                    'bounds': tuple((c['lat'], c['lng']) for c in corners)}
+        if new_view != view:
+            st.session_state[view_key] = new_view
+            st.rerun()
+
+@page("Análisis de las Propiedades", "Vecindario")
+def neighbourhood_page():
+    import figures
+
+    st.title("Vecindario")
+    menorca_markdown("La isla de Menorca cuenta con ocho municipios: Maó, Ciutadella, Alaior, Es Castell, Sant Lluís, Es Mercadal, Ferreries y Es Migjorn Gran, aunque cerca de un 65% de la población se concentra en las ciudades de Maó y Ciutadella. ")
+
+    # Crear el gráfico de quesito con Plotly y mostrarlo en Streamlit
+    plotly_chart('vecindario', lambda: figures.neighbourhood_pie(
+        analytics.neighbourhood_counts(load_cube(clean_path, filters))))
     
-# Menú VECINDARIO EN PROPIERDADES
-    if sub_choice   == "Mapa":
-        st.title("Mapa de los AirBnb de Menorca")
-        
-        # Mapa folium
-        lats2023 = nuevo_listings['latitude'].tolist()
-        lons2023 = nuevo_listings['longitude'].tolist()
-        locations = list(zip(lats2023, lons2023))
+    menorca_markdown("""
+    Podemos observar que la zona con más apartamentos turísticos es Ciudadella de Menorca, 
+    seguido por Mercadal y Alaior (que cuentan con menos de la mitad que Ciudadella). 
+    A continuación se muestra un mapa con la consecuente distribución de estos AirBnbs
+    """)        
+
+@page("Análisis de las Propiedades", "Precios")
+def prices_page():
+    import figures
+
+    st.title("Precio por vecindario")
+    st.markdown("A continuación vamos a observar el precio medio para una habitación de dos personas en diferentes localizaciones de la isla. Comenzamos arreglando los datos de la columna `price` con el fin de no obtener ningún error.")
+    
+    # Crear la gráfica con Plotly y mostrarla en Streamlit
+    st.title("Análisis de Precios por Vecindario")
+    plotly_chart('precio_vecindario', lambda: figures.neighbourhood_price_bar(
+        analytics.price_by_neighbourhood(load_cube(clean_path, filters), accommodates=2)))
+    
+    menorca_markdown("""
+                Observamos que Ferreries es el municipio con los hospedajes más caros, con un precio medio superior a los 550 dólares 
+                por noche para dos personas, seguido de Es Castell, con un precio cercano a los 350 dólares. Por el lado contrario, 
+                el municipio más asequible es Es Migjorn Gran, con un precio medio inferior a los 100 dólares, seguido de Alaior, 
+                con un precio medio algo superior a los 100 dólares. 
+                
+                Cabe resaltar que los precios en este dataset no varían a lo largo del año, por lo que se toman unos datos estáticos 
+                que suponemos que serán una media de los precios de todo el año.
+                """)
+
+    calendar = load_calendar(clean_path, published)
+    if calendar is not None:
+        # Precio medio y ocupación por mes y municipio a partir del calendario
+        def seasonal():
+            return analytics.seasonal_prices(calendar, filtered_listings(clean_path, filters, ['id', 'neighbourhood']))
 
-        # Crear el mapa de Folium
-        map1 = folium.Map(location=[39.980566, 4.081079], zoom_start=9.5)
-        FastMarkerCluster(data=locations).add_to(map1)
+        st.title("Precios a lo largo del año")
+        plotly_chart('precio_mes', lambda: figures.seasonal_price_line(seasonal()))
+        plotly_chart('ocupacion_mes', lambda: figures.seasonal_occupancy_line(seasonal()))
 
-        # Mostrar el mapa en Streamlit
-        st_folium(map1, width=1000, height=500)
+@page("Análisis de las Propiedades", "Propiedades")
+def properties_page():
+    import figures
+
+    st.title("Tipos de propiedades")
+    st.markdown("""
+                El tipo de propiedad que se alquila es muy importante, ya que en esta plataforma podemos encontrar desde alojamientos 
+                enteros como casas, hasta habitaciones privadas, habitaciones compartidas o habitaciones de hotel.
+                """)
     
-    elif sub_choice == "Vecindario":
-        st.title("Vecindario")
-        st.markdown("La isla de Menorca cuenta con ocho municipios: Maó, Ciutadella, Alaior, Es Castell, Sant Lluís, Es Mercadal, Ferreries y Es Migjorn Gran, aunque cerca de un 65% de la población se concentra en las ciudades de Maó y Ciutadella. ")
-
-        neighbourhood = nuevo_listings['neighbourhood'].value_counts().sort_values(ascending=True)
-
-        # Crear el gráfico de quesito con Plotly
-        fig = px.pie(neighbourhood, 
-                    values=neighbourhood.values, 
-                    names=neighbourhood.index, 
-                    title='Número de AirBnbs por zona', 
-                    width=800, height=600,
-                    color_discrete_sequence=px.colors.qualitative.Set3)
-
-        fig.update_layout(
-            title_font_size=20
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-        Podemos observar que la zona con más apartamentos turísticos es Ciudadella de Menorca, 
-        seguido por Mercadal y Alaior (que cuentan con menos de la mitad que Ciudadella). 
-        A continuación se muestra un mapa con la consecuente distribución de estos AirBnbs
-        """)        
+    # Crear el gráfico de quesito con Plotly y mostrarlo en Streamlit
+    st.title("Frecuencia de tipos de habitación")
+    plotly_chart('tipo_habitacion', lambda: figures.room_type_pie(
+        analytics.room_type_counts(load_cube(clean_path, filters))))
     
-    elif sub_choice == "Precios":
-        st.title("Precio por vecindario")
-        st.markdown("A continuación vamos a observar el precio medio para una habitación de dos personas en diferentes localizaciones de la isla. Comenzamos arreglando los datos de la columna `price` con el fin de no obtener ningún error.")
-        
-        precio_vecindario = nuevo_listings[nuevo_listings['accommodates'] == 2]
-        precio_vecindario = precio_vecindario.groupby('neighbourhood')['price'].mean().sort_values(ascending=True)
-
-        # Crear la gráfica con Plotly
-        fig = px.bar(precio_vecindario, 
-             orientation='h', 
-             title='Precio medio de alojamientio para dos huéspedes', 
-             labels={'valor': 'Precio medio por día (Euro)', 'índice': ''},
-             width=800, height=600)
-
-        fig.update_layout(
-            xaxis_title='Precio medio por día(Euro)',
-            yaxis_title='',
-            title_font_size=20,
-            xaxis_title_font_size=12,
-            yaxis_title_font_size=12
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Análisis de Precios por Vecindario")
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Observamos que Ferreries es el municipio con los hospedajes más caros, con un precio medio superior a los 550 dólares 
-                    por noche para dos personas, seguido de Es Castell, con un precio cercano a los 350 dólares. Por el lado contrario, 
-                    el municipio más asequible es Es Migjorn Gran, con un precio medio inferior a los 100 dólares, seguido de Alaior, 
-                    con un precio medio algo superior a los 100 dólares. 
-                    
-                    Cabe resaltar que los precios en este dataset no varían a lo largo del año, por lo que se toman unos datos estáticos 
-                    que suponemos que serán una media de los precios de todo el año.
-                    """)
-        
-    elif sub_choice == "Propiedades":
-        st.title("Tipos de propiedades")
-        st.markdown("""
-                    El tipo de propiedad que se alquila es muy importante, ya que en esta plataforma podemos encontrar desde alojamientos 
-                    enteros como casas, hasta habitaciones privadas, habitaciones compartidas o habitaciones de hotel.
-                    """)
-        
-        freq = nuevo_listings['room_type'].value_counts().sort_values(ascending=True)
-
-        # Crear el gráfico de quesito con Plotly
-        fig = px.pie(freq, 
-                    values=freq.values, 
-                    names=freq.index, 
-                    title='Frecuencia de tipos de habitación', 
-                    width=800, height=400,
-                    color_discrete_sequence=px.colors.qualitative.Set3)
-
-        fig.update_layout(
-            title_font_size=20
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Frecuencia de tipos de habitación")
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Como efectivamente hemos observado, las casas/apartamentos enteros son los que más se alquilan en esta aplicación, seguido 
-                    de las habitaciones privadas y con un porcentaje muy bajo de habitaciones compartidas y habitaciones de hotel
-                    """)
-        
-        prop = nuevo_listings.groupby(['property_type', 'room_type']).room_type.count()
-        prop = prop.unstack()
-        prop['total'] = prop.sum(axis=1)
-        prop = prop.sort_values(by='total')
-        prop = prop[prop['total'] >= 200]
-        prop = prop.drop(columns=['total'])
-
-        # Convertir los datos para Plotly
-        prop = prop.reset_index()
-        prop = prop.melt(id_vars=['property_type'], var_name='room_type', value_name='count')
-
-        # Crear la gráfica con Plotly
-        fig = px.bar(prop, 
-                    x='count', 
-                    y='property_type', 
-                    color='room_type', 
-                    title='Tipos de propiedades en Menorca', 
-                    labels={'count': 'Number of listings', 'property_type': '', 'room_type': 'Room Type'},
-                    orientation='h', 
-                    width=900, height=600)
-
-        fig.update_layout(
-            xaxis_title='Número de propiedades listadas',
-            yaxis_title='',
-            title_font_size=18,
-            xaxis_title_font_size=14,
-            yaxis_title_font_size=14,
-            legend=dict(title='Room Type', font=dict(size=13)),
-            yaxis=dict(tickfont=dict(size=13))
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Tipos de propiedades en Menorca")
-        st.plotly_chart(fig)
-
-        st.markdown("""
-                    En esta gráfica se puede observar con más claridad cómo los tipos de propiedades más comunes son casas/apartamentos completos, 
-                    al no encontrar ni una pizca de otro color que no sea el rojo.
-                    """)
-        
-    elif sub_choice == "Huéspedes":
-        st.title("Huéspedes por alojamiento")
-        st.markdown("""
-                    En este apartado mostraremos la cantidad de huéspedes que se admiten en estos alquileres vacacionales, 
-                    además analizaremos estos en contraste con los precios
-                    """)
-        
-        feq = nuevo_listings['accommodates'].value_counts().sort_index()
-
-        # Crear la gráfica con Plotly
-        fig = px.bar(feq, 
-                    x=feq.index, 
-                    y=feq.values, 
-                    labels={'x': 'Accommodates', 'y': 'Number of listings'},
-                    title='Accommodates (number of people)', 
-                    width=800, height=600)
-
-        fig.update_layout(
-            xaxis_title='Accommodates',
-            yaxis_title='Number of listings',
-            title_font_size=20,
-            xaxis_title_font_size=12,
-            yaxis_title_font_size=12
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Distribución de número de personas que pueden ser acomodadas")
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Como suele ocurrir, la mayor parte de alojamientos listados en AirBnb son para dos huéspedes, seguidos de los 
-                    de 4 y los de 6. Podemos observar que hay alojamientos de hasta 16 personas, el máximo permitido por AirBnb
-                    """)
-        
-        fig = px.scatter(nuevo_listings, 
-                 x='accommodates', 
-                 y='price', 
-                 color='accommodates', 
-                 title='Relación entre Número de Huéspedes y Precio', 
-                 labels={'accommodates': 'Número de Huéspedes', 'price': 'Precio (USD)'}, 
-                 opacity=0.6,
-                 color_continuous_scale='viridis',
-                 width=800, height=600)
-
-        fig.update_layout(
-            xaxis_title='Número de Huéspedes',
-            yaxis_title='Precio (USD)',
-            title_font_size=16,
-            xaxis_title_font_size=14,
-            yaxis_title_font_size=14
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Relación entre Número de Huéspedes y Precio")
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Este diagrama de dispersión muestra la relación entre el número de huéspedes y el precio por noche de la vivienda. En ella 
-                    podemos observar que el precio es proporcional al número de huéspedes con una sola excepción.
-                    """)
-        
-        mean_price = nuevo_listings.groupby('accommodates')['price'].mean().reset_index()
-
-        # Crear la gráfica de barras con Plotly
-        fig = px.bar(mean_price, 
-                    x='accommodates', 
-                    y='price', 
-                    title='Precio Medio por Número de Huéspedes', 
-                    labels={'accommodates': 'Número de Huéspedes', 'price': 'Precio Medio (USD)'}, 
-                    color='price', 
-                    color_continuous_scale='viridis',
-                    width=800, height=600)
-
-        fig.update_layout(
-            xaxis_title='Número de Huéspedes',
-            yaxis_title='Precio Medio (USD)',
-            title_font_size=16,
-            xaxis_title_font_size=14,
-            yaxis_title_font_size=14
-        )
-
-        # Mostrar la gráfica en Streamlit
-        st.title("Precio Medio por Número de Huéspedes")
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Aquí podemos observar la excepción con más claridad. El alojamiento apto para 13 personas no es proporcional al tratarse de 
-                    una excepción, seguramente debido a que solo hay una propiedad para ese número de personas y con un precio bastante aceptable.
-                    """)
-        
-    elif sub_choice == "Puntuaciones":
-        st.title("Puntuación de los alojamientos")
-        st.markdown("""
-                    Los huéspedes han puntuado los alojamientos en los que han estado de la siguiente manera:
-                    """)
-            
-            
-        fig = px.histogram(nuevo_listings, x='review_scores_rating', nbins=20, marginal='rug',
-                        title='Distribución y Densidad de los Puntajes de Reseñas',
-                        labels={'review_scores_rating': 'Puntaje de Reseñas', 'count': 'Frecuencia'})
-
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(showlegend=False, xaxis_title_font_size=14, yaxis_title_font_size=14)
-        st.plotly_chart(fig)
+    menorca_markdown("""
+                Como efectivamente hemos observado, las casas/apartamentos enteros son los que más se alquilan en esta aplicación, seguido 
+                de las habitaciones privadas y con un porcentaje muy bajo de habitaciones compartidas y habitaciones de hotel
+                """)
+    
+    # Crear la gráfica con Plotly y mostrarla en Streamlit
+    st.title(f"Tipos de propiedades en {city}")
+    plotly_chart('tipo_propiedad', lambda: figures.property_type_bar(
+        analytics.property_room_counts(load_cube(clean_path, filters), min_total=200), city))
+
+    menorca_markdown("""
+                En esta gráfica se puede observar con más claridad cómo los tipos de propiedades más comunes son casas/apartamentos completos, 
+                al no encontrar ni una pizca de otro color que no sea el rojo.
+                """)
+
+@page("Análisis de las Propiedades", "Huéspedes")
+def guests_page():
+    import figures
+
+    st.title("Huéspedes por alojamiento")
+    st.markdown("""
+                En este apartado mostraremos la cantidad de huéspedes que se admiten en estos alquileres vacacionales, 
+                además analizaremos estos en contraste con los precios
+                """)
+    
+    # Crear la gráfica con Plotly y mostrarla en Streamlit
+    st.title("Distribución de número de personas que pueden ser acomodadas")
+    plotly_chart('huespedes', lambda: figures.accommodates_bar(
+        analytics.accommodates_counts(load_cube(clean_path, filters))))
+    
+    menorca_markdown("""
+                Como suele ocurrir, la mayor parte de alojamientos listados en AirBnb son para dos huéspedes, seguidos de los 
+                de 4 y los de 6. Podemos observar que hay alojamientos de hasta 16 personas, el máximo permitido por AirBnb
+                """)
+    
+    # Mostrar la gráfica en Streamlit
+    st.title("Relación entre Número de Huéspedes y Precio")
+    plotly_chart('huespedes_precio', lambda: figures.accommodates_price_scatter(
+        filtered_listings(clean_path, filters, ['accommodates', 'price'])))
+    
+    menorca_markdown("""
+                Este diagrama de dispersión muestra la relación entre el número de huéspedes y el precio por noche de la vivienda. En ella 
+                podemos observar que el precio es proporcional al número de huéspedes con una sola excepción.
+                """)
+    
+    # Crear la gráfica de barras con Plotly y mostrarla en Streamlit
+    st.title("Precio Medio por Número de Huéspedes")
+    plotly_chart('precio_huespedes', lambda: figures.accommodates_price_bar(
+        analytics.price_by_accommodates(load_cube(clean_path, filters))))
+    
+    menorca_markdown("""
+                Aquí podemos observar la excepción con más claridad. El alojamiento apto para 13 personas no es proporcional al tratarse de 
+                una excepción, seguramente debido a que solo hay una propiedad para ese número de personas y con un precio bastante aceptable.
+                """)
+
+@page("Análisis de las Propiedades", "Comparables")
+def comparables_page():
+    import figures
+    from comparables import distance_km
+
+    st.title("Anuncios comparables")
+    st.markdown("""
+                Las medias por municipio o por número de huéspedes mezclan alojamientos muy distintos. Aquí cada anuncio se compara
+                con los más parecidos a él: cercanos, del mismo tipo de habitación, con capacidad para un número similar de huéspedes
+                y con puntuaciones parecidas. Los comparables se buscan entre todos los anuncios de la instantánea; los filtros solo
+                eligen qué anuncios se analizan.
+                """)
+
+    k = st.slider("Número de comparables", min_value=5, max_value=50, value=20)
+    index = load_comparables(clean_path)
+    estimates = load_price_estimates(clean_path, k)
+    if selection is not None:
+        estimates = estimates.iloc[selection.rows()]
+
+    # Distribución del precio de cada anuncio entre el precio mediano de sus comparables
+    plotly_chart('comparables_ratio', lambda: figures.comparable_ratio_histogram(
+        analytics.comparable_ratio_distribution(estimates), k), (k,))
+
+    st.markdown("""
+                Un valor de 1 indica que el anuncio cuesta lo mismo que la mediana de sus comparables; 2, el doble; 0.5, la mitad.
+                """)
+
+    nuevo_listings = dataset.frame(['id', 'name', 'neighbourhood', 'room_type', 'accommodates', 'review_scores_rating',
+                                    'latitude', 'longitude', 'price'])
+    ranked = estimates.dropna(subset=['ratio']).sort_values('ratio')
+    columns = {'name': 'Anuncio', 'neighbourhood': 'Municipio', 'room_type': 'Tipo de habitación', 'accommodates': 'Huéspedes',
+               'price': 'Precio', 'comparable_price': 'Precio de los comparables', 'ratio': 'Precio / comparables'}
+
+    def ranking(rows):
+        table = nuevo_listings.loc[rows.index, ['id', 'name', 'neighbourhood', 'room_type', 'accommodates']]
+        table[['price', 'comparable_price', 'ratio']] = rows[['price', 'comparable_price', 'ratio']].round(2)
+        return table.rename(columns=columns)
+
+    col1, col2 = st.columns(2)
+    col1.subheader("Más caros que sus comparables")
+    col1.dataframe(ranking(ranked.tail(10).iloc[::-1]), hide_index=True)
+    col2.subheader("Más baratos que sus comparables")
+    col2.dataframe(ranking(ranked.head(10)), hide_index=True)
+
+    # Comparables de un anuncio concreto, de más a menos parecido
+    st.title("Comparables de un anuncio")
+    query = st.text_input("Id del anuncio", help="Vacío: el anuncio más caro frente a sus comparables").strip()
+    if not query and len(ranked):
+        query = str(ranked['id'].iloc[-1])
+    row = index.row(int(query)) if query.isdigit() else None
+    if row is None:
+        st.warning("No hay ningún anuncio con ese id en la instantánea")
+        return
+
+    positions, _ = index.query([row], k)
+    positions = positions[0][positions[0] >= 0]
+    listing = nuevo_listings.iloc[row]
+    comparable_price = nuevo_listings['price'].iloc[positions].median()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Precio", f"{listing['price']:.0f} €" if pd.notna(listing['price']) else "-")
+    col2.metric("Precio mediano de los comparables", f"{comparable_price:.0f} €" if pd.notna(comparable_price) else "-")
+    col3.metric("Precio / comparables", f"{listing['price'] / comparable_price:.2f}"
+                if pd.notna(listing['price']) and pd.notna(comparable_price) else "-")
+    st.caption(f"{listing['name']} · {listing['neighbourhood']} · {listing['room_type']} · {listing['accommodates']} huéspedes")
+
+    comparables = nuevo_listings.iloc[positions].drop(columns=['latitude', 'longitude'])
+    comparables.insert(2, 'distance', distance_km(listing['latitude'], listing['longitude'],
+                                                  nuevo_listings['latitude'].iloc[positions],
+                                                  nuevo_listings['longitude'].iloc[positions]).round(2))
+    with tracing.span('st.dataframe', rows=len(comparables)):
+        st.dataframe(comparables.rename(columns={**columns, 'distance': 'Distancia (km)', 'review_scores_rating': 'Puntuación'}),
+                     hide_index=True)
+
+@page("Análisis de las Propiedades", "Amenities")
+def amenities_page():
+    import figures
+
+    st.title("Amenities")
+    st.markdown("""
+                Cada anuncio indica los servicios (amenities) con los que cuenta el alojamiento: wifi, piscina, aire acondicionado... 
+                Elige las que te interesen para ver cuántos alojamientos las tienen todas y cuánto cuestan.
+                """)
+
+    index = load_amenities(clean_path)
+    nuevo_listings = dataset.frame(['neighbourhood', 'price'])
+
+    # Filtro facetado: alojamientos que tienen todas las amenities elegidas (y cumplen los filtros globales)
+    selected = st.multiselect("Amenities que debe tener el alojamiento", index.frequency().index.tolist())
+    mask = index.having_all(selected)
+    if selection is not None:
+        mask &= selection.to_mask()
+
+    col1, col2 = st.columns(2)
+    col1.metric("Alojamientos", f"{mask.sum()} de {len(mask) if selection is None else selection.count()}")
+    col2.metric("Precio medio", f"{nuevo_listings['price'][mask].mean():.0f} €" if mask.any() else "-")
+
+    # Las gráficas dependen también de las amenities elegidas (sin importar el orden)
+    state = tuple(sorted(selected))
+
+    def frequency():
+        return index.frequency(mask).head(20).sort_values(ascending=True)
+
+    # Crear la gráfica con Plotly
+    plotly_chart('amenities', lambda: figures.amenities_frequency_bar(frequency()), state)
+
+    # Mapa de calor: proporción de alojamientos de cada municipio con cada amenity
+    plotly_chart('amenities_municipio', lambda: figures.amenities_share_heatmap(
+        index.share_by(nuevo_listings['neighbourhood'], frequency().index[::-1][:15].tolist(), mask=mask)), state)
+
+    # Crear la gráfica con Plotly
+    # Los precios de los anuncios que no cumplen los filtros quedan fuera como si faltaran
+    price = nuevo_listings['price'] if selection is None else nuevo_listings['price'].where(selection.to_mask())
+    plotly_chart('amenities_precio', lambda: figures.amenities_lift_bar(index.price_lift(price)))
+
+    st.markdown("""
+                Un valor mayor que 1 indica que los alojamientos con esa amenity son, de media, más caros que los que no la tienen. 
+                No implica que la amenity sea la causa: las casas con piscina, por ejemplo, también suelen ser más grandes.
+                """)
+
+@page("Análisis de las Propiedades", "Puntuaciones")
+def ratings_page():
+    import figures
+
+    st.title("Puntuación de los alojamientos")
+    st.markdown("""
+                Los huéspedes han puntuado los alojamientos en los que han estado de la siguiente manera:
+                """)
         
-    elif sub_choice == "Estancia mínima":
-        st.title("Estancia mínima")
-        st.markdown("""
-                    Algunos alojamientos cuentan con un número mínimo de noches que han ser reservadas, estas suelen darse a causa de las tasas que requieren los servicios de limpieza o el propio translado para la entrega de llaves. 
-                    """)
         
-        filtered_listings = nuevo_listings[nuevo_listings['minimum_nights'] <= 50]
+    # Mostrar la gráfica en Streamlit
+    plotly_chart('puntuaciones', lambda: figures.review_scores_histogram(
+        analytics.review_scores_distribution(load_snapshot_sketches(clean_path, filters))))
 
-        # Crear el histograma con Plotly
-        fig = px.histogram(filtered_listings, x='minimum_nights', nbins=50,
-                        title='Distribución del Número Mínimo de Días para Alquilar un Airbnb (Máximo 50 Días)',
-                        labels={'minimum_nights': 'Número Mínimo de Días', 'count': 'Frecuencia'})
+@page("Análisis de las Propiedades", "Estancia mínima")
+def min_nights_page():
+    import figures
 
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14)
-        st.plotly_chart(fig)
-                
-        
-elif option == "Análisis de los Hosts":
+    st.title("Estancia mínima")
+    st.markdown("""
+                Algunos alojamientos cuentan con un número mínimo de noches que han ser reservadas, estas suelen darse a causa de las tasas que requieren los servicios de limpieza o el propio translado para la entrega de llaves. 
+                """)
+    
+    # Crear el histograma con Plotly y mostrarlo en Streamlit
+    plotly_chart('estancia_minima', lambda: figures.min_nights_histogram(
+        analytics.min_nights_distribution(load_snapshot_sketches(clean_path, filters), max_nights=50)))
+
+@section("Análisis de los Hosts")
+def hosts_section():
     st.title("Análisis Exploratorio de los Hosts")
     # Añadir el contenido del análisis exploratorio de los hosts aquí
     st.header("Distribución de Hosts")
+
+@page("Análisis de los Hosts", "Vista general")
+def hosts_overview_page():
+    st.title("Vista general")
+    menorca_markdown("""
+        Estos son los hosts que cuentan con un mayor número de reviews, y su correspondiente nota media a partir de las valoraciones de los usuarios.
+        Aquí observamos que Villa Plus encabeza la lista con 199 reviews y un 4.6 de puntuación media, seguido de Solmar con 98 reviews una media de 4.45 y 3Villas con 96 y una nota media de 4.61.
+        """)
+    hosts = load_hosts(clean_path, filters)
+
+    # Mostrar el título y la tabla en Streamlit: solo se envía la página pedida del ranking
+    st.title("Número de Reviews y nota media")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    query = col1.text_input("Buscar host por nombre")
+    orders = {'Número de anuncios': 'listings', 'Nota media': 'average_rating', 'Proporción con licencia': 'license_share'}
+    by = orders[col2.selectbox("Ordenar por", list(orders))]
+    pages = max(1, -(-hosts.count(query) // HOSTS_PAGE_SIZE))
+    number = col3.number_input("Página", min_value=1, max_value=pages, value=1, step=1)
+
+    host_page, total = hosts.page(number - 1, page_size=HOSTS_PAGE_SIZE, by=by, query=query)
+    st.caption(f"{total} hosts · página {number} de {pages}")
+    with tracing.span('st.dataframe', rows=len(host_page)):
+        st.dataframe(host_page)  
+
+@page("Análisis de los Hosts", "Primera review")
+def first_review_page():
+    import figures
+
+    st.title("Primera review")
+
+    # Crear el histograma con Plotly
+    # Mostrar la gráfica en Streamlit
+    plotly_chart('primera_review', lambda: figures.first_review_histogram(
+        analytics.first_review_distribution(load_snapshot_sketches(clean_path, filters))))
     
-    sub_menu = ["Vista general", "Primera review", "Tiempo de respuesta", "Superhosts"]
-    sub_choice = st.selectbox("Sé más concreto", sub_menu)
+    menorca_markdown("""
+                Algunos de los propietarios reciben sus primeras reseñas en 2012, que desde entonces han crecido progresivamente durante los meses de más turismo del año (concretamente en verano). 
+                Justo tras el COVID se muestra un repunte de nuevas propiedades en la plataforma con sus correspodientes nuevas reseñas.
+                """)
+
+    reviews = load_reviews(clean_path, published)
+    if reviews is not None:
+        # Reseñas totales por mes a partir de reviews.csv.gz
+        def monthly_reviews():
+            if not filters:
+                return analytics.monthly_reviews(reviews)
+            ids = filtered_listings(clean_path, filters, ['id'])['id']
+            return analytics.monthly_reviews(reviews[reviews['listing_id'].isin(ids)])
+
+        plotly_chart('reviews_mes', lambda: figures.monthly_reviews_bar(monthly_reviews()))
+
+@page("Análisis de los Hosts", "Tiempo de respuesta")
+def response_time_page():
+    import figures
 
+    st.title("Tiempo de respuesta")
     
-    # Menú VECINDARIO EN PROPIERDADES
-    if sub_choice == "Vista general":
-        st.title("Vista general")
-        st.markdown("""
-            Estos son los hosts que cuentan con un mayor número de reviews, y su correspondiente nota media a partir de las valoraciones de los usuarios.
-            Aquí observamos que Villa Plus encabeza la lista con 199 reviews y un 4.6 de puntuación media, seguido de Solmar con 98 reviews una media de 4.45 y 3Villas con 96 y una nota media de 4.61.
-            """)
-        host_reviews = nuevo_listings.groupby(['host_id', 'host_name']).size().sort_values(ascending=False).to_frame(name='number_of_reviews')
-
-        # Calcular el promedio de 'review_scores_rating' para cada host
-        host_avg_rating = nuevo_listings.groupby(['host_id', 'host_name'])['review_scores_rating'].mean().to_frame(name='average_review_score')
-
-        # Unir los dataframes
-        host_reviews = host_reviews.join(host_avg_rating)
-
-        # Mostrar el título y la tabla en Streamlit
-        st.title("Número de Reviews y nota media")
-        st.dataframe(host_reviews)  
-        
-        
-    elif sub_choice == "Primera review":
-        st.title("Primera review")
-        nuevo_listings['first_review'] = pd.to_datetime(nuevo_listings['first_review'])
-
-        # Crear el histograma con Plotly
-        fig = px.histogram(nuevo_listings, x='first_review', nbins=30,
-                        title='Distribución de la Fecha de la Primera Review',
-                        labels={'first_review': 'Fecha de la primera review', 'count': 'Frecuencia'})
-
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Algunos de los propietarios reciben sus primeras reseñas en 2012, que desde entonces han crecido progresivamente durante los meses de más turismo del año (concretamente en verano). 
-                    Justo tras el COVID se muestra un repunte de nuevas propiedades en la plataforma con sus correspodientes nuevas reseñas.
-                    """)
-        
-    elif sub_choice == "Tiempo de respuesta":
-        st.title("Tiempo de respuesta")
-        
-        order = ['within an hour', 'within a few hours', 'within a day', 'a few days or more']
+    # Crear el gráfico de barras con Plotly y mostrarlo en Streamlit
+    plotly_chart('tiempo_respuesta', lambda: figures.response_time_histogram(
+        analytics.response_time_distribution(filtered_listings(clean_path, filters, ['host_response_time']))))
+    
+    menorca_markdown("""
+                Observamos que por lo general los anfitriones contestan en una hora o menos, y muy pocos tardan más de un día. Esto es algo muy positovo a la hora de evaluar un alojamiento, haciendo que los huespedes se sientan acompañados desde el principio.
+                """)
 
-        # Crear el gráfico de barras con Plotly
-        fig = px.histogram(nuevo_listings, x='host_response_time', category_orders={'host_response_time': order},
-                        title='Distribución del Tiempo de Respuesta del Anfitrión',
-                        labels={'host_response_time': 'Tiempo de Respuesta del Anfitrión', 'count': 'Número de Propiedades'})
+@page("Análisis de los Hosts", "Superhosts")
+def superhosts_page():
+    import figures
 
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Observamos que por lo general los anfitriones contestan en una hora o menos, y muy pocos tardan más de un día. Esto es algo muy positovo a la hora de evaluar un alojamiento, haciendo que los huespedes se sientan acompañados desde el principio.
-                    """)
-        
-    elif sub_choice == "Superhosts":
-        st.title("Superhosts")
-        
-        total_count = nuevo_listings.shape[0]
-        superhost_count = nuevo_listings[nuevo_listings['host_is_superhost'] == 't'].shape[0]
-        non_superhost_count = total_count - superhost_count
-
-        # Crear un DataFrame con los resultados
-        data = {'Estado': ['Superanfitrión', 'No Superanfitrión'], 'Conteo': [superhost_count, non_superhost_count]}
-        count_df = pd.DataFrame(data)
-
-        # Crear el gráfico de barras con Plotly
-        fig = px.bar(count_df, x='Estado', y='Conteo', title='Número de Propiedades por Estado de Superanfitrión',
-                    labels={'Estado': 'Estado de Superanfitrión', 'Conteo': 'Número de Propiedades'},
-                    color_discrete_sequence=['#636EFA'])
-
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14)
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Cerca de 700 anfitriones cuentan con la distinción de Superhost, lo que significa que tanto el anfitrion como el alojamiento cuenta con unas condiciones óptimas de respuesta, cuidado y limpieza. Esto es cerca de 1/6 del número total de anfitriones, siendo más de 2500 los que NO Superhosts.
-                    """)
-        
-        total_count = nuevo_listings['license'].shape[0]
-        non_null_count = nuevo_listings['license'].count()
-        null_count = total_count - non_null_count
-
-        # Crear un DataFrame con los resultados
-        data = {'Estado': ['Datos', 'NaN'], 'Conteo': [non_null_count, null_count]}
-        count_df = pd.DataFrame(data)
-
-        # Crear el gráfico de barras con Plotly
-        fig = px.bar(count_df, x='Estado', y='Conteo', title='Conteo de Valores para la Licencia',
-                    labels={'Estado': 'Estado', 'Conteo': 'Cantidad'},
-                    color_discrete_sequence=['#636EFA', '#EF553B'])
-
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14)
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    Podemos observar que cerca de 2000 de los más de los 3100 alojamientos listados en AirBnb cuentan con la pertinente licencia turística, mientras que casi 1300 no la tienen en vigor o no la tienen correctamente subida a la página.
+    st.title("Superhosts")
+    # Todos los recuentos de la página salen de la misma tabla de contingencia
+    table = load_host_license_table(clean_path, filters)
+    
+    # Crear el gráfico de barras con Plotly y mostrarlo en Streamlit
+    plotly_chart('superhosts', lambda: figures.superhost_bar(analytics.superhost_counts(table)))
+    
+    menorca_markdown("""
+                Cerca de 700 anfitriones cuentan con la distinción de Superhost, lo que significa que tanto el anfitrion como el alojamiento cuenta con unas condiciones óptimas de respuesta, cuidado y limpieza. Esto es cerca de 1/6 del número total de anfitriones, siendo más de 2500 los que NO Superhosts.
+                """)
+    
+    # Crear el gráfico de barras con Plotly y mostrarlo en Streamlit
+    plotly_chart('licencias', lambda: figures.license_bar(analytics.license_counts(table)))
+    
+    menorca_markdown("""
+                Podemos observar que cerca de 2000 de los más de los 3100 alojamientos listados en AirBnb cuentan con la pertinente licencia turística, mientras que casi 1300 no la tienen en vigor o no la tienen correctamente subida a la página.
 
-                    Según Menorca.com, en el mes de Mayo de 2024 más de 400 propietarios 'corrigieron' sus anuncios para mostrar el número de la preceptiva licencia turística aumentando estos en un 32%, después de que el gobierno insular decidiese tomar medidas en cuanto a los pisos turísticos ilegales.
+                Según Menorca.com, en el mes de Mayo de 2024 más de 400 propietarios 'corrigieron' sus anuncios para mostrar el número de la preceptiva licencia turística aumentando estos en un 32%, después de que el gobierno insular decidiese tomar medidas en cuanto a los pisos turísticos ilegales.
 
-                    Podemos observar que cuando se trata de los superhosts, el número de casas sin licencia disminuye, como podemos observar a continuación.
-                    """)
-        
-        total_count = nuevo_listings.shape[0]
-        superhost_count_with_license = nuevo_listings[(nuevo_listings['host_is_superhost'] == 't') & nuevo_listings['license'].notnull()].shape[0]
-        superhost_count_no_license = nuevo_listings[(nuevo_listings['host_is_superhost'] == 't') & nuevo_listings['license'].isnull()].shape[0]
-        non_superhost_count_with_license = nuevo_listings[(nuevo_listings['host_is_superhost'] == 'f') & nuevo_listings['license'].notnull()].shape[0]
-        non_superhost_count_no_license = nuevo_listings[(nuevo_listings['host_is_superhost'] == 'f') & nuevo_listings['license'].isnull()].shape[0]
-
-        # Crear un DataFrame con los resultados
-        data = {
-            'Estado': ['Superhost con Licencia', 'Superhost sin Licencia', 'Regular Host con Licencia', 'Regular Host sin Licencia'], 
-            'Conteo': [superhost_count_with_license, superhost_count_no_license, non_superhost_count_with_license, non_superhost_count_no_license]
-        }
-        count_df = pd.DataFrame(data)
-
-        # Crear el gráfico de barras con Plotly
-        fig = px.bar(count_df, x='Estado', y='Conteo', title='Distribución de Propiedades por Estado del Host y Licencia',
-                    labels={'Estado': 'Estado del Host y Licencia', 'Conteo': 'Número de Propiedades'},
-                    color_discrete_sequence=['#636EFA', '#EF553B', '#00CC96', '#AB63FA'])
-
-        # Actualizar el diseño y mostrar la gráfica en Streamlit
-        fig.update_layout(xaxis_title_font_size=14, yaxis_title_font_size=14, xaxis_tickangle=-45)
-        st.plotly_chart(fig)
-        
-        st.markdown("""
-                    En esta gráfica observamos que no hay una correlación entre la licencia y los superhosts, sindo la diferencia en términos proporcionales igual entre los superhosts con y sin licencia y los no superhosts con y sin licencia.
-                    """)
+                Podemos observar que cuando se trata de los superhosts, el número de casas sin licencia disminuye, como podemos observar a continuación.
+                """)
+    
+    # Crear el gráfico de barras con Plotly y mostrarlo en Streamlit
+    plotly_chart('superhosts_licencias', lambda: figures.superhost_license_bar(analytics.superhost_license_counts(table)))
+    
+    menorca_markdown("""
+                En esta gráfica observamos que no hay una correlación entre la licencia y los superhosts, sindo la diferencia en términos proporcionales igual entre los superhosts con y sin licencia y los no superhosts con y sin licencia.
+                """)
 
-elif option == "Conclusión":
+    statistic, dof, p_value = analytics.license_independence(table, 'superhost')
+    st.markdown(f"Test chi-cuadrado de independencia entre licencia y superhost: χ² = {statistic:.2f} ({dof} g.l.), p-valor = {p_value:.3f}")
+
+    # Proporción de anuncios con licencia por tipo de host y municipio o tipo de habitación
+    dimensions = {'Municipio': 'neighbourhood', 'Tipo de habitación': 'room_type'}
+    charts = {'neighbourhood': 'licencias_municipio', 'room_type': 'licencias_habitacion'}
+    dimension = st.selectbox("Desglosar la licencia por", list(dimensions))
+    by = dimensions[dimension]
+    plotly_chart(charts[by], lambda: figures.license_share_bar(analytics.license_share(table, by), by))
+
+    statistic, dof, p_value = analytics.license_independence(table, by)
+    st.markdown(f"Test chi-cuadrado de independencia entre licencia y {dimension.lower()}: χ² = {statistic:.2f} ({dof} g.l.), p-valor = {p_value:.3f}")
+
+@section("Conclusión")
+def conclusion_page():
     st.title("Conclusión")
-    st.markdown("""
+    menorca_markdown("""
                 Tras examinar los datos que nos ofrece InsideAirbnb.com podemos observar una gran variedad de precios, habitaciones y posibles huéspedes, además de disponer de casas en alquiler vacacional en todos los pueblos de la región. Además, factores como los puntajes de reseñas, los requisitos de estadía mínima, el tiempo de respuesta del anfitrión y el estado de superanfitrión y licencia proporcionan información valiosa sobre la calidad, la legalidad y la experiencia general de los alojamientos. 
                 
                 Esta combinación de factores permite a los viajeros encontrar la opción que mejor se adapte a sus necesidades y preferencias, mientras que los propietarios pueden tomar decisiones informadas para mejorar sus servicios y maximizar su éxito en el competitivo mercado de alquiler vacacional en Menorca.
                 
                 """)
-    st.image("https://cdn.sanity.io/images/cr01fuv8/production/7531eb89542101694f897c90a3d094676a508de4-2000x1127.jpg")
\ No newline at end of file
+    st.image("https://cdn.sanity.io/images/cr01fuv8/production/7531eb89542101694f897c90a3d094676a508de4-2000x1127.jpg")
+
+option = st.sidebar.selectbox("¿Qué quieres ver?", list(SECTIONS))
+st.sidebar.checkbox("Mostrar el perfil de la ejecución", key='profile')
+SECTIONS[option]()
+
+# Submenú de la sección (si tiene subpáginas)
+sub_choice = None
+if PAGES[option]:
+    sub_choice = st.selectbox("Sé más concreto", list(PAGES[option]))
+    PAGES[option][sub_choice]()
+
+# Cerrar la traza de esta ejecución: exportarla y, si se ha pedido, mostrarla en el menú lateral
+trace = tracing.stop_trace()
+if trace is not None:
+    trace.attributes.update(city=city, clean_path=clean_path, section=option, page=sub_choice)
+    if TRACE_FILE:
+        trace.write_jsonl(TRACE_FILE)
+    if st.session_state.get('profile'):
+        spans = trace.to_frame()
+        spans['name'] = ['\u2003' * depth + name for depth, name in zip(spans['depth'], spans['name'])]
+        with st.sidebar.expander("Perfil de la ejecución", expanded=True):
+            st.metric("Tiempo total", f"{trace.duration * 1000:.0f} ms")
+            columns = [c for c in ['name', 'duration_ms', 'self_ms', 'cache', 'payload_bytes'] if c in spans]
+            st.dataframe(spans[columns].round(1), hide_index=True)
@@ -0,0 +1,215 @@
+import argparse
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import folium
+import numpy as np
+import pandas as pd
+
+import analytics
+import figures
+from amenities import build_amenities_snapshot, load_amenities_index
+from cube import build_cube_snapshot
+from dataset import SnapshotDataset
+from figcache import FIGURE_PAGES, FigureCache, figure_key
+from geo import build_cluster_pyramid, clusters_in_view, map_bounds
+from hosts import HostIndex, build_host_snapshot
+from ingest import build_clean_snapshot, build_snapshot, load_snapshot, snapshot_hash
+from sketches import build_sketch_snapshot, load_sketches
+from store import find_partition, list_partitions, load_published_series
+from timeseries import load_series, reduce_calendar, reduce_reviews
+
+# Informe estático con todas las gráficas y tablas de la aplicación, sin Streamlit:
+#   <salida>/<ciudad>/<instantánea>/index.html   -> índice con enlaces a cada gráfica y tabla
+#   <salida>/<ciudad>/<instantánea>/<nombre>.html -> una página por gráfica (y .png con --png)
+# Cada instantánea se genera en un proceso distinto.
+
+# Nivel de zoom del mapa de clusters del informe (la isla entera a la vista)
+REPORT_ZOOM = 10
+
+
+# Gráficas del informe en el mismo orden que las páginas de la aplicación
+def report_figures(dataset, cube, sketches, city, calendar=None, reviews=None, amenities=None):
+    charts = {
+        'vecindario': figures.neighbourhood_pie(analytics.neighbourhood_counts(cube)),
+        'precio_vecindario': figures.neighbourhood_price_bar(analytics.price_by_neighbourhood(cube)),
+    }
+    if calendar is not None:
+        seasonal = analytics.seasonal_prices(calendar, dataset.frame(['id', 'neighbourhood']))
+        charts['precio_mes'] = figures.seasonal_price_line(seasonal)
+        charts['ocupacion_mes'] = figures.seasonal_occupancy_line(seasonal)
+    charts['tipo_habitacion'] = figures.room_type_pie(analytics.room_type_counts(cube))
+    charts['tipo_propiedad'] = figures.property_type_bar(analytics.property_room_counts(cube), city)
+    charts['huespedes'] = figures.accommodates_bar(analytics.accommodates_counts(cube))
+    charts['huespedes_precio'] = figures.accommodates_price_scatter(dataset.frame(['accommodates', 'price']))
+    charts['precio_huespedes'] = figures.accommodates_price_bar(analytics.price_by_accommodates(cube))
+    if amenities is not None:
+        price = dataset.frame(['neighbourhood', 'price'])
+        frequency = amenities.frequency().head(20).sort_values(ascending=True)
+        charts['amenities'] = figures.amenities_frequency_bar(frequency)
+        share = amenities.share_by(price['neighbourhood'], frequency.index[::-1][:15].tolist())
+        charts['amenities_municipio'] = figures.amenities_share_heatmap(share)
+        charts['amenities_precio'] = figures.amenities_lift_bar(amenities.price_lift(price['price']))
+    charts['puntuaciones'] = figures.review_scores_histogram(analytics.review_scores_distribution(sketches))
+    charts['estancia_minima'] = figures.min_nights_histogram(analytics.min_nights_distribution(sketches))
+    charts['primera_review'] = figures.first_review_histogram(analytics.first_review_distribution(sketches))
+    if reviews is not None:
+        charts['reviews_mes'] = figures.monthly_reviews_bar(analytics.monthly_reviews(reviews))
+    charts['tiempo_respuesta'] = figures.response_time_histogram(
+        analytics.response_time_distribution(dataset.frame(['host_response_time'])))
+    table = host_license_table(dataset)
+    charts['superhosts'] = figures.superhost_bar(analytics.superhost_counts(table))
+    charts['licencias'] = figures.license_bar(analytics.license_counts(table))
+    charts['superhosts_licencias'] = figures.superhost_license_bar(analytics.superhost_license_counts(table))
+    charts['licencias_municipio'] = figures.license_share_bar(analytics.license_share(table, 'neighbourhood'), 'neighbourhood')
+    charts['licencias_habitacion'] = figures.license_share_bar(analytics.license_share(table, 'room_type'), 'room_type')
+    return charts
+
+
+def host_license_table(dataset):
+    return analytics.host_license_table({name: dataset.column(name) for name in analytics.HOST_LICENSE_COLUMNS})
+
+
+# Tablas del informe
+def report_tables(dataset, hosts):
+    table = host_license_table(dataset)
+    independence = pd.DataFrame([analytics.license_independence(table, by) for by in ('superhost', 'neighbourhood', 'room_type')],
+                                index=['superhost', 'neighbourhood', 'room_type'], columns=['chi2', 'dof', 'p_value'])
+    return {
+        'hosts': hosts.top(len(hosts)),
+        'superhosts_licencias': analytics.superhost_license_counts(table),
+        'licencias': table.to_series().to_frame(),
+        'licencias_independencia': independence,
+    }
+
+
+# Mapa de Folium con los clusters de la isla entera
+def report_map(dataset):
+    nuevo_listings = dataset.frame(['latitude', 'longitude'])
+    pyramid = build_cluster_pyramid(nuevo_listings['latitude'], nuevo_listings['longitude'])
+    (south, west), (north, east) = map_bounds(nuevo_listings['latitude'], nuevo_listings['longitude'])
+    map1 = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=REPORT_ZOOM)
+    map1.fit_bounds([[south, west], [north, east]])
+    for lat, lon, count in clusters_in_view(pyramid, REPORT_ZOOM).itertuples(index=False):
+        folium.CircleMarker(location=[lat, lon], radius=4 + 3 * np.log2(count),
+                            tooltip=f'{count} AirBnbs', color='#3186cc',
+                            fill=True, fill_opacity=0.6).add_to(map1)
+    return map1
+
+
+# Precalentar el disco de la caché de gráficas de la aplicación (ver figcache.py) con las
+# gráficas sin filtros de la instantánea y los mapas de coropletas de cada métrica. Las
+# figuras se construyen con la plantilla de Plotly de Streamlit, como en la aplicación
+def warm_figure_cache(cache_dir, clean_path, city, dataset, cube, sketches, calendar=None, reviews=None,
+                      amenities=None, geojson_path=None):
+    import plotly.io as pio
+    from streamlit.elements.lib.streamlit_plotly_theme import configure_streamlit_plotly_theme
+
+    from spatial import METRICS, SPATIAL_COLUMNS, area_geojson, area_layer, build_area_snapshot
+    from spatial import build_hex_snapshot, choropleth_map, hex_geojson, read_neighbourhoods
+
+    cache = FigureCache(disk_dir=cache_dir)
+    dataset_hash = snapshot_hash(clean_path)
+    template = pio.templates.default
+    configure_streamlit_plotly_theme()
+    try:
+        for name, fig in report_figures(dataset, cube, sketches, city, calendar, reviews, amenities).items():
+            cache.put(figure_key(dataset_hash, city, *FIGURE_PAGES[name], (), name), fig.to_json(), persist=True)
+    finally:
+        pio.templates.default = template
+
+    layers = {'Hexágonos': hex_geojson(load_snapshot(build_hex_snapshot(clean_path)))}
+    if geojson_path:
+        neighbourhoods = read_neighbourhoods(geojson_path)
+        codes = load_snapshot(build_area_snapshot(clean_path, geojson_path))['area'].to_numpy()
+        layers['Barrios'] = area_geojson(area_layer(codes, dataset.frame(SPATIAL_COLUMNS), neighbourhoods), neighbourhoods)
+    nuevo_listings = dataset.frame(['latitude', 'longitude'])
+    bounds = map_bounds(nuevo_listings['latitude'], nuevo_listings['longitude'])
+    for layer, geojson in layers.items():
+        for metric in METRICS:
+            html = choropleth_map(geojson, metric, bounds, layer).get_root().render()
+            cache.put(figure_key(dataset_hash, city, *FIGURE_PAGES['mapa'], (), 'mapa', (layer, metric)), html, persist=True)
+    return len(cache)
+
+
+def write_index(out_dir, city, snapshot, pages):
+    links = '\n'.join(f'<li><a href="{name}.html">{html.escape(title)}</a></li>' for name, title in pages)
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>AirBnbs de {html.escape(city)}</title></head>\n'
+                f'<body><h1>AirBnbs de {html.escape(city)} ({html.escape(snapshot)})</h1>\n<ul>\n{links}\n</ul></body></html>\n')
+    return os.path.join(out_dir, 'index.html')
+
+
+# Generar el informe de una instantánea. Con data_dir las series salen de los CSV
+# detallados de esa carpeta; sin él, de las publicadas junto a la partición. Con
+# figure_cache_dir se precalienta además la caché de gráficas de la aplicación
+def render_snapshot(clean_path, city, snapshot, out_dir, data_dir=None, png=False, figure_cache_dir=None):
+    out_dir = os.path.join(out_dir, city, snapshot)
+    os.makedirs(out_dir, exist_ok=True)
+
+    dataset = SnapshotDataset(clean_path, exclude=['amenities', 'host_about'])
+    cube = load_snapshot(build_cube_snapshot(clean_path))
+    sketches = load_sketches(build_sketch_snapshot(clean_path))
+    if data_dir is None:
+        calendar = load_published_series(clean_path, 'calendar')
+        reviews = load_published_series(clean_path, 'reviews')
+    else:
+        cache_dir = os.path.join(data_dir, 'cache')
+        calendar = load_series(os.path.join(data_dir, 'calendar.csv.gz'), reduce_calendar, cache_dir)
+        reviews = load_series(os.path.join(data_dir, 'reviews.csv.gz'), reduce_reviews, cache_dir)
+    amenities = load_amenities_index(build_amenities_snapshot(clean_path))
+
+    pages = [('mapa', 'Mapa')]
+    report_map(dataset).save(os.path.join(out_dir, 'mapa.html'))
+    if figure_cache_dir:
+        geojson_path = os.path.join(data_dir or os.path.dirname(clean_path), 'neighbourhoods.geojson')
+        warm_figure_cache(figure_cache_dir, clean_path, city, dataset, cube, sketches, calendar, reviews, amenities,
+                          geojson_path if os.path.exists(geojson_path) else None)
+    for name, fig in report_figures(dataset, cube, sketches, city, calendar, reviews, amenities).items():
+        fig.write_html(os.path.join(out_dir, f'{name}.html'), include_plotlyjs='cdn')
+        if png:
+            fig.write_image(os.path.join(out_dir, f'{name}.png'))
+        pages.append((name, fig.layout.title.text or name))
+    for name, table in report_tables(dataset, HostIndex(load_snapshot(build_host_snapshot(clean_path)))).items():
+        table.to_html(os.path.join(out_dir, f'tabla_{name}.html'))
+        pages.append((f'tabla_{name}', f'Tabla: {name}'))
+    return write_index(out_dir, city, snapshot, pages)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generar el informe estático de una o varias instantáneas')
+    parser.add_argument('out_dir')
+    parser.add_argument('--store', help='almacén particionado (ver store.py)')
+    parser.add_argument('--city', action='append', help='ciudad del almacén (se puede repetir; por defecto todas)')
+    parser.add_argument('--snapshot', action='append', help='instantánea del almacén (se puede repetir; por defecto todas)')
+    parser.add_argument('--data-dir', help='carpeta con los CSV de Inside Airbnb, si no se usa el almacén')
+    parser.add_argument('--city-name', default='Menorca', help='nombre de la ciudad de los CSV de --data-dir')
+    parser.add_argument('--png', action='store_true', help='guardar también cada gráfica en PNG (necesita kaleido)')
+    parser.add_argument('--figure-cache', help='carpeta del disco de la caché de gráficas de la aplicación a precalentar (ver figcache.py)')
+    parser.add_argument('--workers', type=int, default=None, help='número de procesos (por defecto uno por CPU)')
+    args = parser.parse_args()
+
+    if args.store:
+        partitions = list_partitions(args.store)
+        if args.city:
+            partitions = partitions[partitions['city'].isin(args.city)]
+        if args.snapshot:
+            partitions = partitions[partitions['snapshot'].isin(args.snapshot)]
+        if partitions.empty:
+            parser.error(f'No hay instantáneas que coincidan en {args.store}')
+        jobs = [(find_partition(args.store, city, snapshot), city, snapshot, args.out_dir, None, args.png, args.figure_cache)
+                for city, snapshot in partitions.itertuples(index=False)]
+    elif args.data_dir:
+        snapshot_path = build_snapshot(os.path.join(args.data_dir, 'listings.csv'),
+                                       os.path.join(args.data_dir, 'listings_data.csv'),
+                                       os.path.join(args.data_dir, 'cache'))
+        clean_path = build_clean_snapshot(snapshot_path)
+        snapshot = os.path.basename(snapshot_path).split('.')[0]
+        jobs = [(clean_path, args.city_name, snapshot, args.out_dir, args.data_dir, args.png, args.figure_cache)]
+    else:
+        parser.error('Indica --store o --data-dir')
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for index_path in pool.map(render_snapshot, *zip(*jobs)):
+            print(index_path)
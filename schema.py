@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+
+# Versión del esquema: forma parte del nombre de las instantáneas en caché
+SCHEMA_VERSION = 1
+
+# Cadenas con pocos valores distintos
+CATEGORICAL = ['neighbourhood_group', 'neighbourhood', 'room_type', 'property_type', 'host_response_time']
+
+# Columnas 't'/'f'
+BOOLEAN = ['host_is_superhost']
+
+# Enteros pequeños (nulables, porque el merge puede dejar huecos)
+INTEGER = {
+    'accommodates': 'Int8',
+    'minimum_nights': 'Int32',
+    'maximum_nights': 'Int32',
+    'number_of_reviews': 'Int32',
+    'number_of_reviews_ltm': 'Int32',
+    'calculated_host_listings_count': 'Int32',
+    'availability_365': 'Int16',
+}
+
+# Puntuaciones y porcentajes: float32 tiene precisión de sobra
+FLOAT32 = ['review_scores_value', 'review_scores_cleanliness', 'review_scores_location', 'review_scores_accuracy',
+           'review_scores_communication', 'review_scores_checkin', 'review_scores_rating', 'host_response_rate']
+
+DATES = ['first_review', 'last_review']
+
+
+# Convertir el JSON de amenities ('["Wifi", "Pool"]') en una lista de cadenas
+def parse_amenities(value):
+    if not isinstance(value, str):
+        return []
+    try:
+        return json.loads(value)
+    except ValueError:
+        return []
+
+
+# Aplicar el esquema a la unión de los dos CSV
+def apply_schema(nuevo_listings):
+    nuevo_listings = nuevo_listings.copy()
+    for column in CATEGORICAL:
+        if column in nuevo_listings:
+            nuevo_listings[column] = nuevo_listings[column].astype('category')
+    for column in BOOLEAN:
+        if column in nuevo_listings:
+            nuevo_listings[column] = nuevo_listings[column].map({'t': True, 'f': False}).astype('boolean')
+    for column, dtype in INTEGER.items():
+        if column in nuevo_listings:
+            nuevo_listings[column] = pd.to_numeric(nuevo_listings[column], errors='coerce').astype(dtype)
+    # '95%' -> 0.95
+    if 'host_response_rate' in nuevo_listings and not pd.api.types.is_numeric_dtype(nuevo_listings['host_response_rate']):
+        rate = nuevo_listings['host_response_rate'].str.rstrip('%')
+        nuevo_listings['host_response_rate'] = pd.to_numeric(rate, errors='coerce') / 100
+    for column in FLOAT32:
+        if column in nuevo_listings:
+            nuevo_listings[column] = pd.to_numeric(nuevo_listings[column], errors='coerce').astype('float32')
+    for column in DATES:
+        if column in nuevo_listings:
+            nuevo_listings[column] = pd.to_datetime(nuevo_listings[column])
+    if 'amenities' in nuevo_listings:
+        nuevo_listings['amenities'] = nuevo_listings['amenities'].map(parse_amenities)
+    return nuevo_listings
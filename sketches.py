@@ -0,0 +1,206 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Resúmenes compactos (sketches) de las columnas que se pintan como distribución:
+#   - TDigest: cuantiles aproximados con un centenar de centroides
+#   - FixedHistogram: recuentos sobre bordes fijos
+# Los dos se calculan leyendo la instantánea por bloques y se pueden combinar entre
+# bloques, instantáneas o ciudades sin volver a leer los datos.
+
+SKETCHES_VERSION = 1
+
+# Número aproximado de centroides del t-digest (más = cuantiles más precisos)
+DIGEST_COMPRESSION = 200
+
+# Filas por bloque al recorrer la instantánea
+BATCH_SIZE = 100_000
+
+
+# Meses desde 1970 (para poder usar fechas como números en los histogramas)
+def month_number(year, month=1):
+    return (year - 1970) * 12 + month - 1
+
+
+# Bordes fijos de cada histograma: siempre los mismos para que se puedan sumar
+HISTOGRAM_EDGES = {
+    # Puntuación de 0 a 5 en pasos de 0.05
+    'review_scores_rating': np.linspace(0, 5, 101),
+    # Una barra por noche; la última recoge las estancias mínimas de 1125 noches o más
+    'minimum_nights': np.arange(0, 1127, dtype=float),
+    # Una barra por mes, de 2008 (los primeros anuncios) a 2035
+    'first_review': np.arange(month_number(2008), month_number(2036) + 1, dtype=float),
+}
+
+# Columnas con t-digest
+DIGEST_COLUMNS = ['price', 'review_scores_rating', 'minimum_nights']
+
+
+# t-digest: la distribución se resume en centroides (media y peso) más pequeños cuanto
+# más cerca de los extremos, donde más precisión hace falta. Esta versión compacta todos
+# los puntos de una vez (vectorizada) en lugar de insertarlos uno a uno
+class TDigest:
+
+    def __init__(self, means=(), weights=(), minimum=np.nan, maximum=np.nan, compression=DIGEST_COMPRESSION):
+        self.means = np.asarray(means, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.compression = compression
+
+    @classmethod
+    def from_values(cls, values, compression=DIGEST_COMPRESSION):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return cls(compression=compression)
+        return cls(values, np.ones(len(values)), values.min(), values.max(), compression)._compress()
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    # Agrupar los centroides: cada uno cae en la celda entera de la escala
+    # k = compression / 2π · arcsin(2q - 1) de su cuantil q, que es más estrecha en las colas
+    def _compress(self):
+        if len(self.means) == 0:
+            return self
+        order = np.argsort(self.means, kind='stable')
+        means, weights = self.means[order], self.weights[order]
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        cluster_weights = np.bincount(cluster, weights=weights)
+        used = cluster_weights > 0
+        cluster_means = np.bincount(cluster, weights=weights * means)[used] / cluster_weights[used]
+        return TDigest(cluster_means, cluster_weights[used], self.minimum, self.maximum, self.compression)
+
+    def merge(self, other):
+        if len(other.means) == 0:
+            return self
+        if len(self.means) == 0:
+            return other
+        return TDigest(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]),
+                       min(self.minimum, other.minimum), max(self.maximum, other.maximum), self.compression)._compress()
+
+    # Cuantiles interpolando entre los centros de los centroides y los extremos reales
+    def quantile(self, q):
+        q = np.asarray(q, dtype=float)
+        if len(self.means) == 0:
+            return np.full(q.shape, np.nan)
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0], centers, [total]])
+        values = np.concatenate([[self.minimum], self.means, [self.maximum]])
+        return np.interp(q * total, positions, values)
+
+    def to_dict(self):
+        return {'type': 'tdigest', 'compression': self.compression, 'minimum': self.minimum, 'maximum': self.maximum,
+                'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+
+# Histograma sobre bordes fijos: la barra i cuenta los valores en [edges[i], edges[i+1]);
+# los valores fuera del rango van a la primera o a la última barra
+class FixedHistogram:
+
+    def __init__(self, edges, counts=None, missing=0):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.missing = int(missing)
+
+    @classmethod
+    def from_values(cls, values, edges):
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        bins = (np.searchsorted(edges, values[valid], side='right') - 1).clip(0, len(edges) - 2)
+        return cls(edges, np.bincount(bins, minlength=len(edges) - 1), int((~valid).sum()))
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('Solo se pueden combinar histogramas con los mismos bordes')
+        return FixedHistogram(self.edges, self.counts + other.counts, self.missing + other.missing)
+
+    # Agrupar las barras de factor en factor (p. ej. para pintar menos barras)
+    def rebin(self, factor):
+        size = -(-len(self.counts) // factor) * factor
+        counts = np.pad(self.counts, (0, size - len(self.counts))).reshape(-1, factor).sum(axis=1)
+        edges = np.append(self.edges[:-1:factor], self.edges[-1])
+        return FixedHistogram(edges, counts, self.missing)
+
+    # Cuantil aproximado interpolando dentro de la barra
+    def quantile(self, q):
+        cum = np.concatenate([[0], np.cumsum(self.counts)])
+        return np.interp(np.asarray(q, dtype=float) * cum[-1], cum, self.edges)
+
+    def to_frame(self):
+        return pd.DataFrame({'start': self.edges[:-1], 'end': self.edges[1:], 'count': self.counts})
+
+    def to_dict(self):
+        return {'type': 'histogram', 'edges': self.edges.tolist(), 'counts': self.counts.tolist(), 'missing': self.missing}
+
+
+def sketch_from_dict(stored):
+    if stored['type'] == 'tdigest':
+        return TDigest(stored['means'], stored['weights'], stored['minimum'], stored['maximum'], stored['compression'])
+    return FixedHistogram(stored['edges'], stored['counts'], stored['missing'])
+
+
+# Valores numéricos de una columna (las fechas, en meses desde 1970; los nulos, NaN)
+def numeric_values(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        months = values.dt.year * 12 + values.dt.month - 1 - 1970 * 12
+        return months.to_numpy(dtype=float, na_value=np.nan)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def sketch_names():
+    return [f'{column}:histogram' for column in HISTOGRAM_EDGES] + [f'{column}:tdigest' for column in DIGEST_COLUMNS]
+
+
+# Sketches de un bloque de anuncios, con nombres '<columna>:histogram' y '<columna>:tdigest'
+def build_sketches(nuevo_listings):
+    sketches = {}
+    for column, edges in HISTOGRAM_EDGES.items():
+        if column in nuevo_listings:
+            sketches[f'{column}:histogram'] = FixedHistogram.from_values(numeric_values(nuevo_listings[column]), edges)
+    for column in DIGEST_COLUMNS:
+        if column in nuevo_listings:
+            sketches[f'{column}:tdigest'] = TDigest.from_values(numeric_values(nuevo_listings[column]))
+    return sketches
+
+
+# Combinar los sketches de varios bloques, instantáneas o ciudades
+def merge_sketches(*parts):
+    merged = {}
+    for sketches in parts:
+        for name, sketch in sketches.items():
+            merged[name] = sketch if name not in merged else merged[name].merge(sketch)
+    return merged
+
+
+def save_sketches(sketches, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({name: sketch.to_dict() for name, sketch in sketches.items()}, f)
+    os.replace(tmp_path, path)
+
+
+def load_sketches(path):
+    with open(path) as f:
+        return {name: sketch_from_dict(stored) for name, stored in json.load(f).items()}
+
+
+# Calcular los sketches una vez por instantánea limpia, leyéndola por bloques, y guardarlos a su lado
+def build_sketch_snapshot(clean_path):
+    sketches_path = clean_path.replace('.parquet', f'.sketches-v{SKETCHES_VERSION}.json')
+    if not os.path.exists(sketches_path):
+        parquet = pq.ParquetFile(clean_path)
+        columns = [c for c in list(HISTOGRAM_EDGES) + DIGEST_COLUMNS if c in parquet.schema_arrow.names]
+        batches = parquet.iter_batches(batch_size=BATCH_SIZE, columns=list(dict.fromkeys(columns)))
+        save_sketches(merge_sketches(*(build_sketches(batch.to_pandas()) for batch in batches)), sketches_path)
+    return sketches_path
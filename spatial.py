@@ -0,0 +1,198 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from geo import mercator_latlon, mercator_pixels
+from ingest import snapshot_hash, write_parquet
+from tracing import traced
+
+# Agregados espaciales para los mapas de coropletas: los anuncios se agrupan en hexágonos
+# (binning vectorizado en coordenadas de Web Mercator) o en los barrios del GeoJSON de
+# Inside Airbnb (unión punto en polígono con el índice STRtree de shapely). Cada capa
+# lleva, por celda o barrio, el número de anuncios, el precio mediano y la proporción con
+# licencia, y se calcula una vez por instantánea.
+
+SPATIAL_VERSION = 1
+
+# Columnas de los anuncios que necesitan las capas
+SPATIAL_COLUMNS = ['latitude', 'longitude', 'price', 'license']
+
+# Métricas de cada celda o barrio
+METRICS = {'count': 'Anuncios', 'median_price': 'Precio mediano', 'license_rate': 'Proporción con licencia'}
+
+# Radio del hexágono (centro a vértice) en píxeles al nivel de zoom HEX_ZOOM: unos 700 m
+# en latitudes como la de Menorca. Al ser píxeles de Mercator, en el mapa todos los
+# hexágonos se ven regulares y del mismo tamaño
+HEX_ZOOM = 12
+HEX_PIXELS = 24
+
+SQRT3 = np.sqrt(3)
+
+
+# Hexágono (q, r) en coordenadas axiales (vértice hacia arriba) de cada punto en píxeles:
+# se redondean las coordenadas cúbicas y se corrige la que más se haya desviado
+def hex_cells(x, y, size=HEX_PIXELS):
+    qf = (SQRT3 / 3 * x - y / 3) / size
+    rf = 2 / 3 * y / size
+    sf = -qf - rf
+    q, r, s = np.round(qf), np.round(rf), np.round(sf)
+    dq, dr, ds = np.abs(q - qf), np.abs(r - rf), np.abs(s - sf)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    q = np.where(fix_q, -r - s, q)
+    r = np.where(fix_r, -q - s, r)
+    return q.astype(np.int64), r.astype(np.int64)
+
+
+# Centro de cada hexágono en píxeles
+def hex_centers(q, r, size=HEX_PIXELS):
+    return size * SQRT3 * (q + r / 2), size * 1.5 * r
+
+
+# Número de anuncios, precio mediano y proporción con licencia por grupo
+def group_metrics(keys, nuevo_listings):
+    metrics = pd.DataFrame({
+        'price': pd.to_numeric(nuevo_listings['price']).to_numpy(dtype=float, na_value=np.nan),
+        'licensed': nuevo_listings['license'].notna().to_numpy(),
+    })
+    groups = metrics.groupby(keys)
+    return pd.DataFrame({
+        'count': groups.size(),
+        'median_price': groups['price'].median(),
+        'license_rate': groups['licensed'].mean(),
+    })
+
+
+# Capa de hexágonos: una fila por hexágono con anuncios, con su centro y sus métricas
+@traced()
+def hex_layer(nuevo_listings):
+    lat = nuevo_listings['latitude'].to_numpy(dtype=float, na_value=np.nan)
+    lon = nuevo_listings['longitude'].to_numpy(dtype=float, na_value=np.nan)
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    x, y = mercator_pixels(lat[valid], lon[valid], HEX_ZOOM)
+    q, r = hex_cells(x, y)
+    cells = group_metrics([q, r], nuevo_listings[valid]).rename_axis(['q', 'r']).reset_index()
+    cells['latitude'], cells['longitude'] = mercator_latlon(*hex_centers(cells['q'].to_numpy(), cells['r'].to_numpy()), HEX_ZOOM)
+    return cells[['q', 'r', 'latitude', 'longitude', *METRICS]]
+
+
+# Polígonos GeoJSON de los hexágonos (seis vértices y el primero repetido para cerrarlo)
+def hex_polygons(cells):
+    cx, cy = hex_centers(cells['q'].to_numpy()[:, None], cells['r'].to_numpy()[:, None])
+    angles = np.radians(30 + 60 * np.arange(7))
+    lat, lon = mercator_latlon(cx + HEX_PIXELS * np.cos(angles), cy + HEX_PIXELS * np.sin(angles), HEX_ZOOM)
+    return [{'type': 'Polygon', 'coordinates': [np.stack([lon_row, lat_row], axis=1).tolist()]}
+            for lat_row, lon_row in zip(lat, lon)]
+
+
+# Barrios del GeoJSON de Inside Airbnb (neighbourhoods.geojson)
+def read_neighbourhoods(geojson_path):
+    with open(geojson_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def neighbourhood_names(neighbourhoods):
+    return [(feature.get('properties') or {}).get('neighbourhood') or str(i)
+            for i, feature in enumerate(neighbourhoods['features'])]
+
+
+# Barrio de cada punto (posición en el GeoJSON, -1 si no cae en ninguno). El STRtree
+# descarta por las cajas de cada polígono y solo se comprueba la geometría exacta de
+# los candidatos; si los barrios se solapan, el punto se queda con el primero
+@traced()
+def neighbourhood_join(lat, lon, neighbourhoods):
+    import shapely
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    polygons = shapely.from_geojson([json.dumps(feature['geometry']) for feature in neighbourhoods['features']])
+    tree = shapely.STRtree(polygons)
+    valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    points, areas = tree.query(shapely.points(lon[valid], lat[valid]), predicate='within')
+    order = np.lexsort((areas, points))
+    points, areas = points[order], areas[order]
+    _, first = np.unique(points, return_index=True)
+    codes = np.full(len(lat), -1, dtype=np.int32)
+    codes[valid[points[first]]] = areas[first]
+    return codes
+
+
+# Capa de barrios a partir del barrio de cada anuncio (neighbourhood_join): una fila por
+# barrio del GeoJSON, también los que no tienen anuncios
+@traced()
+def area_layer(codes, nuevo_listings, neighbourhoods):
+    names = neighbourhood_names(neighbourhoods)
+    inside = codes >= 0
+    areas = group_metrics([codes[inside]], nuevo_listings[inside]).reindex(range(len(names)))
+    areas['count'] = areas['count'].fillna(0).astype(np.int64)
+    areas.insert(0, 'name', names)
+    return areas.rename_axis('area').reset_index()
+
+
+# GeoJSON de una capa: una geometría por fila de la tabla, con sus métricas (redondeadas)
+# como propiedades, None donde no hay dato, para las coropletas y las etiquetas
+def layer_geojson(geometries, table):
+    table = table.round(3).astype(object).where(table.notna(), None)
+    features = [{'type': 'Feature', 'geometry': geometry, 'properties': properties}
+                for geometry, properties in zip(geometries, table.to_dict('records'))]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def hex_geojson(cells):
+    return layer_geojson(hex_polygons(cells), cells[list(METRICS)])
+
+
+def area_geojson(areas, neighbourhoods):
+    geometries = [neighbourhoods['features'][area]['geometry'] for area in areas['area']]
+    return layer_geojson(geometries, areas[['name', *METRICS]])
+
+
+# Mapa de Folium con una capa de coropletas (GeoJSON de hex_geojson o area_geojson)
+# coloreada por una métrica, con su leyenda y una etiqueta con todas las métricas
+def choropleth_map(geojson, metric, bounds, name):
+    import folium
+    from branca.colormap import linear
+
+    # Escala de color entre el mínimo y el máximo de la métrica (gris donde no hay dato)
+    values = [f['properties'][metric] for f in geojson['features'] if f['properties'][metric] is not None]
+    low, high = (min(values), max(values)) if values else (0, 1)
+    colormap = linear.YlOrRd_09.scale(low, max(high, low + 1e-9))
+    colormap.caption = METRICS[metric]
+
+    def style(feature):
+        value = feature['properties'][metric]
+        return {'fillColor': '#cccccc' if value is None else colormap(value),
+                'color': '#555555', 'weight': 0.5, 'fillOpacity': 0.7}
+
+    aliases = {'name': 'Barrio', **METRICS}
+    fields = [field for field in aliases if geojson['features'] and field in geojson['features'][0]['properties']]
+    tooltip = folium.GeoJsonTooltip(fields=fields, aliases=[aliases[f] for f in fields]) if fields else None
+
+    (south, west), (north, east) = bounds
+    map1 = folium.Map(location=[(south + north) / 2, (west + east) / 2], zoom_start=9.5)
+    map1.fit_bounds([[south, west], [north, east]])
+    folium.GeoJson(geojson, name=name, style_function=style, tooltip=tooltip).add_to(map1)
+    colormap.add_to(map1)
+    return map1
+
+
+# Calcular la capa de hexágonos una vez por instantánea limpia y guardarla a su lado
+def build_hex_snapshot(clean_path):
+    hexes_path = clean_path.replace('.parquet', f'.hexes-v{SPATIAL_VERSION}.parquet')
+    if not os.path.exists(hexes_path):
+        write_parquet(hex_layer(pd.read_parquet(clean_path, columns=SPATIAL_COLUMNS)), hexes_path)
+    return hexes_path
+
+
+# Barrio de cada anuncio de la instantánea limpia (en el mismo orden de filas), guardado
+# a su lado; el nombre lleva el hash del GeoJSON para rehacerlo si cambian los barrios
+def build_area_snapshot(clean_path, geojson_path):
+    areas_path = clean_path.replace('.parquet', f'.areas-{snapshot_hash(geojson_path)}-v{SPATIAL_VERSION}.parquet')
+    if not os.path.exists(areas_path):
+        nuevo_listings = pd.read_parquet(clean_path, columns=['latitude', 'longitude'])
+        codes = neighbourhood_join(nuevo_listings['latitude'], nuevo_listings['longitude'],
+                                   read_neighbourhoods(geojson_path))
+        write_parquet(pd.DataFrame({'area': codes}), areas_path)
+    return areas_path
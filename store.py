@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from ingest import clean_listings, load_snapshot, merge_csvs, write_parquet
+from sketches import build_sketch_snapshot, load_sketches, merge_sketches
+from timeseries import reduce_calendar, reduce_reviews
+
+# Almacén particionado por ciudad e instantánea (estilo Hive):
+#   <store>/city=<ciudad>/snapshot=<fecha>/listings.parquet   -> anuncios limpios
+#   <store>/city=<ciudad>/snapshot=<fecha>/calendar.parquet   -> series del calendario (opcional)
+#   <store>/city=<ciudad>/snapshot=<fecha>/reviews.parquet    -> series de reseñas (opcional)
+#   <store>/city=<ciudad>/snapshot=<fecha>/neighbourhoods.geojson -> barrios (opcional)
+# Los derivados (cubo, amenities) se generan al lado de listings.parquet como en la caché.
+PARTITION_FILE = 'listings.parquet'
+PARTITIONING = ds.partitioning(pa.schema([('city', pa.string()), ('snapshot', pa.string())]), flavor='hive')
+
+
+def partition_dir(store_dir, city, snapshot_date):
+    return os.path.join(store_dir, f'city={city}', f'snapshot={snapshot_date}')
+
+
+# Publicar una instantánea de una ciudad en el almacén
+def publish_snapshot(listings_path, listings_data_path, store_dir, city, snapshot_date,
+                     calendar_path=None, reviews_path=None, neighbourhoods_path=None):
+    target = partition_dir(store_dir, city, snapshot_date)
+    os.makedirs(target, exist_ok=True)
+    if neighbourhoods_path:
+        tmp_path = os.path.join(target, f'neighbourhoods.geojson.{os.getpid()}.tmp')
+        shutil.copyfile(neighbourhoods_path, tmp_path)
+        os.replace(tmp_path, os.path.join(target, 'neighbourhoods.geojson'))
+    if calendar_path:
+        write_parquet(reduce_calendar(calendar_path), os.path.join(target, 'calendar.parquet'))
+    if reviews_path:
+        write_parquet(reduce_reviews(reviews_path), os.path.join(target, 'reviews.parquet'))
+    # listings.parquet se escribe el último: su presencia marca la partición como completa
+    nuevo_listings = clean_listings(merge_csvs(listings_path, listings_data_path))
+    write_parquet(nuevo_listings, os.path.join(target, PARTITION_FILE))
+    build_sketch_snapshot(os.path.join(target, PARTITION_FILE))
+    return os.path.join(target, PARTITION_FILE)
+
+
+# Dataset de Arrow sobre todas las particiones; solo se listan los listings.parquet
+# para que los ficheros derivados de cada partición no se mezclen con los datos
+def open_store(store_dir):
+    files = sorted(glob.glob(os.path.join(store_dir, 'city=*', 'snapshot=*', PARTITION_FILE)))
+    return ds.dataset(files, format='parquet', partitioning=PARTITIONING, partition_base_dir=store_dir)
+
+
+def partition_filter(cities=None, snapshots=None):
+    expression = None
+    for field, values in (('city', cities), ('snapshot', snapshots)):
+        if values is not None:
+            condition = ds.field(field).isin(list(values))
+            expression = condition if expression is None else expression & condition
+    return expression
+
+
+# Ciudades e instantáneas disponibles (solo mira las rutas, no abre los ficheros)
+def list_partitions(store_dir):
+    rows = [ds.get_partition_keys(fragment.partition_expression)
+            for fragment in open_store(store_dir).get_fragments()]
+    return pd.DataFrame(rows, columns=['city', 'snapshot'])
+
+
+# Ruta del fichero de una partición; el filtro se resuelve con las claves de partición
+def find_partition(store_dir, city, snapshot_date):
+    fragments = list(open_store(store_dir).get_fragments(filter=partition_filter([city], [snapshot_date])))
+    if not fragments:
+        raise FileNotFoundError(f'No hay datos de {city} en {snapshot_date} en {store_dir}')
+    return fragments[0].path
+
+
+# Leer varias particiones a la vez (p. ej. para comparar ciudades): el filtro se
+# aplica a las claves de partición, así que las ciudades no pedidas ni se abren
+def read_store(store_dir, columns=None, cities=None, snapshots=None):
+    table = open_store(store_dir).to_table(columns=columns, filter=partition_filter(cities, snapshots))
+    return table.to_pandas()
+
+
+# Sketches de varias particiones combinados (p. ej. la distribución de precios de todas
+# las ciudades) sin leer los anuncios: solo se abren los sketches de cada partición
+def read_store_sketches(store_dir, cities=None, snapshots=None):
+    fragments = open_store(store_dir).get_fragments(filter=partition_filter(cities, snapshots))
+    return merge_sketches(*(load_sketches(build_sketch_snapshot(fragment.path)) for fragment in fragments))
+
+
+# Series publicadas junto a una partición (None si no se publicaron)
+def load_published_series(partition_path, name):
+    series_path = os.path.join(os.path.dirname(partition_path), f'{name}.parquet')
+    if not os.path.exists(series_path):
+        return None
+    return load_snapshot(series_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Publicar una instantánea de Inside Airbnb en el almacén particionado')
+    parser.add_argument('listings')
+    parser.add_argument('listings_data')
+    parser.add_argument('store_dir')
+    parser.add_argument('city')
+    parser.add_argument('snapshot_date')
+    parser.add_argument('--calendar')
+    parser.add_argument('--reviews')
+    parser.add_argument('--neighbourhoods')
+    args = parser.parse_args()
+    print(publish_snapshot(args.listings, args.listings_data, args.store_dir, args.city, args.snapshot_date,
+                           calendar_path=args.calendar, reviews_path=args.reviews,
+                           neighbourhoods_path=args.neighbourhoods))
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Datos sintéticos con la forma de los CSV de Inside Airbnb (listings.csv y
+# listings_data.csv), para medir la aplicación con mercados más grandes que Menorca
+# sin descargar nada. Las distribuciones imitan las de los datos reales: unos pocos
+# hosts con muchos anuncios, precios log-normales, anuncios sin reseñas ni puntuación...
+
+# Columnas del resumen (listings.csv), en el orden del fichero real
+SUMMARY_COLUMNS = ['id', 'name', 'host_id', 'host_name', 'neighbourhood_group', 'neighbourhood', 'latitude', 'longitude',
+                   'room_type', 'price', 'minimum_nights', 'number_of_reviews', 'last_review', 'reviews_per_month',
+                   'calculated_host_listings_count', 'availability_365', 'number_of_reviews_ltm', 'license']
+
+# Columnas del fichero detallado (listings_data.csv), en el orden del fichero real
+DETAIL_COLUMNS = ['id', 'listing_url', 'scrape_id', 'last_scraped', 'source', 'name', 'description', 'neighborhood_overview',
+                  'picture_url', 'host_id', 'host_url', 'host_name', 'host_since', 'host_location', 'host_about',
+                  'host_response_time', 'host_response_rate', 'host_acceptance_rate', 'host_is_superhost',
+                  'host_thumbnail_url', 'host_picture_url', 'host_neighbourhood', 'host_listings_count',
+                  'host_total_listings_count', 'host_verifications', 'host_has_profile_pic', 'host_identity_verified',
+                  'neighbourhood', 'neighbourhood_cleansed', 'neighbourhood_group_cleansed', 'latitude', 'longitude',
+                  'property_type', 'room_type', 'accommodates', 'bathrooms', 'bathrooms_text', 'bedrooms', 'beds',
+                  'amenities', 'price', 'minimum_nights', 'maximum_nights', 'minimum_minimum_nights',
+                  'maximum_minimum_nights', 'minimum_maximum_nights', 'maximum_maximum_nights', 'minimum_nights_avg_ntm',
+                  'maximum_nights_avg_ntm', 'calendar_updated', 'has_availability', 'availability_30', 'availability_60',
+                  'availability_90', 'availability_365', 'calendar_last_scraped', 'number_of_reviews',
+                  'number_of_reviews_ltm', 'number_of_reviews_l30d', 'first_review', 'last_review',
+                  'review_scores_rating', 'review_scores_accuracy', 'review_scores_cleanliness', 'review_scores_checkin',
+                  'review_scores_communication', 'review_scores_location', 'review_scores_value', 'license',
+                  'instant_bookable', 'calculated_host_listings_count', 'calculated_host_listings_count_entire_homes',
+                  'calculated_host_listings_count_private_rooms', 'calculated_host_listings_count_shared_rooms',
+                  'reviews_per_month']
+
+# Municipios: (peso, latitud, longitud, factor de precio)
+NEIGHBOURHOODS = {
+    'Ciutadella de Menorca': (0.30, 40.00, 3.84, 1.00),
+    'Es Mercadal': (0.16, 40.03, 4.15, 1.15),
+    'Sant Lluís': (0.13, 39.85, 4.25, 1.10),
+    'Maó': (0.10, 39.89, 4.26, 0.90),
+    'Alaior': (0.09, 39.93, 4.12, 1.05),
+    'Es Castell': (0.08, 39.88, 4.29, 0.95),
+    'Ferreries': (0.08, 39.98, 4.01, 1.00),
+    'Es Migjorn Gran': (0.06, 39.94, 4.05, 1.05),
+}
+
+# Tipos de habitación: (peso, factor de precio, tipos de propiedad posibles)
+ROOM_TYPES = {
+    'Entire home/apt': (0.86, 1.0, ['Entire home', 'Entire rental unit', 'Entire villa', 'Entire condo', 'Entire townhouse', 'Entire cottage']),
+    'Private room': (0.11, 0.45, ['Private room in home', 'Private room in bed and breakfast', 'Private room in rental unit']),
+    'Hotel room': (0.02, 0.8, ['Room in hotel', 'Room in boutique hotel']),
+    'Shared room': (0.01, 0.3, ['Shared room in home']),
+}
+
+RESPONSE_TIMES = ['within an hour', 'within a few hours', 'within a day', 'a few days or more']
+
+AMENITIES = ['Wifi', 'Kitchen', 'Essentials', 'Hair dryer', 'Hangers', 'Iron', 'Washer', 'Dishes and silverware',
+             'Refrigerator', 'Cooking basics', 'Hot water', 'Bed linens', 'TV', 'Air conditioning', 'Microwave',
+             'Coffee maker', 'Oven', 'Stove', 'Shampoo', 'Dedicated workspace', 'Long term stays allowed',
+             'Patio or balcony', 'Outdoor furniture', 'Private entrance', 'Pool', 'Free parking on premises',
+             'Free street parking', 'Dishwasher', 'Freezer', 'Wine glasses', 'Toaster', 'Dining table',
+             'Outdoor dining area', 'BBQ grill', 'Backyard', 'Heating', 'Smoke alarm', 'Fire extinguisher',
+             'First aid kit', 'Crib', 'High chair', 'Beach access', 'Sea view', 'Garden view', 'Elevator',
+             'Pets allowed', 'Self check-in', 'Lockbox', 'Ceiling fan', 'Portable fans', 'Room-darkening shades',
+             'Clothing storage', 'Extra pillows and blankets', 'Body soap', 'Shower gel', 'Beach essentials',
+             'Children’s books and toys', 'Board games', 'Sound system', 'Hot tub', 'EV charger', 'Gym',
+             'Luggage dropoff allowed', 'Cleaning available during stay', 'Private pool', 'Sun loungers']
+
+# Número de combinaciones de amenities distintas (se reparten entre los anuncios)
+AMENITY_COMBINATIONS = 2048
+
+DESCRIPTIONS = ['Casa tradicional menorquina a pocos minutos de la playa.',
+                'Apartamento luminoso con terraza y vistas al mar.',
+                'Villa con piscina privada y jardín, ideal para familias.',
+                'Habitación tranquila en el centro histórico.']
+
+SCRAPE_DATE = pd.Timestamp('2024-06-30')
+
+
+# Elegir un valor de choices para cada fila según los pesos
+def _choice(rng, choices, n, weights=None):
+    weights = None if weights is None else np.asarray(weights, dtype=float) / np.sum(weights)
+    return np.asarray(choices, dtype=object)[rng.choice(len(choices), n, p=weights)]
+
+
+def _strings(prefix, values):
+    return prefix + pd.Series(values).astype(str)
+
+
+def _dates(days):
+    return pd.Series(SCRAPE_DATE - pd.to_timedelta(days, unit='D')).dt.strftime('%Y-%m-%d').where(~np.isnan(days))
+
+
+# JSON de amenities ya serializado para un conjunto fijo de combinaciones: serializar
+# una lista por fila es lo más lento de generar un millón de anuncios
+def _amenity_pool(rng):
+    popularity = np.linspace(1, 0.05, len(AMENITIES))
+    pool = []
+    for size in rng.integers(5, 45, AMENITY_COMBINATIONS):
+        chosen = rng.choice(len(AMENITIES), size, replace=False, p=popularity / popularity.sum())
+        pool.append(json.dumps([AMENITIES[i] for i in sorted(chosen)]))
+    return np.array(pool, dtype=object)
+
+
+# Generar n anuncios: devuelve los DataFrame de listings.csv y listings_data.csv
+def generate_listings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = np.int64(10_000_000) + rng.permutation(n).astype(np.int64) * 97
+
+    # Hosts: pesos de Zipf, así unos pocos gestionan cientos de anuncios
+    n_hosts = max(1, n * 2 // 5)
+    host_weights = 1 / np.arange(1, n_hosts + 1) ** 0.9
+    host_codes = rng.choice(n_hosts, n, p=host_weights / host_weights.sum())
+    host_ids = np.int64(1_000_000) + host_codes * 13
+    host_names = _strings('Host ', host_codes)
+    host_listings = np.bincount(host_codes, minlength=n_hosts)[host_codes]
+
+    neighbourhood_names = list(NEIGHBOURHOODS)
+    weight, lat, lon, price_factor = map(np.array, zip(*NEIGHBOURHOODS.values()))
+    neighbourhood = rng.choice(len(neighbourhood_names), n, p=weight / weight.sum())
+    room_names = list(ROOM_TYPES)
+    room_weight, room_factor, property_types = zip(*ROOM_TYPES.values())
+    room = rng.choice(len(room_names), n, p=np.array(room_weight) / sum(room_weight))
+    property_type = np.empty(n, dtype=object)
+    for code, types in enumerate(property_types):
+        rows = np.flatnonzero(room == code)
+        property_type[rows] = _choice(rng, types, len(rows))
+
+    accommodates = np.where(room == 0, rng.integers(2, 13, n), rng.integers(1, 4, n))
+    price = np.round(rng.lognormal(np.log(60), 0.5, n) * np.sqrt(accommodates)
+                     * price_factor[neighbourhood] * np.array(room_factor)[room])
+    price[rng.random(n) < 0.03] = np.nan
+    minimum_nights = _choice(rng, [1, 2, 3, 4, 5, 7, 14, 30, 90, 365], n, [20, 18, 15, 10, 12, 15, 4, 4, 1, 1])
+
+    number_of_reviews = rng.negative_binomial(0.6, 0.03, n)
+    reviewed = number_of_reviews > 0
+    first_days = np.where(reviewed, rng.integers(30, 4500, n), np.nan)
+    last_days = np.where(reviewed, np.floor(first_days * rng.random(n) ** 3), np.nan)
+    reviews_per_month = np.where(reviewed, np.round(number_of_reviews / np.maximum(first_days / 30.4, 1), 2), np.nan)
+
+    def score(spread):
+        values = np.round(np.clip(5 - rng.exponential(spread, n), 0, 5), 2)
+        return np.where(reviewed, values, np.nan)
+
+    superhost = _choice(rng, ['t', 'f'], n, [25, 75])
+    superhost[rng.random(n) < 0.001] = np.nan
+    # Los superhosts tienen licencia algo más a menudo
+    licensed = rng.random(n) < np.where(superhost == 't', 0.7, 0.55)
+    license = np.where(licensed, _strings('ETR/ME/', rng.integers(1, 9999, n)), None)
+
+    response_time = _choice(rng, RESPONSE_TIMES, n, [60, 20, 8, 2]).astype(object)
+    responds = rng.random(n) < 0.85
+    response_time[~responds] = np.nan
+    response_rate = np.where(responds, _strings('', rng.integers(60, 101, n)) + '%', None)
+
+    amenities = _amenity_pool(rng)[rng.integers(0, AMENITY_COMBINATIONS, n)]
+    availability_365 = rng.integers(0, 366, n)
+    neighbourhoods = np.asarray(neighbourhood_names, dtype=object)[neighbourhood]
+    rooms = np.asarray(room_names, dtype=object)[room]
+    names = _strings('Alojamiento ', ids)
+
+    common = {
+        'id': ids,
+        'name': names,
+        'host_id': host_ids,
+        'host_name': host_names,
+        'neighbourhood_group': np.nan,
+        'latitude': np.round(lat[neighbourhood] + rng.normal(0, 0.02, n), 6),
+        'longitude': np.round(lon[neighbourhood] + rng.normal(0, 0.03, n), 6),
+        'room_type': rooms,
+        'minimum_nights': minimum_nights,
+        'number_of_reviews': number_of_reviews,
+        'last_review': _dates(last_days),
+        'reviews_per_month': reviews_per_month,
+        'calculated_host_listings_count': host_listings,
+        'availability_365': availability_365,
+        'number_of_reviews_ltm': rng.binomial(number_of_reviews, 0.2),
+        'license': license,
+    }
+    listings = pd.DataFrame({**common, 'neighbourhood': neighbourhoods, 'price': price})[SUMMARY_COLUMNS]
+
+    detail = {
+        **common,
+        'listing_url': _strings('https://www.airbnb.com/rooms/', ids),
+        'scrape_id': 20240630000000,
+        'last_scraped': SCRAPE_DATE.strftime('%Y-%m-%d'),
+        'source': _choice(rng, ['city scrape', 'previous scrape'], n, [90, 10]),
+        'description': _choice(rng, DESCRIPTIONS, n),
+        'neighborhood_overview': np.where(rng.random(n) < 0.5, 'Zona tranquila cerca del mar.', None),
+        'picture_url': _strings('https://a0.muscache.com/pictures/', ids) + '.jpg',
+        'host_url': _strings('https://www.airbnb.com/users/show/', host_ids),
+        'host_since': _dates(rng.integers(100, 5000, n).astype(float)),
+        'host_location': np.where(rng.random(n) < 0.65, 'Menorca, Spain', None),
+        'host_about': np.where(rng.random(n) < 0.6, 'Nos encanta Menorca y recibir a viajeros de todo el mundo.', None),
+        'host_response_time': response_time,
+        'host_response_rate': response_rate,
+        'host_acceptance_rate': _strings('', rng.integers(50, 101, n)) + '%',
+        'host_is_superhost': superhost,
+        'host_thumbnail_url': _strings('https://a0.muscache.com/im/users/', host_ids) + '/small.jpg',
+        'host_picture_url': _strings('https://a0.muscache.com/im/users/', host_ids) + '.jpg',
+        'host_neighbourhood': None,
+        'host_listings_count': host_listings,
+        'host_total_listings_count': host_listings,
+        'host_verifications': "['email', 'phone']",
+        'host_has_profile_pic': 't',
+        'host_identity_verified': _choice(rng, ['t', 'f'], n, [90, 10]),
+        'neighbourhood': np.where(rng.random(n) < 0.5, 'Menorca, Spain', None),
+        'neighbourhood_cleansed': neighbourhoods,
+        'neighbourhood_group_cleansed': np.nan,
+        'property_type': property_type,
+        'accommodates': accommodates,
+        'bathrooms': np.nan,
+        'bathrooms_text': _strings('', np.maximum(1, accommodates // 3)) + ' baths',
+        'bedrooms': np.nan,
+        'beds': np.maximum(1, accommodates // 2).astype(float),
+        'amenities': amenities,
+        'price': pd.Series(price).map('${:,.2f}'.format, na_action='ignore'),
+        'maximum_nights': _choice(rng, [30, 90, 365, 1125], n),
+        'minimum_minimum_nights': minimum_nights,
+        'maximum_minimum_nights': minimum_nights,
+        'minimum_maximum_nights': 1125,
+        'maximum_maximum_nights': 1125,
+        'minimum_nights_avg_ntm': minimum_nights.astype(float),
+        'maximum_nights_avg_ntm': 1125.0,
+        'calendar_updated': np.nan,
+        'has_availability': 't',
+        'availability_30': np.minimum(availability_365, rng.integers(0, 31, n)),
+        'availability_60': np.minimum(availability_365, rng.integers(0, 61, n)),
+        'availability_90': np.minimum(availability_365, rng.integers(0, 91, n)),
+        'calendar_last_scraped': SCRAPE_DATE.strftime('%Y-%m-%d'),
+        'number_of_reviews_l30d': rng.binomial(number_of_reviews, 0.02),
+        'first_review': _dates(first_days),
+        'review_scores_rating': score(0.25),
+        'review_scores_accuracy': score(0.2),
+        'review_scores_cleanliness': score(0.25),
+        'review_scores_checkin': score(0.15),
+        'review_scores_communication': score(0.15),
+        'review_scores_location': score(0.2),
+        'review_scores_value': score(0.3),
+        'instant_bookable': _choice(rng, ['t', 'f'], n, [40, 60]),
+        'calculated_host_listings_count_entire_homes': host_listings,
+        'calculated_host_listings_count_private_rooms': 0,
+        'calculated_host_listings_count_shared_rooms': 0,
+    }
+    # El fichero detallado no viene en el mismo orden que el resumen: así el merge trabaja de verdad
+    listings_data = pd.DataFrame(detail)[DETAIL_COLUMNS].iloc[rng.permutation(n)]
+    return listings, listings_data
+
+
+# Escribir listings.csv y listings_data.csv en out_dir (si no estaban ya) y devolver sus rutas
+def write_listings(n, out_dir, seed=0):
+    paths = os.path.join(out_dir, 'listings.csv'), os.path.join(out_dir, 'listings_data.csv')
+    if not all(os.path.exists(path) for path in paths):
+        os.makedirs(out_dir, exist_ok=True)
+        for frame, path in zip(generate_listings(n, seed), paths):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            frame.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, path)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generar CSV sintéticos con la forma de los de Inside Airbnb')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('out_dir')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for path in write_listings(args.rows, args.out_dir, args.seed):
+        print(path)
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import FilterIndex, active_filters
+
+
+def listings():
+    return pd.DataFrame({
+        'neighbourhood': ['Alaior', 'Ciutadella de Menorca', 'Alaior'],
+        'room_type': ['Entire home/apt', 'Private room', 'Entire home/apt'],
+        'host_is_superhost': [True, True, True],
+        'license': ['ET-1', 'ET-2', 'ET-3'],
+        'price': [80.0, 120.0, np.nan],
+        'minimum_nights': [2, 7, 3],
+        'accommodates': [2, 4, 6],
+    })
+
+
+# Elegir un valor que no aparece en la instantánea no selecciona ninguna fila
+def test_absent_value():
+    index = FilterIndex.from_listings(listings())
+    assert index.select({'licensed': [False]}).count() == 0
+    assert index.select({'host_is_superhost': [False]}).count() == 0
+    assert index.select({'neighbourhood': ['Maó']}).count() == 0
+    assert index.select({'licensed': [True, False]}).rows().tolist() == [0, 1, 2]
+
+    filters = active_filters(index, {'licensed': [False], 'room_type': []})
+    assert filters == (('licensed', (False,)),)
+    assert index.select(filters).rows().tolist() == []
+
+
+def test_select_matches_mask():
+    frame = listings()
+    index = FilterIndex.from_listings(frame)
+    selected = index.select({'neighbourhood': ['Alaior'], 'price': (50, 100)})
+    expected = (frame['neighbourhood'] == 'Alaior') & frame['price'].between(50, 100)
+    assert selected.to_mask().tolist() == expected.tolist()
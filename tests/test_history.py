@@ -0,0 +1,87 @@
+import os
+import sys
+import warnings
+
+import pandas.testing as tm
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cube import DIMENSIONS, build_cube
+from history import diff_snapshots, ingest_snapshot, listings_as_of
+from hosts import host_sums
+from ingest import load_snapshot
+from synthetic import generate_listings
+
+
+# Escribir una instantánea sintética sin los anuncios de drop_ids
+def write_snapshot(out_dir, listings, listings_data, drop_ids=()):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = os.path.join(out_dir, 'listings.csv'), os.path.join(out_dir, 'listings_data.csv')
+    listings[~listings['id'].isin(drop_ids)].to_csv(paths[0], index=False)
+    listings_data[~listings_data['id'].isin(drop_ids)].to_csv(paths[1], index=False)
+    return paths
+
+
+# Una categoría que desaparece entre instantáneas no debe quedar en el cubo incremental
+def test_disappearing_category(tmp_path):
+    listings, listings_data = generate_listings(3000, seed=0)
+    shared = listings_data.loc[listings_data['property_type'] == 'Shared room in home', 'id']
+    assert len(shared) > 0
+
+    store_dir = str(tmp_path / 'store')
+    ingest_snapshot(*write_snapshot(str(tmp_path / 'first'), listings, listings_data), store_dir, '2024-06-30')
+    previous = load_snapshot(os.path.join(store_dir, 'current.parquet'))
+    counts = ingest_snapshot(*write_snapshot(str(tmp_path / 'second'), listings, listings_data, shared),
+                             store_dir, '2024-09-30')
+    assert counts == {'added': 0, 'changed': 0, 'removed': len(shared)}
+
+    current = load_snapshot(os.path.join(store_dir, 'current.parquet'))
+    assert 'Shared room in home' not in set(current['property_type'].dropna())
+
+    # Las filas eliminadas conservan sus valores en el historial
+    history = load_snapshot(os.path.join(store_dir, 'history', '2024-09-30.parquet'))
+    removed = history[history['change_type'] == 'removed']
+    assert (removed['property_type'].astype(str) == 'Shared room in home').all()
+    assert removed['room_type'].notna().all()
+
+    # El cubo incremental coincide con el recalculado desde cero
+    sums = ['count', 'price_count', 'price_sum']
+    incremental = load_snapshot(os.path.join(store_dir, 'cube.parquet'))
+    fresh = build_cube(current)
+    key = [incremental[d].astype(str) for d in DIMENSIONS]
+    incremental = incremental.assign(**dict(zip(DIMENSIONS, key))).set_index(DIMENSIONS)[sums].sort_index()
+    fresh = fresh.assign(**{d: fresh[d].astype(str) for d in DIMENSIONS}).set_index(DIMENSIONS)[sums].sort_index()
+    tm.assert_frame_equal(incremental, fresh, check_dtype=False)
+
+    # Y las sumas por host, con las del anuncio completo
+    hosts = load_snapshot(os.path.join(store_dir, 'hosts.parquet')).set_index('host_id').sort_index()
+    tm.assert_frame_equal(hosts[['listings']], host_sums(current)[['listings']].sort_index(), check_dtype=False)
+
+    # diff_snapshots devuelve las filas anteriores sin convertir a las categorías nuevas
+    diff = diff_snapshots(previous, current)
+    tm.assert_frame_equal(diff['removed'].set_index('id').sort_index(),
+                          previous.set_index('id').loc[sorted(shared)])
+
+
+# Una instantánea sin cambios deja vacíos todos los frames del diff: el cubo, las sumas por
+# host y el historial no cambian, y no se concatenan frames vacíos (FutureWarning de pandas)
+def test_unchanged_snapshot(tmp_path):
+    listings, listings_data = generate_listings(500, seed=1)
+    paths = write_snapshot(str(tmp_path / 'snapshot'), listings, listings_data)
+    store_dir = str(tmp_path / 'store')
+    ingest_snapshot(*paths, store_dir, '2024-06-30')
+    cube = load_snapshot(os.path.join(store_dir, 'cube.parquet'))
+    hosts = load_snapshot(os.path.join(store_dir, 'hosts.parquet'))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        counts = ingest_snapshot(*paths, store_dir, '2024-09-30')
+        first = listings_as_of(store_dir, '2024-06-30')
+        second = listings_as_of(store_dir, '2024-09-30')
+    assert counts == {'added': 0, 'changed': 0, 'removed': 0}
+
+    tm.assert_frame_equal(load_snapshot(os.path.join(store_dir, 'cube.parquet')), cube)
+    # update_host_sums devuelve los hosts ordenados por host_id
+    tm.assert_frame_equal(load_snapshot(os.path.join(store_dir, 'hosts.parquet')).set_index('host_id'),
+                          hosts.set_index('host_id').sort_index())
+    tm.assert_frame_equal(second, first)
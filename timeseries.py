@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+from ingest import load_snapshot, snapshot_hash, write_parquet
+
+# Filas por bloque al leer los ficheros detallados: la memoria usada depende de
+# este tamaño y del número de anuncios x meses, nunca del tamaño del fichero
+CHUNK_SIZE = 500_000
+
+
+# Sumar el resultado parcial de un bloque al acumulado
+def accumulate(total, partial):
+    if total is None:
+        return partial
+    return total.add(partial, fill_value=0)
+
+
+# Reducir calendar.csv.gz a una serie mensual por anuncio: noches publicadas,
+# noches reservadas (no disponibles), ocupación y precio medio
+def reduce_calendar(calendar_path, chunk_size=CHUNK_SIZE):
+    total = None
+    chunks = pd.read_csv(calendar_path, usecols=['listing_id', 'date', 'available', 'price'],
+                         dtype={'listing_id': 'int64', 'available': 'category', 'price': 'string'},
+                         chunksize=chunk_size)
+    for chunk in chunks:
+        price = pd.to_numeric(chunk['price'].str.replace(r'[$,]', '', regex=True), errors='coerce').astype('float64')
+        partial = pd.DataFrame({
+            'listing_id': chunk['listing_id'],
+            'month': pd.to_datetime(chunk['date']).dt.to_period('M'),
+            'nights': 1,
+            'booked_nights': (chunk['available'] == 'f').astype('int64'),
+            'price_sum': price.fillna(0),
+            'price_count': price.notna().astype('int64'),
+        }).groupby(['listing_id', 'month']).sum()
+        total = accumulate(total, partial)
+
+    calendar = total.astype({'nights': 'int64', 'booked_nights': 'int64', 'price_count': 'int64'}).reset_index()
+    calendar['occupancy'] = calendar['booked_nights'] / calendar['nights']
+    calendar['mean_price'] = calendar['price_sum'] / calendar['price_count']
+    calendar['month'] = calendar['month'].dt.to_timestamp()
+    return calendar
+
+
+# Reducir reviews.csv.gz al número de reseñas por anuncio y mes
+def reduce_reviews(reviews_path, chunk_size=CHUNK_SIZE):
+    total = None
+    chunks = pd.read_csv(reviews_path, usecols=['listing_id', 'date'],
+                         dtype={'listing_id': 'int64'}, chunksize=chunk_size)
+    for chunk in chunks:
+        partial = chunk.groupby(['listing_id', pd.to_datetime(chunk['date']).dt.to_period('M')]).size()
+        total = accumulate(total, partial)
+
+    reviews = total.rename('reviews').astype('int64').rename_axis(['listing_id', 'month']).reset_index()
+    reviews['month'] = reviews['month'].dt.to_timestamp()
+    return reviews
+
+
+# Reducir un fichero una sola vez por contenido y guardar la serie en Parquet
+def build_series_snapshot(path, reducer, cache_dir):
+    series_path = os.path.join(cache_dir, f'{reducer.__name__}-{snapshot_hash(path)}.parquet')
+    if not os.path.exists(series_path):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_parquet(reducer(path), series_path)
+    return series_path
+
+
+# Cargar las series si los ficheros detallados existen (si no, devuelve None)
+def load_series(path, reducer, cache_dir):
+    if not os.path.exists(path):
+        return None
+    return load_snapshot(build_series_snapshot(path, reducer, cache_dir))
@@ -0,0 +1,175 @@
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Trazas de cada ejecución: spans anidados (nombre, duración y atributos como el tamaño
+# de la gráfica enviada o si la caché acertó) para saber en qué se va el tiempo de una
+# página. Sin una traza activa, span() y traced() no hacen nada, así que se pueden
+# dejar en el código de los módulos de análisis sin coste.
+#   python tracing.py trazas.jsonl   -> resumen por span de las trazas exportadas
+
+# Traza activa en este hilo (cada sesión de Streamlit ejecuta el script en su propio hilo)
+_trace = contextvars.ContextVar('trace', default=None)
+
+# Los ficheros JSONL los pueden escribir varias sesiones a la vez
+_write_lock = threading.Lock()
+
+
+class Span:
+
+    def __init__(self, name, parent, depth, start, attributes):
+        self.name = name
+        self.parent = parent
+        self.depth = depth
+        self.start = start
+        self.duration = None
+        self.attributes = attributes
+
+
+class Trace:
+
+    def __init__(self, name, **attributes):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attributes = attributes
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._open = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = Span(name, self._open[-1] if self._open else None, len(self._open),
+                    time.perf_counter() - self.start, attributes)
+        self.spans.append(span)
+        self._open.append(span)
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - self.start - span.start
+            self._open.remove(span)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        return self
+
+    # Una fila por span en orden de inicio, con el tiempo propio (sin contar los spans hijos)
+    def to_frame(self):
+        children = {}
+        for span in self.spans:
+            if span.parent is not None and span.duration is not None:
+                children[id(span.parent)] = children.get(id(span.parent), 0.0) + span.duration
+        rows = [{'name': span.name, 'depth': span.depth, 'start_ms': span.start * 1000,
+                 'duration_ms': (span.duration or 0.0) * 1000,
+                 'self_ms': ((span.duration or 0.0) - children.get(id(span), 0.0)) * 1000,
+                 **span.attributes} for span in self.spans]
+        return pd.DataFrame(rows, columns=list(dict.fromkeys(['name', 'depth', 'start_ms', 'duration_ms', 'self_ms']
+                                                              + [k for row in rows for k in row])))
+
+    # Añadir la traza a un fichero JSON lines: una línea por span con los datos de la traza
+    def write_jsonl(self, path):
+        context = {'trace_id': self.trace_id, 'trace': self.name, 'timestamp': self.timestamp,
+                   'trace_ms': (self.duration or 0.0) * 1000, **self.attributes}
+        lines = [json.dumps({**context, **row}, default=str)
+                 for row in self.to_frame().to_dict('records')]
+        with _write_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f'{line}\n' for line in lines))
+
+
+def start_trace(name, **attributes):
+    trace = Trace(name, **attributes)
+    _trace.set(trace)
+    return trace
+
+
+# Cerrar la traza activa y devolverla (None si no había ninguna)
+def stop_trace():
+    trace = _trace.get()
+    _trace.set(None)
+    return None if trace is None else trace.finish()
+
+
+def current_trace():
+    return _trace.get()
+
+
+# Span dentro de la traza activa; sin traza no mide nada y devuelve None
+@contextmanager
+def span(name, **attributes):
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attributes) as current:
+        yield current
+
+
+# Añadir atributos al span abierto más interno (p. ej. cache='miss' desde dentro de la
+# función cacheada, que solo se ejecuta cuando la caché falla)
+def annotate(**attributes):
+    trace = _trace.get()
+    if trace is not None and trace._open:
+        trace._open[-1].attributes.update(attributes)
+
+
+# Decorador: un span por llamada, con el nombre módulo.función si no se indica otro
+def traced(name=None, **attributes):
+    def decorate(function):
+        label = name or f'{function.__module__}.{function.__qualname__}'
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return function(*args, **kwargs)
+            with span(label, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Bytes que se envían al navegador: JSON de una figura de Plotly o HTML de un mapa de Folium
+def payload_size(output):
+    if hasattr(output, 'to_json'):
+        return len(output.to_json())
+    if hasattr(output, 'get_root'):
+        return len(output.get_root().render())
+    return None
+
+
+def read_jsonl(path):
+    return pd.read_json(path, lines=True)
+
+
+# Resumen de las trazas exportadas: por cada span, número de llamadas, tiempo total,
+# mediano y p95, tiempo propio y tamaño medio de lo enviado al navegador
+def summarize(spans):
+    if 'payload_bytes' not in spans:
+        spans = spans.assign(payload_bytes=float('nan'))
+    groups = spans.groupby('name')
+    summary = pd.DataFrame({
+        'calls': groups.size(),
+        'total_ms': groups['duration_ms'].sum(),
+        'median_ms': groups['duration_ms'].median(),
+        'p95_ms': groups['duration_ms'].quantile(0.95),
+        'self_ms': groups['self_ms'].sum(),
+        'payload_kb': groups['payload_bytes'].mean() / 1024,
+    })
+    return summary.sort_values('self_ms', ascending=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        sys.exit('Uso: python tracing.py <trazas.jsonl>')
+    spans = read_jsonl(sys.argv[1])
+    print(f"{spans['trace_id'].nunique()} ejecuciones")
+    with pd.option_context('display.width', 200, 'display.max_rows', 200):
+        print(summarize(spans).round(1).to_string())